@@ -1,34 +1,410 @@
-import hcl2
-import requests
-import boto3
 import json
+import os
+import sys
+import threading
+
+import cost_formulas
+import ec2_index
+import incremental
+import price_catalog
+import plan_json
+import pricing_fetch
+import sku_record
+import terraform_parse
+import tiered_pricing
+import tracing
+from price_resolver import PriceResolver
+
+# boto3, hcl2 and numpy are imported on first use: an estimate answered from the
+# price catalog and the parse cache never loads them, which keeps startup fast
+pricing_client = None
+
+def get_pricing_client():
+    """Return the Pricing API client, creating it on first use."""
+    global pricing_client
+    if pricing_client is None:
+        import boto3
+
+        # Credentials come from the usual boto3 chain; the Pricing API is region-agnostic
+        pricing_client = boto3.Session(region_name='us-east-1').client('pricing')
+    return pricing_client
+
+def set_pricing_client(client):
+    """Replace the Pricing API client, e.g. with a pricing_stub.StubPricingClient."""
+    global pricing_client
+    pricing_client = client
+
+# Shared by every get_*_pricing function, so a calculate_cost run never asks
+# for the same filter set twice
+price_resolver = PriceResolver()
+
+_parse_cache = None
+
+def get_parse_cache():
+    """Return the parse cache used when ``use_parse_cache`` is set, creating it on first use."""
+    global _parse_cache
+    if _parse_cache is None:
+        _parse_cache = terraform_parse.ParseCache()
+    return _parse_cache
+
+def set_parse_cache(cache):
+    """Replace the parse cache, e.g. with an in-memory ``terraform_parse.MemoryParseCache``."""
+    global _parse_cache
+    _parse_cache = cache
+
+_catalog = None
+_catalog_checked = False
+_catalog_identity = None
+_catalog_lock = threading.Lock()
+
+def _catalog_file_identity():
+    # A refresh replaces the file (os.replace), which gives it a new inode
+    path = os.environ.get('AWS_ESTIMATOR_CATALOG', price_catalog.DEFAULT_CATALOG_PATH)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_dev, stat.st_ino
 
-session = boto3.Session(
-    aws_access_key_id='YOUR_ACCESS_KEY',
-    aws_secret_access_key='YOUR_SECRET_KEY',
-    region_name='us-east-1'  # Pricing API is region-agnostic
-)
-pricing_client = session.client('pricing')
-
-def get_ec2_pricing(instance_type):
-    response = pricing_client.get_products(
-        ServiceCode='AmazonEC2',
-        Filters=[
-            {
-                'Type': 'TERM_MATCH',
-                'Field': 'instanceType',
-                'Value': instance_type
-            }
-        ],
+def get_price_catalog():
+    """
+    Return the local price catalog, or None if it is missing or stale.
+
+    The catalog is opened once per process. A stale catalog is reported once and
+    then ignored, so lookups fall back to the Pricing API until it is refreshed.
+    Long-running processes call ``reload_price_catalog`` to pick up refreshes.
+    """
+    global _catalog, _catalog_checked, _catalog_identity
+    if _catalog_checked:
+        return _catalog
+    # Prefetch threads race to open it; the others must wait rather than see None
+    with _catalog_lock:
+        if not _catalog_checked:
+            _catalog_identity = _catalog_file_identity()
+            catalog = price_catalog.open_catalog()
+            if catalog is not None and catalog.is_stale():
+                print(f"Price catalog {catalog.path} is stale; run 'python aws_estimator.py catalog refresh'. "
+                      "Falling back to the Pricing API.")
+                catalog.close()
+                catalog = None
+            _catalog = catalog
+            _catalog_checked = True
+    return _catalog
+
+def reload_price_catalog():
+    """
+    Forget the open catalog if it was replaced by a refresh or has gone stale.
+
+    The catalog, the EC2 index built from it and every memoized price are
+    dropped, so the next lookup reopens the catalog file. Costs one ``stat``
+    and one meta query when nothing changed.
+
+    Returns:
+        bool: True if the catalog was dropped.
+    """
+    global _catalog, _catalog_checked, _ec2_index, _ec2_index_checked
+    if not _catalog_checked:
+        return False
+    catalog = _catalog
+    if _catalog_file_identity() == _catalog_identity and (catalog is None or not catalog.is_stale()):
+        return False
+    # The old connection is left to the garbage collector: requests in flight may still read it
+    with _catalog_lock:
+        _catalog = None
+        _catalog_checked = False
+    with _ec2_index_lock:
+        _ec2_index = None
+        _ec2_index_checked = False
+    price_resolver.clear()
+    return True
+
+_ec2_index = None
+_ec2_index_checked = False
+_ec2_index_lock = threading.Lock()
+
+def get_ec2_index(build=True):
+    """
+    Return the EC2 price index built from the catalog, or None without EC2 catalog data.
+
+    The index is built once per process. Building it reads every EC2 On-Demand
+    price, which only pays off for many lookups (sweeps, the server), so with
+    ``build=False`` it is returned only if something already built it.
+    """
+    global _ec2_index, _ec2_index_checked
+    if _ec2_index_checked or not build:
+        return _ec2_index
+    with _ec2_index_lock:
+        if not _ec2_index_checked:
+            catalog = get_price_catalog()
+            _ec2_index = ec2_index.Ec2PriceIndex.from_catalog(catalog) if catalog is not None else None
+            _ec2_index_checked = True
+    return _ec2_index
+
+def _get_products(service_code, filters):
+    """
+    Fetch the first product matching the filters, as ``sku_record.SkuRecord``s.
+
+    Results are memoized by ``price_resolver``; on a miss the local price catalog
+    answers when it can, otherwise the Pricing API is queried.
+    """
+    key = pricing_key(service_code, filters)
+    with tracing.span('price_lookup', 'pricing', service=service_code) as span:
+        loads = []
+        products = price_resolver.resolve(key, lambda: loads.append(1) or _load_products(service_code, filters, span))
+        if not loads:
+            span.tag(cache='hit')
+        return products
+
+def pricing_key(service_code, filters):
+    """Return the hashable cache key for a get_products query."""
+    return (service_code, tuple((f['Type'], f['Field'], f['Value']) for f in filters))
+
+def prefetch_prices(keys, max_concurrency=pricing_fetch.DEFAULT_MAX_CONCURRENCY):
+    """
+    Resolve pricing keys in parallel so later get_*_pricing calls are cache hits.
+
+    Throttling errors are retried with adaptive backoff; keys that still fail are
+    left uncached and the synchronous getters will try them again.
+
+    Args:
+        keys (iterable): Keys built with ``pricing_key``.
+        max_concurrency (int): Upper bound on Pricing API requests in flight.
+
+    Returns:
+        dict: The fetch outcome from ``pricing_fetch.fetch_all``.
+    """
+    def fetch(key):
+        service_code, filters = key
+        return _get_products(service_code, [
+            {'Type': filter_type, 'Field': field, 'Value': value} for filter_type, field, value in filters
+        ])
+
+    def trace_tags(key):
+        return {'service': key[0], 'cache': 'hit' if key in price_resolver else 'miss'}
+
+    with tracing.span('prefetch_prices', 'pricing') as span:
+        outcome = pricing_fetch.fetch_all(keys, fetch, max_concurrency, trace_tags=trace_tags)
+        span.tag(keys=len(outcome['results']) + len(outcome['errors']), retries=outcome['retries'],
+                 throttled=outcome['throttled'])
+    for key, error in outcome['errors'].items():
+        print(f"Error prefetching pricing data for {key[0]}: {error}")
+    return outcome
+
+def _load_products(service_code, filters, span=tracing.NOOP_SPAN):
+    catalog = get_price_catalog()
+    if catalog is not None:
+        products = catalog.get_products(service_code, filters)
+        if products is not None:
+            span.tag(cache='miss', source='catalog')
+            return products
+
+    span.tag(cache='miss', source='api')
+    response = get_pricing_client().get_products(
+        ServiceCode=service_code,
+        Filters=filters,
         MaxResults=1  # Limit results for simplicity
     )
-    
-    for product in response['PriceList']:
-        product_data = json.loads(product)
-        price_dimensions = product_data['terms']['OnDemand']
-        for price in price_dimensions.values():
-            for dimension in price['priceDimensions'].values():
-                return dimension['pricePerUnit']['USD']
+    # Only On-Demand prices are looked up; the rest of each document is dropped right away
+    return [sku_record.from_json(product, service_code, sku_record.ON_DEMAND) for product in response['PriceList']]
+
+def ec2_filters(instance_type, region=None, operating_system=ec2_index.DEFAULT_OPERATING_SYSTEM,
+                tenancy=ec2_index.DEFAULT_TENANCY, pre_installed_sw=ec2_index.DEFAULT_PRE_INSTALLED_SW,
+                capacity_status=ec2_index.DEFAULT_CAPACITY_STATUS, license_model=ec2_index.DEFAULT_LICENSE_MODEL):
+    # Without every dimension, the first SKU returned may be another OS, tenancy, license or region
+    dimensions = [
+        ('instanceType', instance_type),
+        ('regionCode', region),
+        ('operatingSystem', operating_system),
+        ('tenancy', tenancy),
+        ('preInstalledSw', pre_installed_sw),
+        ('capacitystatus', capacity_status),
+        ('licenseModel', license_model),
+    ]
+    return [
+        {
+            'Type': 'TERM_MATCH',
+            'Field': field,
+            'Value': value
+        }
+        for field, value in dimensions if value is not None
+    ]
+
+def s3_filters(storage_class):
+    return [
+        {
+            'Type': 'TERM_MATCH',
+            'Field': 'storageClass',
+            'Value': storage_class
+        }
+    ]
+
+def rds_filters(db_instance_class, engine, license_model):
+    return [
+        {
+            'Type': 'TERM_MATCH',
+            'Field': 'dbInstanceClass',
+            'Value': db_instance_class
+        },
+        {
+            'Type': 'TERM_MATCH',
+            'Field': 'databaseEngine',
+            'Value': engine
+        },
+        {
+            'Type': 'TERM_MATCH',
+            'Field': 'licenseModel',
+            'Value': license_model
+        }
+    ]
+
+def group_filters(group):
+    return [
+        {
+            'Type': 'TERM_MATCH',
+            'Field': 'group',
+            'Value': group
+        }
+    ]
+
+def product_family_filters(product_family):
+    return [
+        {
+            'Type': 'TERM_MATCH',
+            'Field': 'productFamily',
+            'Value': product_family
+        }
+    ]
+
+DAYS_PER_MONTH = cost_formulas.DAYS_PER_MONTH
+
+# Usage drivers assumed when a usage dict leaves one out
+DEFAULT_USAGE = {
+    'hours_per_day': 24,
+    'storage_gb': 0,
+    'storage_class': 'General Purpose',
+    'engine': 'MySQL',
+    'license_model': 'No license required',  # RDS spelling; EC2 defaults to ec2_index.DEFAULT_LICENSE_MODEL
+    'requests_per_day': 0,
+    'execution_time_seconds': 0,
+    'memory_size_mb': 128,
+    'reads_per_month': 0,
+    'writes_per_month': 0,
+    'data_transfer_gb': 0,
+    'elastic_ips_count': 0,
+    'ec2_hours_per_day': 0,
+    'fargate_hours_per_day': 0,
+    'control_plane_hours_per_day': 24,
+    'worker_node_hours_per_day': 0,
+    'operating_system': ec2_index.DEFAULT_OPERATING_SYSTEM,
+    'tenancy': ec2_index.DEFAULT_TENANCY,
+    'pre_installed_sw': ec2_index.DEFAULT_PRE_INSTALLED_SW,
+    'capacity_status': ec2_index.DEFAULT_CAPACITY_STATUS,
+    'free_tier': False,  # Count this resource against the account's monthly free tier (see free_tier_credits)
+}
+
+def _usage_value(usage, key, cast, prompt):
+    """
+    Read one usage driver.
+
+    With ``usage=None`` the value is prompted for, as the interactive estimator
+    always did; otherwise it comes from ``usage`` or ``DEFAULT_USAGE`` and never
+    blocks on a TTY.
+    """
+    if usage is None:
+        return cast(input(prompt))
+    return cast(usage.get(key, DEFAULT_USAGE[key]))
+
+# Region of resources whose provider sets none, unless AWS_REGION or AWS_DEFAULT_REGION does
+DEFAULT_REGION = 'us-east-1'
+
+def default_region():
+    """Return the configured default region: ``AWS_REGION``, ``AWS_DEFAULT_REGION``, else ``DEFAULT_REGION``."""
+    return os.environ.get('AWS_REGION') or os.environ.get('AWS_DEFAULT_REGION') or DEFAULT_REGION
+
+def _ec2_dimensions(usage):
+    """
+    Return ``(region, operating_system, tenancy, pre_installed_sw, capacity_status, license_model)`` from usage.
+    """
+    usage = usage or {}
+    return (usage.get('region') or default_region(),) + tuple(
+        usage.get(key, DEFAULT_USAGE[key])
+        for key in ('operating_system', 'tenancy', 'pre_installed_sw', 'capacity_status')
+    ) + (usage.get('license_model', ec2_index.DEFAULT_LICENSE_MODEL),)
+
+def get_ec2_offer(instance_type, region=None, operating_system=ec2_index.DEFAULT_OPERATING_SYSTEM,
+                  tenancy=ec2_index.DEFAULT_TENANCY, pre_installed_sw=ec2_index.DEFAULT_PRE_INSTALLED_SW,
+                  capacity_status=ec2_index.DEFAULT_CAPACITY_STATUS, license_model=ec2_index.DEFAULT_LICENSE_MODEL):
+    """
+    Find the SKU an EC2 instance is priced on, and its On-Demand hourly price.
+
+    Answered from the EC2 index when it is built, otherwise from the catalog
+    or the API; both pick the same SKU, so the price, the line item's SKU and
+    its commitment offers never depend on which path answered.
+
+    Returns:
+        tuple: ``(price_per_hour, sku)``, or ``(None, None)`` if not found.
+    """
+    # Without a region the first SKU returned could be from any region
+    region = region or default_region()
+    dimensions = (region, operating_system, tenancy, pre_installed_sw, capacity_status, license_model)
+    index = get_ec2_index(build=False)
+    if index is not None:
+        offer = index.get(region, instance_type, *dimensions[1:])
+        if offer is not None:
+            return offer.price_per_hour, offer.sku
+
+    products = _get_products('AmazonEC2', ec2_filters(instance_type, *dimensions))
+
+    for product in products:
+        for dimension in product.on_demand:
+            return dimension.price_usd, product.sku
+    return None, None
+
+def get_ec2_pricing(instance_type, region=None, operating_system=ec2_index.DEFAULT_OPERATING_SYSTEM,
+                    tenancy=ec2_index.DEFAULT_TENANCY, pre_installed_sw=ec2_index.DEFAULT_PRE_INSTALLED_SW,
+                    capacity_status=ec2_index.DEFAULT_CAPACITY_STATUS, license_model=ec2_index.DEFAULT_LICENSE_MODEL):
+    return get_ec2_offer(instance_type, region, operating_system, tenancy, pre_installed_sw, capacity_status,
+                         license_model)[0]
+
+def find_cheapest_ec2_instance(region, min_vcpu=0, min_memory_gib=0.0,
+                               operating_system=ec2_index.DEFAULT_OPERATING_SYSTEM,
+                               tenancy=ec2_index.DEFAULT_TENANCY,
+                               pre_installed_sw=ec2_index.DEFAULT_PRE_INSTALLED_SW,
+                               capacity_status=ec2_index.DEFAULT_CAPACITY_STATUS,
+                               license_model=ec2_index.DEFAULT_LICENSE_MODEL):
+    """
+    Find the cheapest EC2 instance type that meets a vCPU and memory floor.
+
+    Answered from the EC2 price index, so it needs a price catalog holding
+    AmazonEC2; without one it reports the problem and returns None.
+
+    Returns:
+        ec2_index.Ec2Offer: The cheapest matching offer, or None.
+    """
+    index = get_ec2_index()
+    if index is None:
+        print("Finding the cheapest instance needs EC2 prices in the catalog; "
+              "run 'python aws_estimator.py catalog refresh --service AmazonEC2'.")
+        return None
+    return index.cheapest(region, min_vcpu, min_memory_gib, operating_system, tenancy, pre_installed_sw,
+                          capacity_status, license_model)
+
+def s3_pricing_info(storage_class):
+    """
+    Get the S3 storage price of a storage class, with its volume tiers.
+
+    Returns:
+        dict: price_per_gb (a float, or a ``TieredRate`` when the price
+        drops with volume), or None if not found.
+    """
+    for product in _get_products('AmazonS3', s3_filters(storage_class)):
+        dimensions = product.on_demand
+        price_per_gb = tiered_pricing.compile_dimensions(dimensions, lambda dimension: dimension.unit == 'GB-Mo')
+        if price_per_gb is None:
+            price_per_gb = tiered_pricing.compile_dimensions(dimensions, lambda dimension: True)
+        if price_per_gb is not None:
+            return {'price_per_gb': price_per_gb}
+    return None
 
 def get_s3_pricing(storage_class):
     """
@@ -38,28 +414,12 @@ def get_s3_pricing(storage_class):
         storage_class (str): The S3 storage class (e.g., "Standard", "Intelligent-Tiering").
 
     Returns:
-        float: The price per GB for the specified storage class, or None if not found.
+        float: The price per GB of the first volume tier, or None if not found.
     """
     try:
-        response = pricing_client.get_products(
-            ServiceCode='AmazonS3',
-            Filters=[
-                {
-                    'Type': 'TERM_MATCH',
-                    'Field': 'storageClass',
-                    'Value': storage_class
-                }
-            ],
-            MaxResults=1  # Limit results for simplicity
-        )
-
-        # Parse the response to extract the price
-        for product in response['PriceList']:
-            product_data = json.loads(product)
-            terms = product_data['terms']['OnDemand']
-            for term in terms.values():
-                for price_dimension in term['priceDimensions'].values():
-                    return float(price_dimension['pricePerUnit']['USD'])
+        pricing_info = s3_pricing_info(storage_class)
+        if pricing_info is not None:
+            return tiered_pricing.unit_price(pricing_info['price_per_gb'])
 
     except Exception as e:
         print(f"Error fetching pricing data: {e}")
@@ -79,72 +439,67 @@ def get_rds_pricing(db_instance_class, engine, license_model):
         float: The price per hour for the specified DB instance configuration, or None if not found.
     """
     try:
-        response = pricing_client.get_products(
-            ServiceCode='AmazonRDS',
-            Filters=[
-                {
-                    'Type': 'TERM_MATCH',
-                    'Field': 'dbInstanceClass',
-                    'Value': db_instance_class
-                },
-                {
-                    'Type': 'TERM_MATCH',
-                    'Field': 'databaseEngine',
-                    'Value': engine
-                },
-                {
-                    'Type': 'TERM_MATCH',
-                    'Field': 'licenseModel',
-                    'Value': license_model
-                }
-            ],
-            MaxResults=1  # Limit results for simplicity
-        )
+        products = _get_products('AmazonRDS', rds_filters(db_instance_class, engine, license_model))
 
         # Parse the response to extract the price
-        for product in response['PriceList']:
-            product_data = json.loads(product)
-            terms = product_data['terms']['OnDemand']
-            for term in terms.values():
-                for price_dimension in term['priceDimensions'].values():
-                    return float(price_dimension['pricePerUnit']['USD'])
+        for product in products:
+            for price_dimension in product.on_demand:
+                return price_dimension.price_usd
 
-def get_lambda_pricing():
+    except Exception as e:
+        print(f"Error fetching pricing data: {e}")
+
+    return None
+
+# Pricing API product group of each Lambda price component
+LAMBDA_PRICE_GROUPS = {
+    'price_per_request': 'AWS-Lambda-Requests',
+    'price_per_gb_second': 'AWS-Lambda-Duration',
+}
+
+def lambda_pricing_info():
     """
-    Get AWS Lambda pricing and estimate monthly cost based on user input.
+    Get the AWS Lambda price components.
 
     Returns:
-        dict: A dictionary with the estimated monthly cost or None if not found.
+        dict: price_per_request and price_per_gb_second (those found; each a
+        float or a ``TieredRate``), or None if not found.
     """
-    try:
-        response = pricing_client.get_products(
-            ServiceCode='AWSLambda',
-            Filters=[],
-            MaxResults=1  # Limit results for simplicity
-        )
-
-        # Parse the response to extract the price
-        for product in response['PriceList']:
-            product_data = json.loads(product)
-            terms = product_data['terms']['OnDemand']
-            pricing_info = {}
+    # Requests and compute are published as separate products, one per group
+    pricing_info = {}
+    for name, group in LAMBDA_PRICE_GROUPS.items():
+        for product in _get_products('AWSLambda', group_filters(group)):
+            rate = tiered_pricing.compile_dimensions(product.on_demand, lambda dimension: True)
+            if rate is not None:
+                pricing_info[name] = rate
+                break
+
+    return pricing_info or None
+
+def get_lambda_pricing(usage=None):
+    """
+    Get AWS Lambda pricing and estimate monthly cost based on usage.
 
-            for term in terms.values():
-                for price_dimension in term['priceDimensions'].values():
-                    pricing_info['price_per_request'] = float(price_dimension['pricePerUnit']['USD'])  # Price per request
-                    pricing_info['price_per_gb_second'] = float(price_dimension['pricePerUnit']['USD'])  # Price per GB-second
+    Args:
+        usage (dict): Usage drivers (requests_per_day, execution_time_seconds,
+            memory_size_mb). If None, they are prompted for.
 
-            # Get user input for estimation
-            requests_per_day = int(input("Enter the estimated number of requests per day: "))
-            execution_time_seconds = float(input("Enter the average execution time of the Lambda function in seconds: "))
-            memory_size_mb = int(input("Enter the allocated memory size for the Lambda function (in MB): "))
+    Returns:
+        dict: A dictionary with the estimated monthly cost or None if not found.
+    """
+    try:
+        pricing_info = lambda_pricing_info()
+        if pricing_info is not None:
+            # Get usage for estimation
+            requests_per_day = _usage_value(usage, 'requests_per_day', int, "Enter the estimated number of requests per day: ")
+            execution_time_seconds = _usage_value(usage, 'execution_time_seconds', float, "Enter the average execution time of the Lambda function in seconds: ")
+            memory_size_mb = _usage_value(usage, 'memory_size_mb', int, "Enter the allocated memory size for the Lambda function (in MB): ")
 
             # Calculate estimated monthly cost
-            days_per_month = 30  # Approximate number of days in a month
-            total_requests = requests_per_day * days_per_month
-            total_duration_gb_seconds = (execution_time_seconds / 1024) * memory_size_mb * total_requests  # GB-seconds
-
-            monthly_cost = (total_requests * pricing_info['price_per_request']) + (total_duration_gb_seconds * pricing_info['price_per_gb_second'])
+            monthly_cost = cost_formulas.lambda_monthly_cost(
+                requests_per_day, execution_time_seconds, memory_size_mb,
+                pricing_info['price_per_request'], pricing_info['price_per_gb_second']
+            )
 
             return {
                 'monthly_cost': monthly_cost,
@@ -158,45 +513,56 @@ def get_lambda_pricing():
     return None
 
 
-def get_dynamodb_pricing():
+def dynamodb_pricing_info():
+    """
+    Get the AWS DynamoDB price components.
+
+    Returns:
+        dict: price_per_read, price_per_write and price_per_data_transfer (those
+        found), or None if no product was found.
+    """
+    products = _get_products('AmazonDynamoDB', [])
+
+    # Parse the response to extract the pricing information; each price may be tiered
+    for product in products:
+        dimensions = product.on_demand
+        pricing_info = {}
+
+        for name, marker in (('price_per_read', 'ReadCapacityUnit'), ('price_per_write', 'WriteCapacityUnit'),
+                             ('price_per_data_transfer', 'DataTransfer')):
+            price = tiered_pricing.compile_dimensions(
+                dimensions, lambda dimension: marker in dimension.description
+            )
+            if price is not None:
+                pricing_info[name] = price
+
+        return pricing_info
+
+    return None
+
+def get_dynamodb_pricing(usage=None):
     """
-    Get AWS DynamoDB pricing and estimate monthly cost based on user input.
+    Get AWS DynamoDB pricing and estimate monthly cost based on usage.
+
+    Args:
+        usage (dict): Usage drivers (reads_per_month, writes_per_month,
+            data_transfer_gb). If None, they are prompted for.
 
     Returns:
         dict: A dictionary with the estimated monthly cost or None if not found.
     """
     try:
-        response = pricing_client.get_products(
-            ServiceCode='AmazonDynamoDB',
-            Filters=[],
-            MaxResults=1  # Limit results for simplicity
-        )
-
-        # Parse the response to extract the pricing information
-        for product in response['PriceList']:
-            product_data = json.loads(product)
-            terms = product_data['terms']['OnDemand']
-            pricing_info = {}
-
-            for term in terms.values():
-                for price_dimension in term['priceDimensions'].values():
-                    if 'ReadCapacityUnit' in price_dimension['description']:
-                        pricing_info['price_per_read'] = float(price_dimension['pricePerUnit']['USD'])  # Price per read request
-                    elif 'WriteCapacityUnit' in price_dimension['description']:
-                        pricing_info['price_per_write'] = float(price_dimension['pricePerUnit']['USD'])  # Price per write request
-                    elif 'DataTransfer' in price_dimension['description']:
-                        pricing_info['price_per_data_transfer'] = float(price_dimension['pricePerUnit']['USD'])  # Price per GB transferred
-
-            # Get user input for estimation
-            reads_per_month = int(input("Enter the estimated number of read requests per month: "))
-            writes_per_month = int(input("Enter the estimated number of write requests per month: "))
-            data_transfer_gb = float(input("Enter the estimated data transfer in GB per month: "))
+        pricing_info = dynamodb_pricing_info()
+        if pricing_info is not None:
+            # Get usage for estimation
+            reads_per_month = _usage_value(usage, 'reads_per_month', int, "Enter the estimated number of read requests per month: ")
+            writes_per_month = _usage_value(usage, 'writes_per_month', int, "Enter the estimated number of write requests per month: ")
+            data_transfer_gb = _usage_value(usage, 'data_transfer_gb', float, "Enter the estimated data transfer in GB per month: ")
 
             # Calculate estimated monthly cost
-            monthly_cost = (
-                (reads_per_month * pricing_info['price_per_read']) +
-                (writes_per_month * pricing_info['price_per_write']) +
-                (data_transfer_gb * pricing_info['price_per_data_transfer'])
+            monthly_cost = cost_formulas.dynamodb_monthly_cost(
+                reads_per_month, writes_per_month, data_transfer_gb,
+                pricing_info['price_per_read'], pricing_info['price_per_write'], pricing_info['price_per_data_transfer']
             )
 
             return {
@@ -211,71 +577,67 @@ def get_dynamodb_pricing():
 
     return None
 
-def get_vpc_pricing():
+def vpc_pricing_info():
     """
-    Get AWS VPC pricing and estimate monthly cost based on user input.
+    Get the AWS VPC price components, including Elastic IP pricing.
 
     Returns:
-        dict: A dictionary with the estimated monthly cost or None if not found.
+        dict: price_per_hour, price_per_data_transfer and price_per_elastic_ip.
     """
-    try:
-        # Fetch VPC pricing
-        response = pricing_client.get_products(
-            ServiceCode='AmazonVPC',
-            Filters=[],
-            MaxResults=1  # Limit results for simplicity
+    # Fetch VPC pricing
+    products = _get_products('AmazonVPC', [])
+
+    # Parse the response to extract the pricing information
+    pricing_info = {
+        'price_per_hour': 0,
+        'price_per_data_transfer': 0,
+        'price_per_elastic_ip': 0
+    }
+
+    for product in products:
+        dimensions = product.on_demand
+        for price_dimension in dimensions:
+            if 'VPC' in price_dimension.description:
+                pricing_info['price_per_hour'] = price_dimension.price_usd  # Price per hour for VPC
+        # Data transfer is priced in volume tiers
+        price_per_data_transfer = tiered_pricing.compile_dimensions(
+            dimensions, lambda dimension: 'DataTransfer' in dimension.description
         )
+        if price_per_data_transfer is not None:
+            pricing_info['price_per_data_transfer'] = price_per_data_transfer
 
-        # Parse the response to extract the pricing information
-        pricing_info = {
-            'price_per_hour': 0,
-            'price_per_data_transfer': 0,
-            'price_per_elastic_ip': 0
-        }
+    # Fetch Elastic IP pricing
+    elastic_ip_products = _get_products('AmazonEC2', product_family_filters('Elastic IP Addresses'))
 
-        for product in response['PriceList']:
-            product_data = json.loads(product)
-            terms = product_data['terms']['OnDemand']
-
-            for term in terms.values():
-                for price_dimension in term['priceDimensions'].values():
-                    if 'VPC' in price_dimension['description']:
-                        pricing_info['price_per_hour'] = float(price_dimension['pricePerUnit']['USD'])  # Price per hour for VPC
-                    elif 'DataTransfer' in price_dimension['description']:
-                        pricing_info['price_per_data_transfer'] = float(price_dimension['pricePerUnit']['USD'])  # Price per GB transferred
-
-        # Fetch Elastic IP pricing
-        elastic_ip_response = pricing_client.get_products(
-            ServiceCode='AmazonEC2',
-            Filters=[
-                {
-                    'Type': 'TERM_MATCH',
-                    'Field': 'productFamily',
-                    'Value': 'Elastic IP Addresses'
-                }
-            ],
-            MaxResults=1
-        )
+    for product in elastic_ip_products:
+        for price_dimension in product.on_demand:
+            pricing_info['price_per_elastic_ip'] = price_dimension.price_usd  # Price per Elastic IP
 
-        for product in elastic_ip_response['PriceList']:
-            product_data = json.loads(product)
-            terms = product_data['terms']['OnDemand']
+    return pricing_info
+
+def get_vpc_pricing(usage=None):
+    """
+    Get AWS VPC pricing and estimate monthly cost based on usage.
+
+    Args:
+        usage (dict): Usage drivers (hours_per_day, data_transfer_gb,
+            elastic_ips_count). If None, they are prompted for.
 
-            for term in terms.values():
-                for price_dimension in term['priceDimensions'].values():
-                    pricing_info['price_per_elastic_ip'] = float(price_dimension['pricePerUnit']['USD'])  # Price per Elastic IP
+    Returns:
+        dict: A dictionary with the estimated monthly cost or None if not found.
+    """
+    try:
+        pricing_info = vpc_pricing_info()
 
-        # Get user input for estimation
-        hours_per_day = float(input("Enter the number of hours the VPC will be active per day: "))
-        days_per_month = 30  # Approximate number of days in a month
-        data_transfer_gb = float(input("Enter the estimated data transfer in GB per month: "))
-        elastic_ips_count = int(input("Enter the number of Elastic IPs in use: "))
+        # Get usage for estimation
+        hours_per_day = _usage_value(usage, 'hours_per_day', float, "Enter the number of hours the VPC will be active per day: ")
+        data_transfer_gb = _usage_value(usage, 'data_transfer_gb', float, "Enter the estimated data transfer in GB per month: ")
+        elastic_ips_count = _usage_value(usage, 'elastic_ips_count', int, "Enter the number of Elastic IPs in use: ")
 
         # Calculate estimated monthly cost
-        monthly_cost = (
-            (hours_per_day * days_per_month * pricing_info['price_per_hour']) +
-            (data_transfer_gb * pricing_info['price_per_data_transfer']) +
-            (elastic_ips_count * pricing_info['price_per_elastic_ip'] * days_per_month)  # Cost for Elastic IPs
+        monthly_cost = cost_formulas.vpc_monthly_cost(
+            hours_per_day, data_transfer_gb, elastic_ips_count,
+            pricing_info['price_per_hour'], pricing_info['price_per_data_transfer'], pricing_info['price_per_elastic_ip']
         )
 
         return {
@@ -291,68 +653,60 @@ def get_vpc_pricing():
     return None
 
 
-def get_ecs_pricing():
+def ecs_pricing_info():
     """
-    Get AWS ECS pricing and estimate monthly cost based on user input.
+    Get the AWS ECS price components for EC2 and Fargate capacity.
 
     Returns:
-        dict: A dictionary with the estimated monthly cost or None if not found.
+        dict: price_per_hour_ec2 and price_per_hour_fargate.
     """
-    try:
-        # Fetch EC2 instance pricing
-        response = pricing_client.get_products(
-            ServiceCode='AmazonEC2',
-            Filters=[
-                {
-                    'Type': 'TERM_MATCH',
-                    'Field': 'productFamily',
-                    'Value': 'Compute Instance'
-                }
-            ],
-            MaxResults=1
-        )
+    # Fetch EC2 instance pricing
+    products = _get_products('AmazonEC2', product_family_filters('Compute Instance'))
 
-        # Parse the response to extract EC2 instance pricing information
-        pricing_info = {
-            'price_per_hour_ec2': 0,
-            'price_per_hour_fargate': 0
-        }
+    # Parse the response to extract EC2 instance pricing information
+    pricing_info = {
+        'price_per_hour_ec2': 0,
+        'price_per_hour_fargate': 0
+    }
 
-        # Get EC2 instance pricing
-        for product in response['PriceList']:
-            product_data = json.loads(product)
-            terms = product_data['terms']['OnDemand']
-
-            for term in terms.values():
-                for price_dimension in term['priceDimensions'].values():
-                    if 'Linux' in price_dimension['description']:  # Adjust for your instance type
-                        pricing_info['price_per_hour_ec2'] = float(price_dimension['pricePerUnit']['USD'])  # Price per hour for EC2
-
-        # Fetch Fargate pricing
-        fargate_response = pricing_client.get_products(
-            ServiceCode='AWSFargate',
-            Filters=[],
-            MaxResults=1
-        )
+    # Get EC2 instance pricing
+    for product in products:
+        for price_dimension in product.on_demand:
+            if 'Linux' in price_dimension.description:  # Adjust for your instance type
+                pricing_info['price_per_hour_ec2'] = price_dimension.price_usd  # Price per hour for EC2
+
+    # Fetch Fargate pricing
+    fargate_products = _get_products('AWSFargate', [])
+
+    for product in fargate_products:
+        for price_dimension in product.on_demand:
+            if 'Fargate' in price_dimension.description:
+                pricing_info['price_per_hour_fargate'] = price_dimension.price_usd  # Price per hour for Fargate
 
-        for product in fargate_response['PriceList']:
-            product_data = json.loads(product)
-            terms = product_data['terms']['OnDemand']
+    return pricing_info
+
+def get_ecs_pricing(usage=None):
+    """
+    Get AWS ECS pricing and estimate monthly cost based on usage.
 
-            for term in terms.values():
-                for price_dimension in term['priceDimensions'].values():
-                    if 'Fargate' in price_dimension['description']:
-                        pricing_info['price_per_hour_fargate'] = float(price_dimension['pricePerUnit']['USD'])  # Price per hour for Fargate
+    Args:
+        usage (dict): Usage drivers (ec2_hours_per_day, fargate_hours_per_day).
+            If None, they are prompted for.
+
+    Returns:
+        dict: A dictionary with the estimated monthly cost or None if not found.
+    """
+    try:
+        pricing_info = ecs_pricing_info()
 
-        # Get user input for estimation
-        ec2_hours_per_day = float(input("Enter the number of hours the EC2 instances will be active per day: "))
-        fargate_hours_per_day = float(input("Enter the number of hours the Fargate tasks will be active per day: "))
-        days_per_month = 30  # Approximate number of days in a month
+        # Get usage for estimation
+        ec2_hours_per_day = _usage_value(usage, 'ec2_hours_per_day', float, "Enter the number of hours the EC2 instances will be active per day: ")
+        fargate_hours_per_day = _usage_value(usage, 'fargate_hours_per_day', float, "Enter the number of hours the Fargate tasks will be active per day: ")
 
         # Calculate estimated monthly cost
-        monthly_cost = (
-            (ec2_hours_per_day * days_per_month * pricing_info['price_per_hour_ec2']) +
-            (fargate_hours_per_day * days_per_month * pricing_info['price_per_hour_fargate'])
+        monthly_cost = cost_formulas.ecs_monthly_cost(
+            ec2_hours_per_day, fargate_hours_per_day,
+            pricing_info['price_per_hour_ec2'], pricing_info['price_per_hour_fargate']
         )
 
         return {
@@ -366,67 +720,59 @@ def get_ecs_pricing():
 
     return None
 
-def get_eks_pricing():
+def eks_pricing_info():
     """
-    Get AWS EKS pricing and estimate monthly cost based on user input.
+    Get the AWS EKS price components for the control plane and worker nodes.
 
     Returns:
-        dict: A dictionary with the estimated monthly cost or None if not found.
+        dict: control_plane_price_per_hour and worker_node_price_per_hour.
     """
-    try:
-        # Fetch EKS control plane pricing
-        eks_control_plane_response = pricing_client.get_products(
-            ServiceCode='AmazonEKS',
-            Filters=[],
-            MaxResults=1
-        )
+    # Fetch EKS control plane pricing
+    eks_control_plane_products = _get_products('AmazonEKS', [])
 
-        pricing_info = {
-            'control_plane_price_per_hour': 0,
-            'worker_node_price_per_hour': 0
-        }
+    pricing_info = {
+        'control_plane_price_per_hour': 0,
+        'worker_node_price_per_hour': 0
+    }
 
-        # Get EKS control plane pricing
-        for product in eks_control_plane_response['PriceList']:
-            product_data = json.loads(product)
-            terms = product_data['terms']['OnDemand']
-
-            for term in terms.values():
-                for price_dimension in term['priceDimensions'].values():
-                    pricing_info['control_plane_price_per_hour'] = float(price_dimension['pricePerUnit']['USD'])  # Price per hour for EKS control plane
-
-        # Fetch EC2 instance pricing for worker nodes
-        ec2_response = pricing_client.get_products(
-            ServiceCode='AmazonEC2',
-            Filters=[
-                {
-                    'Type': 'TERM_MATCH',
-                    'Field': 'productFamily',
-                    'Value': 'Compute Instance'
-                }
-            ],
-            MaxResults=1
-        )
+    # Get EKS control plane pricing
+    for product in eks_control_plane_products:
+        for price_dimension in product.on_demand:
+            pricing_info['control_plane_price_per_hour'] = price_dimension.price_usd  # Price per hour for EKS control plane
 
-        # Get EC2 instance pricing
-        for product in ec2_response['PriceList']:
-            product_data = json.loads(product)
-            terms = product_data['terms']['OnDemand']
+    # Fetch EC2 instance pricing for worker nodes
+    ec2_products = _get_products('AmazonEC2', product_family_filters('Compute Instance'))
 
-            for term in terms.values():
-                for price_dimension in term['priceDimensions'].values():
-                    if 'Linux' in price_dimension['description']:  # Adjust for your instance type
-                        pricing_info['worker_node_price_per_hour'] = float(price_dimension['pricePerUnit']['USD'])  # Price per hour for worker nodes
+    # Get EC2 instance pricing
+    for product in ec2_products:
+        for price_dimension in product.on_demand:
+            if 'Linux' in price_dimension.description:  # Adjust for your instance type
+                pricing_info['worker_node_price_per_hour'] = price_dimension.price_usd  # Price per hour for worker nodes
 
-        # Get user input for estimation
-        control_plane_hours_per_day = float(input("Enter the number of hours the EKS control plane will be active per day: "))
-        worker_node_hours_per_day = float(input("Enter the number of hours the worker nodes will be active per day: "))
-        days_per_month = 30  # Approximate number of days in a month
+    return pricing_info
+
+def get_eks_pricing(usage=None):
+    """
+    Get AWS EKS pricing and estimate monthly cost based on usage.
+
+    Args:
+        usage (dict): Usage drivers (control_plane_hours_per_day,
+            worker_node_hours_per_day). If None, they are prompted for.
+
+    Returns:
+        dict: A dictionary with the estimated monthly cost or None if not found.
+    """
+    try:
+        pricing_info = eks_pricing_info()
+
+        # Get usage for estimation
+        control_plane_hours_per_day = _usage_value(usage, 'control_plane_hours_per_day', float, "Enter the number of hours the EKS control plane will be active per day: ")
+        worker_node_hours_per_day = _usage_value(usage, 'worker_node_hours_per_day', float, "Enter the number of hours the worker nodes will be active per day: ")
 
         # Calculate estimated monthly cost
-        monthly_cost = (
-            (control_plane_hours_per_day * days_per_month * pricing_info['control_plane_price_per_hour']) +
-            (worker_node_hours_per_day * days_per_month * pricing_info['worker_node_price_per_hour'])
+        monthly_cost = cost_formulas.eks_monthly_cost(
+            control_plane_hours_per_day, worker_node_hours_per_day,
+            pricing_info['control_plane_price_per_hour'], pricing_info['worker_node_price_per_hour']
         )
 
         return {
@@ -442,51 +788,51 @@ def get_eks_pricing():
 
 
 # Function to get AWS pricing information
-def get_aws_price(service, region, instance_type):
+def get_aws_price(service, region, instance_type, usage=None):
     total_cost = 0
 
     if service == 'EC2':
-        ec2_price = get_ec2_pricing(instance_type)
+        ec2_price = get_ec2_pricing(instance_type, region, *_ec2_dimensions(usage)[1:])
         if ec2_price is not None:
             total_cost += ec2_price
 
     elif service == 'S3':
         # Example: if you want to check for a specific storage class
-        storage_class = input("Enter the S3 storage class (e.g., Standard, Intelligent-Tiering): ")
+        storage_class = _usage_value(usage, 'storage_class', str, "Enter the S3 storage class (e.g., Standard, Intelligent-Tiering): ")
         s3_price = get_s3_pricing(storage_class)
         if s3_price is not None:
             total_cost += s3_price
 
     elif service == 'RDS':
         # Example: get user inputs for RDS
-        engine = input("Enter the database engine (e.g., mysql, postgresql): ")
-        license_model = input("Enter the license model (e.g., license-included, bring-your-own-license): ")
+        engine = _usage_value(usage, 'engine', str, "Enter the database engine (e.g., mysql, postgresql): ")
+        license_model = _usage_value(usage, 'license_model', str, "Enter the license model (e.g., license-included, bring-your-own-license): ")
         rds_price = get_rds_pricing(instance_type, engine, license_model)
         if rds_price is not None:
             total_cost += rds_price
 
     elif service == 'Lambda':
-        lambda_price = get_lambda_pricing()
+        lambda_price = get_lambda_pricing(usage)
         if lambda_price is not None:
             total_cost += lambda_price['monthly_cost']
 
     elif service == 'DynamoDB':
-        dynamodb_price = get_dynamodb_pricing()
+        dynamodb_price = get_dynamodb_pricing(usage)
         if dynamodb_price is not None:
             total_cost += dynamodb_price['monthly_cost']
 
     elif service == 'VPC':
-        vpc_price = get_vpc_pricing()
+        vpc_price = get_vpc_pricing(usage)
         if vpc_price is not None:
             total_cost += vpc_price['monthly_cost']
 
     elif service == 'ECS':
-        ecs_price = get_ecs_pricing()
+        ecs_price = get_ecs_pricing(usage)
         if ecs_price is not None:
             total_cost += ecs_price['monthly_cost']
 
     elif service == 'EKS':
-        eks_price = get_eks_pricing()
+        eks_price = get_eks_pricing(usage)
         if eks_price is not None:
             total_cost += eks_price['control_plane_price_per_hour']
 
@@ -494,27 +840,1018 @@ def get_aws_price(service, region, instance_type):
 
     return total_cost
 
+# Terraform resource types the estimator knows how to price
+RESOURCE_SERVICES = {
+    'aws_instance': 'EC2',
+    'aws_db_instance': 'RDS',
+    'aws_s3_bucket': 'S3',
+    'aws_lambda_function': 'Lambda',
+    'aws_dynamodb_table': 'DynamoDB',
+    'aws_vpc': 'VPC',
+    'aws_ecs_service': 'ECS',
+    'aws_eks_cluster': 'EKS',
+}
+
+# Terraform engine and license_model values, as the Pricing API spells them
+RDS_ENGINES = {
+    'mysql': 'MySQL',
+    'postgres': 'PostgreSQL',
+    'mariadb': 'MariaDB',
+    'oracle-se2': 'Oracle',
+    'oracle-ee': 'Oracle',
+    'sqlserver-ex': 'SQL Server',
+    'sqlserver-web': 'SQL Server',
+    'sqlserver-se': 'SQL Server',
+    'sqlserver-ee': 'SQL Server',
+    'aurora-mysql': 'Aurora MySQL',
+    'aurora-postgresql': 'Aurora PostgreSQL',
+}
+RDS_LICENSE_MODELS = {
+    'license-included': 'License included',
+    'bring-your-own-license': 'Bring your own license',
+    'general-public-license': 'No license required',
+    'postgresql-license': 'No license required',
+}
+
+# aws_instance tenancy values mapped to the Pricing API's tenancy attribute
+EC2_TENANCIES = {
+    'default': 'Shared',
+    'dedicated': 'Dedicated',
+    'host': 'Host',
+}
+
+def _hcl_value(value):
+    """Strip the quoting and ``${}`` wrapping that python-hcl2 leaves on values."""
+    if isinstance(value, str):
+        if len(value) >= 2 and value[0] == value[-1] == '"':
+            value = value[1:-1]
+        if value.startswith('${') and value.endswith('}'):
+            value = value[2:-1]
+        return value
+    if isinstance(value, dict):
+        return {_hcl_value(key): _hcl_value(item) for key, item in value.items() if key != '__is_block__'}
+    if isinstance(value, list):
+        return [_hcl_value(item) for item in value]
+    return value
+
+def _resolve_variables(value, variables):
+    if isinstance(value, str) and value.startswith('var.') and value[4:] in variables:
+        return variables[value[4:]]
+    if isinstance(value, dict):
+        return {key: _resolve_variables(item, variables) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_resolve_variables(item, variables) for item in value]
+    return value
+
+def provider_regions(terraform_config, variables=None):
+    """
+    Return the ``region`` of each ``provider "aws"`` block of a parsed Terraform config.
+
+    Returns:
+        dict: ``{'aws': region}`` for the default configuration and
+        ``{'aws.<alias>': region}`` for aliased ones, where the region is known.
+    """
+    regions = {}
+    for provider in terraform_config.get('provider', []):
+        for name, config in provider.items():
+            config = _resolve_variables(_hcl_value(config), variables or {})
+            region = config.get('region')
+            if _hcl_value(name) != 'aws' or not isinstance(region, str) or region.startswith('var.'):
+                continue
+            regions[f"aws.{config['alias']}" if config.get('alias') else 'aws'] = region
+    return regions
+
+def iter_resources(terraform_config, variables=None, regions=None):
+    """
+    Yield the resources of a parsed Terraform config.
+
+    Args:
+        terraform_config (dict): The output of ``hcl2.load``.
+        variables (dict): Variable values substituted for ``var.<name>`` references.
+        regions (dict): Provider regions (see ``provider_regions``); a resource
+            without a ``region`` takes that of the provider it names, or the
+            default ``aws`` one.
+
+    Yields:
+        tuple: ``(address, resource_type, attributes)``.
+    """
+    for resource in terraform_config.get('resource', []):
+        for resource_type, named_resources in resource.items():
+            resource_type = _hcl_value(resource_type)
+            for name, attributes in named_resources.items():
+                attributes = _resolve_variables(_hcl_value(attributes), variables or {})
+                if regions and not attributes.get('region'):
+                    region = regions.get(str(attributes.get('provider', 'aws')))
+                    if region:
+                        attributes['region'] = region
+                yield f'{resource_type}.{_hcl_value(name)}', resource_type, attributes
+
+def config_variables(terraform_config, tfvars=None):
+    """Return variable defaults from ``variable`` blocks, overridden by ``tfvars``."""
+    variables = {}
+    for block in terraform_config.get('variable', []):
+        for name, details in block.items():
+            details = _hcl_value(details)
+            if 'default' in details:
+                variables[_hcl_value(name)] = details['default']
+    variables.update(tfvars or {})
+    return variables
+
+def load_tfvars(path):
+    """Load a ``.tfvars`` (HCL) or ``.tfvars.json`` file into a dict."""
+    with open(path, 'r') as file:
+        if path.endswith('.json'):
+            return json.load(file)
+        import hcl2
+
+        return _hcl_value(hcl2.load(file))
+
+def load_usage_file(path):
+    """
+    Load usage drivers from a YAML or JSON usage file.
+
+    The file has two optional sections::
+
+        resource_type_default_usage:
+          aws_lambda_function:
+            requests_per_day: 100000
+        resource_usage:
+          aws_lambda_function.api:
+            execution_time_seconds: 0.25
+
+    Returns:
+        dict: The parsed usage file.
+    """
+    with open(path, 'r') as file:
+        if path.endswith('.json'):
+            return json.load(file)
+        import yaml
+
+        return yaml.safe_load(file) or {}
+
+def resource_usage(address, resource_type, attributes, usage=None):
+    """
+    Work out the usage drivers for one resource.
+
+    Values are layered from lowest to highest precedence: what the Terraform
+    attributes imply, the usage file's per-type defaults, then its per-address
+    entries. Entries for a ``count``/``for_each`` block (``aws_instance.web``)
+    apply to all of its instances (``aws_instance.web[0]``), and an entry for the
+    instance itself takes precedence.
+
+    Returns:
+        dict: Usage drivers, including ``instance_type``, ``region`` and ``quantity``.
+    """
+    derived = {
+        'instance_type': attributes.get('instance_type') or attributes.get('instance_class'),
+        # Never the provider alias: that names a configuration, not a region
+        'region': attributes.get('region') or default_region(),
+        'quantity': attributes.get('count', 1) if isinstance(attributes.get('count', 1), int) else 1,
+    }
+    if resource_type == 'aws_instance':
+        tenancy = attributes.get('tenancy')
+        if tenancy:
+            derived['tenancy'] = EC2_TENANCIES.get(tenancy, tenancy)
+    elif resource_type == 'aws_db_instance':
+        engine = attributes.get('engine', DEFAULT_USAGE['engine'])
+        derived['engine'] = RDS_ENGINES.get(engine, engine)
+        license_model = attributes.get('license_model')
+        if license_model:
+            derived['license_model'] = RDS_LICENSE_MODELS.get(license_model, license_model)
+    elif resource_type == 'aws_lambda_function':
+        derived['memory_size_mb'] = attributes.get('memory_size', DEFAULT_USAGE['memory_size_mb'])
+    elif resource_type == 'aws_ecs_service':
+        if attributes.get('launch_type') == 'FARGATE':
+            derived['fargate_hours_per_day'] = 24
+        else:
+            derived['ec2_hours_per_day'] = 24
+        if isinstance(attributes.get('desired_count'), int):
+            derived['quantity'] *= attributes['desired_count']
+
+    usage = usage or {}
+    result = {key: value for key, value in derived.items() if value is not None}
+    result.update(usage.get('resource_type_default_usage', {}).get(resource_type, {}))
+    block_address = plan_json.base_address(address)
+    if block_address != address:
+        result.update(usage.get('resource_usage', {}).get(block_address, {}))
+    result.update(usage.get('resource_usage', {}).get(address, {}))
+    return result
+
+def service_pricing_keys(service, usage):
+    """Return the pricing keys ``estimate_service_cost`` will look up."""
+    if service == 'EC2':
+        return [pricing_key('AmazonEC2', ec2_filters(usage.get('instance_type'), *_ec2_dimensions(usage)))]
+    if service == 'S3':
+        storage_class = usage.get('storage_class', DEFAULT_USAGE['storage_class'])
+        return [pricing_key('AmazonS3', s3_filters(storage_class))]
+    if service == 'RDS':
+        return [pricing_key('AmazonRDS', rds_filters(
+            usage.get('instance_type'),
+            usage.get('engine', DEFAULT_USAGE['engine']),
+            usage.get('license_model', DEFAULT_USAGE['license_model']),
+        ))]
+    if service == 'Lambda':
+        return [pricing_key('AWSLambda', group_filters(group)) for group in LAMBDA_PRICE_GROUPS.values()]
+    if service == 'DynamoDB':
+        return [pricing_key('AmazonDynamoDB', [])]
+    if service == 'VPC':
+        return [pricing_key('AmazonVPC', []), pricing_key('AmazonEC2', product_family_filters('Elastic IP Addresses'))]
+    if service == 'ECS':
+        return [pricing_key('AmazonEC2', product_family_filters('Compute Instance')), pricing_key('AWSFargate', [])]
+    if service == 'EKS':
+        return [pricing_key('AmazonEKS', []), pricing_key('AmazonEC2', product_family_filters('Compute Instance'))]
+    return []
+
+def service_sku(service, usage):
+    """
+    Return the SKU of the product a resource's primary price comes from.
+
+    The product is read through the price cache, which ``prefetch_prices``
+    has already filled for every key of an estimate.
+
+    Returns:
+        str: The SKU, or None when no product matched.
+    """
+    if service == 'EC2':
+        return get_ec2_offer(usage.get('instance_type'), *_ec2_dimensions(usage))[1]
+    keys = service_pricing_keys(service, usage)
+    if not keys:
+        return None
+    service_code, filters = keys[0]
+    products = _get_products(service_code, [
+        {'Type': filter_type, 'Field': field, 'Value': value} for filter_type, field, value in filters
+    ])
+    return products[0].sku if products else None
+
+def service_price_key(service, usage):
+    """Return the hashable key of the prices a resource needs; equal keys share prices."""
+    if service == 'EC2':
+        return (service, usage.get('instance_type')) + _ec2_dimensions(usage)
+    if service == 'RDS':
+        return (
+            service,
+            usage.get('instance_type'),
+            usage.get('engine', DEFAULT_USAGE['engine']),
+            usage.get('license_model', DEFAULT_USAGE['license_model']),
+        )
+    if service == 'S3':
+        return (service, usage.get('storage_class', DEFAULT_USAGE['storage_class']))
+    return (service,)
+
+def service_price_components(service, usage):
+    """
+    Get the named prices a service formula needs (see cost_formulas.SERVICE_FORMULAS).
+
+    Usage-priced components are ``TieredRate``s when the price has volume
+    tiers. The free tier is not applied here: it is per account, so it is
+    credited once against the total (see ``free_tier_credits``).
+
+    Returns:
+        dict: The price components, or None if no price was found.
+    """
+    if service in ('EC2', 'RDS'):
+        if service == 'EC2':
+            hourly_price = get_ec2_pricing(usage.get('instance_type'), *_ec2_dimensions(usage))
+        else:
+            hourly_price = get_rds_pricing(
+                usage.get('instance_type'),
+                usage.get('engine', DEFAULT_USAGE['engine']),
+                usage.get('license_model', DEFAULT_USAGE['license_model']),
+            )
+        return {'price_per_hour': hourly_price} if hourly_price is not None else None
+
+    if service == 'S3':
+        components = s3_pricing_info(usage.get('storage_class', DEFAULT_USAGE['storage_class']))
+    else:
+        pricing_info = {
+            'Lambda': lambda_pricing_info,
+            'DynamoDB': dynamodb_pricing_info,
+            'VPC': vpc_pricing_info,
+            'ECS': ecs_pricing_info,
+            'EKS': eks_pricing_info,
+        }.get(service)
+        components = pricing_info() if pricing_info is not None else None
+    return components
+
+# Services whose resources can be covered by Reserved commitments
+COMMITMENT_SERVICE_CODES = {
+    'EC2': 'AmazonEC2',
+    'RDS': 'AmazonRDS',
+}
+
+def commitment_options(service, usage):
+    """
+    Return the Reserved offers for the SKU a resource is priced on.
+
+    Only the local price catalog is consulted: the SKU comes from the product
+    the On-Demand price was read from (already memoized), and the offers from
+    the catalog's precomputed ``commitment_rates``, so this never calls the API.
+
+    Returns:
+        list: Offers, cheapest effective hourly rate first (see
+        ``PriceCatalog.commitment_rates``); empty without catalog data.
+    """
+    catalog = get_price_catalog()
+    service_code = COMMITMENT_SERVICE_CODES.get(service)
+    if catalog is None or service_code not in catalog.services():
+        return []
+    sku = service_sku(service, usage)
+    return catalog.commitment_rates(sku) if sku else []
+
+def compare_commitments(service, usage, on_demand_price_per_hour):
+    """
+    Compare a resource's On-Demand cost with every Reserved offer for it.
+
+    Args:
+        service (str): ``EC2`` or ``RDS``.
+        usage (dict): Usage drivers (``hours_per_day``, ``quantity``, ...).
+        on_demand_price_per_hour (float): The On-Demand rate the resource is costed at.
+
+    Returns:
+        dict: The cheapest offer with its ``monthly_cost``, ``monthly_savings``
+        over On-Demand, ``break_even_utilization`` and the resource's own
+        ``utilization``, plus every offer under ``options``; None if there are
+        no offers.
+    """
+    options = commitment_options(service, usage)
+    if not options or not on_demand_price_per_hour:
+        return None
+    hours_per_day = _usage_value(usage, 'hours_per_day', float, None)
+    quantity = usage.get('quantity', 1)
+    on_demand_monthly_cost = cost_formulas.hourly_monthly_cost(hours_per_day, on_demand_price_per_hour) * quantity
+    compared = []
+    for option in options:
+        monthly_cost = cost_formulas.commitment_monthly_cost(option['effective_hourly_usd']) * quantity
+        compared.append({
+            **option,
+            'monthly_cost': monthly_cost,
+            'monthly_savings': on_demand_monthly_cost - monthly_cost,
+            'break_even_utilization': cost_formulas.break_even_utilization(
+                option['effective_hourly_usd'], on_demand_price_per_hour
+            ),
+        })
+    return {**compared[0], 'utilization': hours_per_day / 24, 'options': compared}
+
+def sweep_usage(service, usage, driver, values):
+    """
+    Cost one resource across many values of a usage driver (a what-if sweep).
+
+    Prices are looked up once and tiers are evaluated for all values together.
+
+    Args:
+        service (str): One of the ``RESOURCE_SERVICES`` values.
+        usage (dict): Usage drivers of the resource.
+        driver (str): The driver to vary, e.g. ``storage_gb``.
+        values (list): The values to cost it at.
+
+    Returns:
+        list: The monthly cost at each value, or None if no price was found.
+    """
+    import cost_engine
+
+    components = service_price_components(service, usage)
+    if components is None:
+        return None
+    return cost_engine.sweep(cost_formulas.SERVICE_FORMULAS[service], usage, components, driver, values, DEFAULT_USAGE)
+
+def estimate_service_cost(service, usage):
+    """
+    Estimate the monthly cost of one unit of a service without prompting.
+
+    Args:
+        service (str): One of the ``RESOURCE_SERVICES`` values.
+        usage (dict): Usage drivers; missing ones fall back to ``DEFAULT_USAGE``.
+
+    Returns:
+        dict: ``monthly_cost``, ``unit_price`` and ``details`` (the price
+        components and usage drivers used), or None if no price was found.
+    """
+    components = service_price_components(service, usage)
+    if components is None:
+        return None
+    formula = cost_formulas.SERVICE_FORMULAS[service]
+    drivers = {name: _usage_value(usage, name, cast, None) for name, cast in formula.drivers}
+    monthly_cost = formula.function(*drivers.values(), *[components[name] for name in formula.prices])
+    return {
+        'monthly_cost': monthly_cost,
+        'unit_price': tiered_pricing.unit_price(components[formula.prices[0]]) if len(formula.prices) == 1 else None,
+        'details': {**components, **drivers},
+    }
+
+def estimate_resources(resources, usage=None, max_concurrency=pricing_fetch.DEFAULT_MAX_CONCURRENCY,
+                       vectorized=False):
+    """
+    Cost many Terraform resources in one batch, without any prompts.
+
+    Args:
+        resources (iterable): ``(address, resource_type, attributes)`` tuples,
+            e.g. from ``iter_resources``, optionally followed by a location dict
+            (``module``, ``file``) that is copied onto the line item.
+        usage (dict): A parsed usage file (see ``load_usage_file``).
+        max_concurrency (int): Upper bound on Pricing API requests in flight.
+        vectorized (bool): Compute all line items column-wise with the cost
+            engine instead of one resource at a time. Costs are identical.
+
+    Returns:
+        dict: ``resources`` (one line item per priced resource), ``skipped``
+        (addresses of unsupported resource types), ``errors``,
+        ``total_monthly_cost`` (after the account's free tier credit) and
+        ``free_tier`` (see ``free_tier_credits``).
+    """
+    with tracing.span('build_requests', 'aggregate'):
+        requests, skipped = _build_requests(resources, usage)
+
+    # Resolve all unique prices in parallel first; costing below then hits the cache
+    prefetch_prices(_request_pricing_keys(requests), max_concurrency)
+
+    line_items = []
+    errors = []
+    with tracing.span('cost_line_items', 'aggregate', resources=len(requests), vectorized=vectorized):
+        for kind, entry in _iter_line_items(requests, vectorized):
+            (line_items if kind == 'resource' else errors).append(entry)
+
+    with tracing.span('totals', 'aggregate'):
+        free_tier = free_tier_credits(line_items)
+        return {
+            'resources': line_items,
+            'skipped': skipped,
+            'errors': errors,
+            'total_monthly_cost': sum(item['monthly_cost'] for item in line_items) - free_tier['credit'],
+            'total_monthly_cost_with_commitments':
+                sum(_best_monthly_cost(item) for item in line_items) - free_tier['credit'],
+            'free_tier_credit': free_tier['credit'],
+            'free_tier': free_tier['services'],
+        }
+
+def free_tier_credits(line_items):
+    """
+    Credit the account's monthly free tier against a set of line items.
+
+    Line items priced with ``free_tier`` set carry their ``free_tier_usage``;
+    each allowance is shared by all of them and used up in line item order
+    (see ``tiered_pricing.free_tier_credit``). Line item costs themselves are
+    never reduced, only the total.
+
+    Returns:
+        dict: ``credit`` (the total to subtract) and ``services``, holding
+        ``{component: {quantity, allowance, credit}}`` per service.
+    """
+    usages = {}
+    for item in line_items:
+        for name, entry in (item.get('free_tier_usage') or {}).items():
+            usages.setdefault((item['service'], name), []).append(
+                (entry['rate'], entry['quantity'], entry['resources']))
+    services = {}
+    total = 0.0
+    for (service, name), entries in usages.items():
+        allowance = tiered_pricing.FREE_TIER_ALLOWANCES[service][name]
+        credit = tiered_pricing.free_tier_credit(allowance, entries)
+        services.setdefault(service, {})[name] = {
+            'quantity': sum(quantity * resources for _, quantity, resources in entries),
+            'allowance': allowance,
+            'credit': credit,
+        }
+        total += credit
+    return {'credit': total, 'services': services}
+
+def _free_tier_usage(service, usage, components):
+    # What each of the resource's instances uses of a component with a free tier allowance, and its rate
+    allowances = tiered_pricing.FREE_TIER_ALLOWANCES.get(service)
+    if not allowances or not usage.get('free_tier'):
+        return None
+    formula = cost_formulas.SERVICE_FORMULAS[service]
+    drivers = [_usage_value(usage, name, cast, None) for name, cast in formula.drivers]
+    quantities = cost_formulas.component_quantities(service, drivers, allowances)
+    return {
+        name: {'quantity': quantities[name], 'resources': usage.get('quantity', 1), 'rate': components[name]}
+        for name in allowances if name in components
+    }
+
+def _best_monthly_cost(line_item):
+    commitment = line_item.get('commitment')
+    if commitment is None:
+        return line_item['monthly_cost']
+    return min(line_item['monthly_cost'], commitment['monthly_cost'])
+
+def _build_requests(resources, usage):
+    requests = []
+    skipped = []
+    for address, resource_type, attributes, *location in resources:
+        service = RESOURCE_SERVICES.get(resource_type)
+        if service is None:
+            skipped.append(address)
+            continue
+        requests.append((address, resource_type, service, attributes,
+                         resource_usage(address, resource_type, attributes, usage),
+                         location[0] if location else {}))
+    return requests, skipped
+
+def _iter_line_items(requests, vectorized=False):
+    """Yield ``('resource', line_item)`` or ``('error', error)`` for each request, in order."""
+    if vectorized:
+        estimates = _estimate_vectorized(requests)
+    else:
+        estimates = (_estimate_scalar(request) for request in requests)
+
+    # Resources with equal price keys are priced on the same product
+    skus = {}
+    for (address, resource_type, service, attributes, resource_usage_values, location), (estimate, error) in zip(requests, estimates):
+        if error is not None:
+            yield 'error', {'address': address, 'error': error, **location}
+            continue
+        line_item = {
+            **location,
+            'address': address,
+            'resource_type': resource_type,
+            'service': service,
+            'sku': _line_item_sku(skus, service, resource_usage_values),
+            'region': resource_usage_values.get('region'),
+            'quantity': resource_usage_values.get('quantity', 1),
+            'unit_price': estimate['unit_price'],
+            'monthly_cost': estimate['monthly_cost'],
+            'usage': resource_usage_values,
+            'tags': attributes.get('tags') or {},
+            'details': estimate['details'],
+        }
+        if service in COMMITMENT_SERVICE_CODES:
+            line_item['commitment'] = compare_commitments(service, resource_usage_values, estimate['unit_price'])
+        free_tier_usage = _free_tier_usage(service, resource_usage_values, estimate['details'])
+        if free_tier_usage:
+            line_item['free_tier_usage'] = free_tier_usage
+        yield 'resource', line_item
+
+def _line_item_sku(skus, service, usage):
+    price_key = service_price_key(service, usage)
+    if price_key not in skus:
+        skus[price_key] = service_sku(service, usage)
+    return skus[price_key]
+
+def _request_pricing_keys(requests):
+    return list(dict.fromkeys(key for request in requests for key in service_pricing_keys(request[2], request[4])))
+
+def collect_pricing_keys(resources, usage=None):
+    """
+    Return every distinct pricing key ``estimate_resources`` would look up.
+
+    Args:
+        resources (iterable): As accepted by ``estimate_resources``.
+        usage (dict): A parsed usage file.
+
+    Returns:
+        list: Keys built with ``pricing_key``, without duplicates.
+    """
+    return _request_pricing_keys(_build_requests(resources, usage)[0])
+
+def _estimate_scalar(request):
+    service, resource_usage_values = request[2], request[4]
+    try:
+        estimate = estimate_service_cost(service, resource_usage_values)
+    except Exception as e:
+        return None, str(e)
+    if estimate is None:
+        return None, 'no price found'
+    estimate['monthly_cost'] = estimate['monthly_cost'] * resource_usage_values.get('quantity', 1)
+    return estimate, None
+
+def _estimate_vectorized(requests):
+    import cost_engine
+
+    with tracing.span('cost_engine', 'aggregate', resources=len(requests)):
+        costs, components, errors = cost_engine.evaluate(
+            [(request[2], request[4]) for request in requests],
+            service_price_key,
+            service_price_components,
+            DEFAULT_USAGE,
+        )
+    estimates = []
+    for row, request in enumerate(requests):
+        if row in errors:
+            estimates.append((None, errors[row]))
+            continue
+        prices = cost_formulas.SERVICE_FORMULAS[request[2]].prices
+        estimates.append(({
+            'monthly_cost': costs[row],
+            'unit_price': tiered_pricing.unit_price(components[row][prices[0]]) if len(prices) == 1 else None,
+            'details': components[row],
+        }, None))
+    return estimates
+
+def estimate_terraform_file(terraform_file, usage=None, tfvars=None,
+                            max_concurrency=pricing_fetch.DEFAULT_MAX_CONCURRENCY, use_parse_cache=True):
+    """
+    Parse a Terraform file and cost every supported resource in it.
+
+    Args:
+        terraform_file (str): Path to a ``.tf`` file.
+        usage (dict): A parsed usage file (see ``load_usage_file``).
+        tfvars (dict): Variable values, e.g. from ``load_tfvars``.
+        max_concurrency (int): Upper bound on Pricing API requests in flight.
+        use_parse_cache (bool): Reuse the parse result if the file is unchanged.
+
+    Returns:
+        dict: The structured result of ``estimate_resources``, plus
+        ``parse_errors``. A file that fails to parse is reported there, as
+        ``estimate_directory`` does, rather than raised.
+    """
+    cache = get_parse_cache() if use_parse_cache else None
+    configs, _ = terraform_parse.parse_files([terraform_file], 1, cache)
+    terraform_config = configs[terraform_file]
+    if isinstance(terraform_config, Exception):
+        result = estimate_resources([], usage, max_concurrency)
+        result['parse_errors'] = [{'file': terraform_file, 'error': str(terraform_config)}]
+        return result
+    variables = config_variables(terraform_config, tfvars)
+    regions = provider_regions(terraform_config, variables)
+    result = estimate_resources(iter_resources(terraform_config, variables, regions), usage, max_concurrency)
+    result['parse_errors'] = []
+    return result
+
+def estimate_plan_file(plan_file, usage=None, max_concurrency=pricing_fetch.DEFAULT_MAX_CONCURRENCY,
+                       vectorized=False):
+    """
+    Cost the resources of a Terraform plan (``terraform show -json`` output).
+
+    Unlike raw HCL, a plan has ``count``, ``for_each``, variables and modules
+    already expanded. ``resource_changes`` is streamed, and instances of one
+    block that price identically are aggregated into a single line item with
+    a ``quantity``, rather than priced once per instance.
+
+    Args:
+        plan_file (str): Path to the plan JSON.
+        usage (dict): A parsed usage file (see ``load_usage_file``).
+        max_concurrency (int): Upper bound on Pricing API requests in flight.
+        vectorized (bool): Use the vectorized cost engine.
+
+    Returns:
+        dict: The result of ``estimate_resources``, plus ``plan_stats`` with the
+        number of instances read and groups priced.
+    """
+    resources, plan_stats = _plan_resources(plan_file, usage)
+    result = estimate_resources(resources, usage, max_concurrency, vectorized)
+    result['plan_stats'] = plan_stats
+    return result
+
+def _plan_resources(plan_file, usage):
+    def group_key(address, resource_type, attributes):
+        return json.dumps(resource_usage(address, resource_type, attributes, usage), sort_keys=True, default=str)
+
+    return plan_json.aggregate_instances(plan_json.iter_planned_resources(plan_file), group_key)
+
+def estimate_directory(root, usage=None, tfvars=None, workers=None, use_parse_cache=True,
+                       max_concurrency=pricing_fetch.DEFAULT_MAX_CONCURRENCY, vectorized=False):
+    """
+    Cost every ``.tf`` file under a directory (a workspace with its modules).
+
+    Files are parsed across a process pool, and parse results are cached by
+    content hash so unchanged files are skipped on the next run. Each
+    directory is treated as one module: its variable defaults apply to its
+    own files, and ``tfvars`` apply to the root module.
+
+    Args:
+        root (str): Workspace directory (or a single ``.tf`` file).
+        usage (dict): A parsed usage file (see ``load_usage_file``).
+        tfvars (dict): Root module variable values, e.g. from ``load_tfvars``.
+        workers (int): Parser processes, defaults to the CPU count.
+        use_parse_cache (bool): Reuse parse results of unchanged files.
+        max_concurrency (int): Upper bound on Pricing API requests in flight.
+        vectorized (bool): Use the vectorized cost engine.
+
+    Returns:
+        dict: The result of ``estimate_resources`` (line items carry ``module``
+        and ``file``), plus ``by_file``, ``by_module``, ``parse_errors`` and
+        ``parse_stats``.
+    """
+    resources, parse_errors, parse_stats = load_workspace_resources(root, tfvars, workers, use_parse_cache)
+    result = estimate_resources(resources, usage, max_concurrency, vectorized)
+    with tracing.span('subtotals', 'aggregate'):
+        result['by_file'] = _subtotals(result['resources'], 'file')
+        result['by_module'] = _subtotals(result['resources'], 'module')
+    result['parse_errors'] = parse_errors
+    result['parse_stats'] = parse_stats
+    return result
+
+def load_workspace_resources(root, tfvars=None, workers=None, use_parse_cache=True):
+    """
+    Parse a workspace (see ``estimate_directory``) and list its resources.
+
+    Returns:
+        tuple: ``(resources, parse_errors, parse_stats)``, where each resource is
+        an ``(address, resource_type, attributes, location)`` tuple.
+    """
+    paths = terraform_parse.find_terraform_files(root)
+    cache = get_parse_cache() if use_parse_cache else None
+    configs, parse_stats = terraform_parse.parse_files(paths, workers, cache)
+
+    parse_errors = []
+    modules = {}
+    for path in paths:
+        config = configs[path]
+        if isinstance(config, Exception):
+            parse_errors.append({'file': path, 'error': str(config)})
+            continue
+        modules.setdefault(terraform_parse.module_name(path, root), []).append((path, config))
+
+    with tracing.span('collect_resources', 'parse', modules=len(modules)):
+        resources = _module_resources(modules, tfvars)
+    return resources, parse_errors, parse_stats
+
+def _module_variables(files, tfvars):
+    variables = {}
+    for _, config in files:
+        variables.update(config_variables(config))
+    variables.update(tfvars or {})
+    return variables
+
+def _module_regions(files, variables, inherited):
+    # A module without its own default provider inherits the root module's, as in Terraform
+    regions = dict(inherited)
+    for _, config in files:
+        regions.update(provider_regions(config, variables))
+    return regions
+
+def _module_resources(modules, tfvars):
+    root_files = modules.get('.', [])
+    root_regions = _module_regions(root_files, _module_variables(root_files, tfvars), {})
+    inherited = {'aws': root_regions['aws']} if 'aws' in root_regions else {}
+    resources = []
+    for module, files in modules.items():
+        variables = _module_variables(files, tfvars if module == '.' else None)
+        regions = root_regions if module == '.' else _module_regions(files, variables, inherited)
+        for path, config in files:
+            location = {'module': module, 'file': path}
+            resources.extend(
+                (address, resource_type, attributes, location)
+                for address, resource_type, attributes in iter_resources(config, variables, regions)
+            )
+    return resources
+
+def estimate_incremental(path, state_path, usage=None, tfvars=None, workers=None,
+                         max_concurrency=pricing_fetch.DEFAULT_MAX_CONCURRENCY):
+    """
+    Re-estimate a workspace or plan, re-pricing only what changed since the last run.
+
+    The previous run's line items are kept in ``state_path``, keyed by resource
+    address and a hash of each resource's type, attributes and usage. Resources
+    whose hash is unchanged reuse their stored line item; added and changed ones
+    are priced; removed ones are dropped. After a catalog refresh every resource
+    is repriced, since every stored price may have moved, but the diff is still
+    taken against the previous run. The state is not saved when the
+    configuration fails to parse, so a broken run cannot erase it.
+
+    Args:
+        path (str): Workspace directory, single ``.tf`` file or plan JSON.
+        state_path (str): JSON file holding the previous run's breakdown.
+        usage (dict): A parsed usage file (see ``load_usage_file``).
+        tfvars (dict): Root module variable values.
+        workers (int): Parser processes, defaults to the CPU count.
+        max_concurrency (int): Upper bound on Pricing API requests in flight.
+
+    Returns:
+        dict: ``resources`` (all current line items), ``total_monthly_cost``,
+        ``previous_total_monthly_cost``, ``delta_monthly_cost``, the
+        ``added``/``changed``/``removed`` keys, ``line_item_deltas`` and
+        ``repriced``/``reused`` counts.
+    """
+    catalog = get_price_catalog()
+    price_version = catalog.get_meta('refreshed_at') if catalog is not None else None
+    state = incremental.load_state(state_path)
+    previous = state['resources']
+
+    resources, parse_errors, extra = load_resources(path, usage, tfvars, workers)
+    current = {}
+    for resource in resources:
+        address, resource_type, attributes, location = resource
+        if resource_type not in RESOURCE_SERVICES:
+            continue
+        digest = incremental.fingerprint(resource_type, attributes, resource_usage(address, resource_type, attributes, usage))
+        current[incremental.resource_key(address, location)] = (digest, resource)
+
+    changes = incremental.diff_resources(previous, {key: digest for key, (digest, _) in current.items()})
+    # Stored line items are only reusable if they were priced from the same catalog
+    reprice_all = state['price_version'] != price_version
+    to_price = list(current) if reprice_all else changes['added'] + changes['changed']
+    priced = estimate_resources([current[key][1] for key in to_price], usage, max_concurrency)
+    priced_items = {incremental.resource_key(item['address'], item): item for item in priced['resources']}
+
+    new_state = {
+        'version': incremental.STATE_VERSION,
+        'price_version': price_version,
+        'resources': {},
+    }
+    line_items = []
+    for key, (digest, _) in current.items():
+        if reprice_all or key not in previous or previous[key]['fingerprint'] != digest:
+            item = priced_items.get(key)  # None if it failed to price; retried next run
+        else:
+            item = previous[key]['line_item']
+        if item is None:
+            continue
+        line_items.append(item)
+        new_state['resources'][key] = {'fingerprint': digest, 'line_item': item}
+
+    total = sum(item['monthly_cost'] for item in line_items) - free_tier_credits(line_items)['credit']
+    new_state['total_monthly_cost'] = total
+    previous_total = state['total_monthly_cost']
+    if not parse_errors:
+        incremental.save_state(state_path, new_state)
+
+    unchanged = set(changes['unchanged'])
+    line_item_deltas = []
+    for key in to_price + changes['removed']:
+        before = previous.get(key, {}).get('line_item')
+        after = new_state['resources'].get(key, {}).get('line_item')
+        if before is None and after is None:
+            continue
+        before_cost = before['monthly_cost'] if before else 0.0
+        after_cost = after['monthly_cost'] if after else 0.0
+        if key in unchanged and after_cost == before_cost:
+            continue  # Repriced after a catalog refresh, but the price did not move
+        line_item_deltas.append({'key': key, 'before': before_cost, 'after': after_cost, 'delta': after_cost - before_cost})
+
+    return {
+        'resources': line_items,
+        'total_monthly_cost': total,
+        'previous_total_monthly_cost': previous_total,
+        'delta_monthly_cost': total - previous_total,
+        'added': changes['added'],
+        'changed': changes['changed'],
+        'removed': changes['removed'],
+        'line_item_deltas': line_item_deltas,
+        'repriced': len(to_price),
+        'reused': len(current) - len(to_price),
+        'errors': priced['errors'],
+        'parse_errors': parse_errors,
+        'state_saved': not parse_errors,
+        **extra,
+    }
+
+def _subtotals(line_items, field):
+    totals = {}
+    for item in line_items:
+        totals[item[field]] = totals.get(item[field], 0.0) + item['monthly_cost']
+    return totals
+
 # Function to calculate estimated cost from Terraform config
-def calculate_cost(terraform_file):
-    with open(terraform_file, 'r') as file:
-        terraform_config = hcl2.load(file)
-
-    total_cost = 0.0
-    
-    # Iterate through resources
-    for resource in terraform_config.get('resource', {}):
-        for resource_type, resource_details in resource.items():
-            # Extract details for EC2 instances as an example
-            if resource_type == 'aws_instance':
-                instance_type = resource_details['instance_type']
-                region = resource_details['provider'].split('.')[-1]  # Assuming provider is specified
-                # Call the pricing function
-                cost = get_aws_price('EC2', region, instance_type)
-                total_cost += cost  # You would need to multiply by count or hours, etc.
+def estimate(path, usage=None, tfvars=None, max_concurrency=pricing_fetch.DEFAULT_MAX_CONCURRENCY):
+    """
+    Cost a ``.tf`` file, a workspace directory or a plan JSON file.
 
-    return total_cost
+    Returns:
+        dict: The structured result of ``estimate_terraform_file``,
+        ``estimate_directory`` or ``estimate_plan_file``.
+    """
+    # A directory is estimated as a whole workspace, modules included
+    if path.endswith('.json'):
+        return estimate_plan_file(path, usage, max_concurrency)
+    if os.path.isdir(path):
+        return estimate_directory(path, usage, tfvars, max_concurrency=max_concurrency)
+    return estimate_terraform_file(path, usage, tfvars, max_concurrency)
+
+def stream_estimate(path, usage=None, tfvars=None, max_concurrency=pricing_fetch.DEFAULT_MAX_CONCURRENCY):
+    """
+    Estimate like ``estimate``, yielding each line item as soon as it is costed.
+
+    Prices are still resolved up front, in parallel, before the first line item.
+
+    Yields:
+        dict: Events tagged by ``type``: ``parse_error``, ``resource`` (a line
+        item), ``error``, and finally one ``summary`` with the total.
+    """
+    resources, parse_errors, extra = load_resources(path, usage, tfvars)
+    for parse_error in parse_errors:
+        yield {'type': 'parse_error', **parse_error}
+
+    with tracing.span('build_requests', 'aggregate'):
+        requests, skipped = _build_requests(resources, usage)
+    prefetch_prices(_request_pricing_keys(requests), max_concurrency)
+
+    total = 0.0
+    counts = {'resource': 0, 'error': 0}
+    # Only what the free tier credit needs is kept, not the line items
+    free_tier_items = []
+    for kind, entry in _iter_line_items(requests):
+        counts[kind] += 1
+        if kind == 'resource':
+            total += entry['monthly_cost']
+            if 'free_tier_usage' in entry:
+                free_tier_items.append({'service': entry['service'], 'free_tier_usage': entry['free_tier_usage']})
+        yield {'type': kind, **entry}
+    free_tier = free_tier_credits(free_tier_items)
+    yield {'type': 'summary', 'total_monthly_cost': total - free_tier['credit'], 'resources': counts['resource'],
+           'errors': counts['error'], 'skipped': skipped, 'free_tier_credit': free_tier['credit'], **extra}
+
+def load_resources(path, usage=None, tfvars=None, workers=None):
+    """
+    List the resources of a ``.tf`` file, a workspace directory or a plan JSON file.
 
-# Example usage
-terraform_file = 'path/to/your/terraform.tf'  # Specify your Terraform file path
-estimated_cost = calculate_cost(terraform_file)
-print(f'Estimated Monthly Cost: ${estimated_cost:.2f}')
+    Returns:
+        tuple: ``(resources, parse_errors, stats)``, where ``stats`` is
+        ``{'plan_stats': ...}`` for a plan and ``{'parse_stats': ...}`` otherwise.
+    """
+    if path.endswith('.json'):
+        resources, plan_stats = _plan_resources(path, usage)
+        return resources, [], {'plan_stats': plan_stats}
+    resources, parse_errors, parse_stats = load_workspace_resources(path, tfvars, workers)
+    return resources, parse_errors, {'parse_stats': parse_stats}
+
+def calculate_cost(terraform_file, usage=None, tfvars=None, max_concurrency=pricing_fetch.DEFAULT_MAX_CONCURRENCY):
+    return estimate(terraform_file, usage, tfvars, max_concurrency)['total_monthly_cost']
+
+def _print_estimate(result):
+    for item in result['resources']:
+        print(f"{item['address']:<60} {item['service']:<10} ${item['monthly_cost']:>12.2f}")
+        commitment = item.get('commitment')
+        if commitment is not None:
+            offer = ' '.join(filter(None, (commitment['lease_contract_length'], commitment['purchase_option'],
+                                           commitment['offering_class'])))
+            print(f"{'':<4}cheapest commitment: {offer} ${commitment['monthly_cost']:.2f}/month, break-even at "
+                  f"{commitment['break_even_utilization']:.0%} utilization (running {commitment['utilization']:.0%})")
+    for error in result['errors']:
+        print(f"{error['address']:<60} error: {error['error']}")
+    for parse_error in result.get('parse_errors', []):
+        print(f"{parse_error['file']:<60} parse error: {parse_error['error']}")
+    if result.get('skipped'):
+        print(f"Skipped {len(result['skipped'])} unsupported resources")
+    if result.get('free_tier_credit'):
+        print(f"Free tier credit: -${result['free_tier_credit']:.2f}")
+    print(f"Estimated Monthly Cost: ${result['total_monthly_cost']:.2f}")
+    if result.get('total_monthly_cost_with_commitments', result['total_monthly_cost']) < result['total_monthly_cost']:
+        print(f"With the cheapest commitments where they pay off: ${result['total_monthly_cost_with_commitments']:.2f}")
+    if 'delta_monthly_cost' in result:
+        print(f"Change since the previous run: ${result['delta_monthly_cost']:+.2f} "
+              f"({result['repriced']} repriced, {result['reused']} reused)")
+        if not result['state_saved']:
+            print("State not saved because of parse errors; the next run compares against the previous state.")
+    resolver_stats = price_resolver.stats()
+    print(f"Price lookups: {resolver_stats['hits']} hits, {resolver_stats['negative_hits']} negative hits, "
+          f"{resolver_stats['misses']} misses, {resolver_stats['evictions']} evictions")
+
+def main(argv=None):
+    """
+    Command line entry point.
+
+    ``estimate`` costs a file, workspace or plan; ``catalog`` manages the local
+    price catalog (see ``price_catalog.main``).
+
+    Returns:
+        int: The process exit status.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Estimate the monthly AWS cost of Terraform configuration.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    estimate_parser = subparsers.add_parser('estimate', help='Estimate a .tf file, a workspace directory or a plan JSON')
+    estimate_parser.add_argument('path', help='Terraform file, workspace directory or `terraform show -json` output')
+    estimate_parser.add_argument('--usage', help='YAML or JSON usage file')
+    estimate_parser.add_argument('--tfvars', help='.tfvars or .tfvars.json file for the root module')
+    estimate_parser.add_argument('--state', help='Reprice only what changed since the breakdown saved here')
+    estimate_parser.add_argument('--concurrency', type=int, default=pricing_fetch.DEFAULT_MAX_CONCURRENCY,
+                                 help='Maximum Pricing API requests in flight')
+    estimate_parser.add_argument('--json', action='store_true', help='Print the full result as JSON')
+    estimate_parser.add_argument('--export', help='Write the line items to a .csv, .jsonl or .parquet file')
+    estimate_parser.add_argument('--dataset', help='Append the line items to a partitioned Parquet dataset here')
+    estimate_parser.add_argument('--stack', help='Stack name of the run in --dataset (default: the path name)')
+    estimate_parser.add_argument('--profile', action='store_true',
+                                 help='Print where the time went (parse, pricing, costing) to stderr')
+    estimate_parser.add_argument('--trace-file', help='Write a Chrome trace (chrome://tracing, Perfetto) here; '
+                                                      'implies --profile')
+    subparsers.add_parser('catalog', help='Manage the local price catalog (refresh, ingest, status)')
+
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv[:1] == ['catalog']:
+        return price_catalog.main(argv[1:])
+    args = parser.parse_args(argv)
+
+    usage = load_usage_file(args.usage) if args.usage else None
+    tfvars = load_tfvars(args.tfvars) if args.tfvars else None
+    tracer = tracing.enable() if args.profile or args.trace_file else None
+    try:
+        with tracing.span('estimate', 'estimate', path=args.path):
+            if args.state:
+                result = estimate_incremental(args.path, args.state, usage, tfvars, max_concurrency=args.concurrency)
+            else:
+                result = estimate(args.path, usage, tfvars, args.concurrency)
+    finally:
+        tracing.disable()
+    if tracer is not None:
+        print(tracer.format_summary(), file=sys.stderr)
+        if args.trace_file:
+            tracer.write_chrome_trace(args.trace_file)
+
+    if args.export or args.dataset:
+        import cost_export
+
+        if args.export:
+            cost_export.export_line_items(result['resources'], args.export)
+        if args.dataset:
+            stack = args.stack or os.path.basename(os.path.normpath(os.path.abspath(args.path)))
+            cost_export.append_run(result['resources'], args.dataset, stack)
+
+    if args.json:
+        print(json.dumps(result, indent=2, default=str))
+    else:
+        _print_estimate(result)
+    return 1 if result['errors'] or result.get('parse_errors') else 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
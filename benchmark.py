@@ -0,0 +1,496 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from offer_ingest import peak_rss_mb
+
+DEFAULT_SIZES = [10, 1000, 10000, 100000]
+RESOURCES_PER_FILE = 500
+
+EC2_INSTANCE_TYPES = ['t3.micro', 't3.medium', 'm5.large', 'm5.xlarge', 'c5.2xlarge', 'r5.4xlarge']
+RDS_INSTANCE_CLASSES = ['db.t3.micro', 'db.t3.medium', 'db.m5.large', 'db.r5.xlarge']
+RDS_ENGINES = ['mysql', 'postgres', 'mariadb']
+REGIONS = ['us-east-1', 'us-west-2', 'eu-west-1']
+
+
+def _resource_block(resource_type, name, rng):
+    if resource_type == 'aws_instance':
+        body = [f'instance_type = "{rng.choice(EC2_INSTANCE_TYPES)}"', 'ami = "ami-12345678"']
+    elif resource_type == 'aws_db_instance':
+        body = [f'instance_class = "{rng.choice(RDS_INSTANCE_CLASSES)}"', f'engine = "{rng.choice(RDS_ENGINES)}"',
+                'allocated_storage = 20']
+    elif resource_type == 'aws_s3_bucket':
+        body = [f'bucket = "bench-{name}"']
+    elif resource_type == 'aws_lambda_function':
+        body = [f'function_name = "{name}"', f'memory_size = {rng.choice([128, 256, 512, 1024])}']
+    elif resource_type == 'aws_dynamodb_table':
+        body = [f'name = "{name}"', 'hash_key = "id"']
+    elif resource_type == 'aws_ecs_service':
+        body = [f'name = "{name}"', f'launch_type = "{rng.choice(["FARGATE", "EC2"])}"',
+                f'desired_count = {rng.randint(1, 4)}']
+    else:
+        body = [f'name = "{name}"']
+    body.append(f'region = "{rng.choice(REGIONS)}"')
+    lines = '\n'.join(f'  {line}' for line in body)
+    return f'resource "{resource_type}" "{name}" {{\n{lines}\n}}\n'
+
+
+# Relative frequency of each resource type in a generated workspace
+RESOURCE_MIX = [
+    ('aws_instance', 40),
+    ('aws_db_instance', 10),
+    ('aws_s3_bucket', 15),
+    ('aws_lambda_function', 15),
+    ('aws_dynamodb_table', 10),
+    ('aws_ecs_service', 8),
+    ('aws_eks_cluster', 2),
+]
+
+
+def generate_workspace(directory, n_resources, resources_per_file=RESOURCES_PER_FILE, seed=0):
+    """
+    Write a synthetic Terraform workspace of ``n_resources`` resources.
+
+    Resources are spread over files of ``resources_per_file`` blocks, and over
+    one module directory per ten files, so parsing and module grouping scale
+    the way a real monorepo would.
+
+    Returns:
+        dict: A usage file (see ``aws_estimator.load_usage_file``) for the workspace.
+    """
+    rng = random.Random(seed)
+    types = [resource_type for resource_type, _ in RESOURCE_MIX]
+    weights = [weight for _, weight in RESOURCE_MIX]
+    usage = {
+        'resource_type_default_usage': {
+            'aws_s3_bucket': {'storage_gb': 100},
+            'aws_lambda_function': {'requests_per_day': 10000, 'execution_time_seconds': 0.2},
+            'aws_dynamodb_table': {'reads_per_month': 1000000, 'writes_per_month': 100000, 'data_transfer_gb': 5},
+            'aws_ecs_service': {'hours_per_day': 24},
+            'aws_eks_cluster': {'worker_node_hours_per_day': 24},
+        },
+        'resource_usage': {},
+    }
+
+    for file_index, start in enumerate(range(0, n_resources, resources_per_file)):
+        module = os.path.join(directory, f'module_{file_index // 10:04d}') if file_index >= 10 else directory
+        os.makedirs(module, exist_ok=True)
+        blocks = []
+        for position in range(start, min(start + resources_per_file, n_resources)):
+            resource_type = rng.choices(types, weights)[0]
+            name = f'r{position:07d}'
+            blocks.append(_resource_block(resource_type, name, rng))
+            if resource_type == 'aws_instance' and rng.random() < 0.25:
+                usage['resource_usage'][f'{resource_type}.{name}'] = {'hours_per_day': rng.choice([8, 12, 16])}
+        with open(os.path.join(module, f'main_{file_index:04d}.tf'), 'w') as file:
+            file.write('\n'.join(blocks))
+    return usage
+
+
+def make_pricing_client(latency_seconds, recording=None, throttle_rate=0.0):
+    from pricing_stub import ReplayPricingClient, StubPricingClient
+
+    if recording:
+        return ReplayPricingClient(recording, latency_seconds=latency_seconds, throttle_rate=throttle_rate, seed=0)
+    return StubPricingClient(latency_seconds=latency_seconds, throttle_rate=throttle_rate, seed=0)
+
+
+def run_single(n_resources, latency_seconds=0.05, max_concurrency=8, recording=None, workers=None,
+               vectorized=False, throttle_rate=0.0):
+    """
+    Estimate one generated workspace end to end against the pricing stub.
+
+    Nothing is cached across runs: the price catalog is disabled, the resolver
+    starts empty and files are always parsed.
+
+    Returns:
+        dict: Wall-clock seconds per phase (``parse``, ``pricing``,
+        ``arithmetic``) and end to end, Pricing API calls, peak RSS and the total.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        # Must be set before the estimator first opens the catalog
+        os.environ['AWS_ESTIMATOR_CATALOG'] = os.path.join(directory, 'no-catalog.sqlite3')
+        import aws_estimator
+        from price_resolver import PriceResolver
+
+        client = make_pricing_client(latency_seconds, recording, throttle_rate)
+        aws_estimator.set_pricing_client(client)
+        aws_estimator.price_resolver = PriceResolver()
+
+        workspace = os.path.join(directory, 'workspace')
+        usage = generate_workspace(workspace, n_resources)
+
+        started = time.perf_counter()
+        resources, parse_errors, parse_stats = aws_estimator.load_workspace_resources(
+            workspace, workers=workers, use_parse_cache=False
+        )
+        parsed = time.perf_counter()
+        aws_estimator.prefetch_prices(aws_estimator.collect_pricing_keys(resources, usage), max_concurrency)
+        priced = time.perf_counter()
+        result = aws_estimator.estimate_resources(resources, usage, max_concurrency, vectorized=vectorized)
+        finished = time.perf_counter()
+
+    return {
+        'resources': n_resources,
+        'files': parse_stats['parsed'],
+        'line_items': len(result['resources']),
+        'errors': len(result['errors']) + len(parse_errors),
+        'end_to_end_seconds': finished - started,
+        'phases': {
+            'parse': parsed - started,
+            'pricing': priced - parsed,
+            'arithmetic': finished - priced,
+        },
+        'api_calls': client.calls,
+        'throttled': client.throttled,
+        'replayed': getattr(client, 'replayed', 0),
+        'resolver': aws_estimator.price_resolver.stats(),
+        'peak_rss_mb': peak_rss_mb(),
+        'total_monthly_cost': result['total_monthly_cost'],
+    }
+
+
+def run_benchmark(sizes=DEFAULT_SIZES, latency_seconds=0.05, max_concurrency=8, recording=None, workers=None,
+                  vectorized=False, throttle_rate=0.0):
+    """
+    Run ``run_single`` for each size, each in a fresh interpreter.
+
+    A separate process per size keeps peak RSS and import state independent,
+    so the numbers for one size never include another's allocations.
+
+    Returns:
+        dict: ``environment``, ``config`` and one ``results`` entry per size.
+    """
+    config = {
+        'latency_seconds': latency_seconds,
+        'max_concurrency': max_concurrency,
+        'recording': recording,
+        'workers': workers,
+        'vectorized': vectorized,
+        'throttle_rate': throttle_rate,
+    }
+    results = []
+    for size in sizes:
+        command = [sys.executable, os.path.abspath(__file__), '--single', str(size),
+                   '--latency', str(latency_seconds), '--concurrency', str(max_concurrency),
+                   '--throttle-rate', str(throttle_rate)]
+        if recording:
+            command += ['--recording', recording]
+        if workers:
+            command += ['--workers', str(workers)]
+        if vectorized:
+            command.append('--vectorized')
+        output = subprocess.run(command, check=True, capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        result = json.loads(output)
+        print(f"{size:>8} resources: {result['end_to_end_seconds']:8.3f}s end to end, "
+              f"{result['api_calls']} API calls, {result['peak_rss_mb']:.1f} MB peak RSS", file=sys.stderr)
+        results.append(result)
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'config': config,
+        'results': results,
+    }
+
+
+def record(path, sizes=(1000,), max_concurrency=4):
+    """
+    Record real Pricing API responses for the queries a generated workspace makes.
+
+    Needs AWS credentials. The recording can then be replayed with ``--recording``.
+    """
+    import aws_estimator
+    from pricing_stub import RecordingPricingClient
+
+    client = RecordingPricingClient(aws_estimator.get_pricing_client(), path)
+    aws_estimator.set_pricing_client(client)
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            workspace = os.path.join(directory, str(size))
+            usage = generate_workspace(workspace, size)
+            resources, _, _ = aws_estimator.load_workspace_resources(workspace, use_parse_cache=False)
+            aws_estimator.prefetch_prices(aws_estimator.collect_pricing_keys(resources, usage), max_concurrency)
+    client.save()
+    return len(client.responses)
+
+
+# Modules a fully cached estimate must never import
+HEAVY_MODULES = ['boto3', 'botocore', 'hcl2', 'lark', 'numpy', 'requests']
+
+_STARTUP_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import aws_estimator
+imported = time.perf_counter()
+if len(sys.argv) > 1:
+    import contextlib, io
+    with contextlib.redirect_stdout(io.StringIO()):
+        aws_estimator.main(['estimate', sys.argv[1]])
+finished = time.perf_counter()
+print(json.dumps({
+    'import_seconds': imported - started,
+    'run_seconds': finished - started,
+    'heavy_modules_loaded': sorted(set(sys.modules) & set(%r)),
+}))
+""" % HEAVY_MODULES
+
+
+def _build_catalog_for(path, resources, usage):
+    import aws_estimator
+    import price_catalog
+    from pricing_stub import synthetic_product
+
+    by_service = {}
+    for service_code, filters in aws_estimator.collect_pricing_keys(resources, usage):
+        filters = [{'Type': filter_type, 'Field': field, 'Value': value} for filter_type, field, value in filters]
+        by_service.setdefault(service_code, []).append(synthetic_product(service_code, filters))
+
+    def build(catalog):
+        for service_code, products in by_service.items():
+            catalog.add_products(products, service_code)
+        return list(by_service)
+
+    price_catalog.rebuild_catalog(path, build)
+
+
+def measure_startup(n_resources=50, repeat=5, budget_seconds=0.1):
+    """
+    Time ``import aws_estimator`` and a fully cached CLI estimate.
+
+    The cached estimate runs against a catalog holding every price the
+    workspace needs and a warm parse cache, so it must not touch the network
+    or load boto3, hcl2 or numpy. Each measurement is a fresh interpreter; the
+    median of ``repeat`` runs is reported, timed inside the interpreter so
+    Python's own startup is left out.
+
+    Returns:
+        dict: ``import_seconds``, ``cached_estimate_seconds``, the heavy modules
+        each loaded, and whether the cached estimate fit ``budget_seconds``.
+    """
+    import statistics
+
+    with tempfile.TemporaryDirectory() as directory:
+        workspace = os.path.join(directory, 'workspace')
+        usage = generate_workspace(workspace, n_resources)
+        catalog_path = os.path.join(directory, 'catalog.sqlite3')
+        env = dict(os.environ, HOME=directory, AWS_ESTIMATOR_CATALOG=catalog_path)
+
+        import aws_estimator
+
+        resources, _, _ = aws_estimator.load_workspace_resources(workspace, workers=1, use_parse_cache=False)
+        _build_catalog_for(catalog_path, resources, usage)
+
+        def probe(*args):
+            output = subprocess.run([sys.executable, '-c', _STARTUP_PROBE, *args], check=True, capture_output=True,
+                                    text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+            return json.loads(output)
+
+        probe(workspace)  # Warms the parse cache
+        imports = [probe() for _ in range(repeat)]
+        estimates = [probe(workspace) for _ in range(repeat)]
+
+    cached_estimate_seconds = statistics.median(run['run_seconds'] for run in estimates)
+    return {
+        'import_seconds': statistics.median(run['import_seconds'] for run in imports),
+        'import_heavy_modules_loaded': imports[-1]['heavy_modules_loaded'],
+        'cached_estimate_seconds': cached_estimate_seconds,
+        'cached_estimate_heavy_modules_loaded': estimates[-1]['heavy_modules_loaded'],
+        'budget_seconds': budget_seconds,
+        'within_budget': cached_estimate_seconds < budget_seconds and not estimates[-1]['heavy_modules_loaded'],
+    }
+
+
+# Attributes a real EC2 PriceList entry carries besides the ones filtered on; the
+# memory benchmark adds them so synthetic documents are about as large as real ones
+EC2_DOCUMENT_ATTRIBUTES = {
+    'servicecode': 'AmazonEC2', 'servicename': 'Amazon Elastic Compute Cloud', 'location': 'US East (N. Virginia)',
+    'locationType': 'AWS Region', 'currentGeneration': 'Yes', 'instanceFamily': 'General purpose',
+    'physicalProcessor': 'Intel Xeon Platinum 8175', 'clockSpeed': '3.1 GHz', 'storage': 'EBS only',
+    'networkPerformance': 'Up to 10 Gigabit', 'processorArchitecture': '64-bit', 'usagetype': 'BoxUsage:m5.large',
+    'operation': 'RunInstances', 'licenseModel': 'No License required', 'dedicatedEbsThroughput': 'Up to 4750 Mbps',
+    'ecu': '10', 'enhancedNetworkingSupported': 'Yes', 'intelAvxAvailable': 'Yes', 'intelAvx2Available': 'Yes',
+    'intelTurboAvailable': 'Yes', 'normalizationSizeFactor': '4', 'processorFeatures': 'Intel AVX; Intel AVX2',
+    'vpcnetworkingsupport': 'true', 'classicnetworkingsupport': 'false', 'gpuMemory': 'NA', 'marketoption': 'OnDemand',
+}
+
+
+def _ec2_price_list(n_products):
+    from pricing_stub import SYNTHETIC_INSTANCE_TYPES, SYNTHETIC_REGIONS, synthetic_product
+
+    entries = []
+    for position in range(n_products):
+        filters = [{'Type': 'TERM_MATCH', 'Field': field, 'Value': value} for field, value in (
+            ('instanceType', SYNTHETIC_INSTANCE_TYPES[position % len(SYNTHETIC_INSTANCE_TYPES)]),
+            ('regionCode', SYNTHETIC_REGIONS[position // len(SYNTHETIC_INSTANCE_TYPES) % len(SYNTHETIC_REGIONS)]),
+            ('operatingSystem', 'Linux'),
+            ('tenancy', 'Shared'),
+            # Makes every SKU distinct, like the many license and capacity variants of a real price list
+            ('usageVariant', str(position)),
+        )]
+        product = synthetic_product('AmazonEC2', filters)
+        product['product']['attributes'].update(EC2_DOCUMENT_ATTRIBUTES)
+        entries.append(json.dumps(product))
+    return entries
+
+
+def measure_sku_memory(n_products=20000):
+    """
+    Compare the memory held by decoded PriceList documents and by ``sku_record.SkuRecord``s.
+
+    The same synthetic EC2 price list (On-Demand and Reserved terms, real-sized
+    attribute sets) is held three ways: as ``json.loads`` dicts, the way the
+    resolver and catalog used to keep it; as full records, the way the catalog
+    ingests it; and as On-Demand-only records, the way the resolver keeps it.
+    Memory is measured with ``tracemalloc`` as the bytes still allocated once
+    parsing is done; parse time is measured in a separate, untraced pass.
+
+    Returns:
+        dict: Megabytes and bytes per SKU of each form, parse seconds, and
+        whether every record prices exactly like its document.
+    """
+    import gc
+    import tracemalloc
+
+    import sku_record
+
+    entries = _ec2_price_list(n_products)
+    parsers = {
+        'dicts': json.loads,
+        'records': lambda entry: sku_record.from_json(entry, 'AmazonEC2'),
+        'on_demand_records': lambda entry: sku_record.from_json(entry, 'AmazonEC2', sku_record.ON_DEMAND),
+    }
+    results = {'products': n_products}
+    held = {}
+    for name, parse in parsers.items():
+        started = time.perf_counter()
+        for entry in entries:
+            parse(entry)
+        seconds = time.perf_counter() - started
+        gc.collect()
+        tracemalloc.start()
+        held[name] = [parse(entry) for entry in entries]
+        allocated = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        results[name] = {'mb': allocated / (1024 * 1024), 'bytes_per_sku': allocated / n_products,
+                         'parse_seconds': seconds}
+
+    results['reduction'] = results['dicts']['mb'] / results['on_demand_records']['mb']
+    results['prices_match'] = all(
+        _first_on_demand_price(document) == record.on_demand[0].price_usd
+        for document, record in zip(held['dicts'], held['on_demand_records'])
+    )
+    return results
+
+
+def _first_on_demand_price(product_data):
+    # The dict walk every get_*_pricing function used to do
+    for term in product_data['terms']['OnDemand'].values():
+        for dimension in term['priceDimensions'].values():
+            return float(dimension['pricePerUnit']['USD'])
+
+
+# Distributions swapped into a generated workspace's usage file by measure_scenarios
+SCENARIO_USAGE = {
+    'aws_s3_bucket': {'storage_gb': {'distribution': 'lognormal', 'median': 100, 'sigma': 1.0}},
+    'aws_lambda_function': {'requests_per_day': [1000, 100000],
+                            'execution_time_seconds': {'distribution': 'triangular', 'low': 0.05, 'mode': 0.2,
+                                                       'high': 2.0}},
+    'aws_dynamodb_table': {'data_transfer_gb': {'distribution': 'normal', 'mean': 50, 'sd': 20}},
+    'aws_instance': {'hours_per_day': {'distribution': 'choice', 'values': [8, 12, 24], 'weights': [1, 1, 2]}},
+}
+
+
+def measure_scenarios(n_resources=10000, samples=10000, workers=None):
+    """
+    Time a Monte Carlo run (see ``scenarios.simulate``) over a generated workspace.
+
+    Prices come from the stub with no latency, so the time is parsing, batching
+    and sample evaluation.
+
+    Returns:
+        dict: Seconds spent parsing and simulating, and the p10/p50/p90 total.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['AWS_ESTIMATOR_CATALOG'] = os.path.join(directory, 'no-catalog.sqlite3')
+        import aws_estimator
+        import scenarios
+
+        aws_estimator.set_pricing_client(make_pricing_client(0.0))
+        workspace = os.path.join(directory, 'workspace')
+        usage = generate_workspace(workspace, n_resources)
+        for resource_type, drivers in SCENARIO_USAGE.items():
+            usage['resource_type_default_usage'].setdefault(resource_type, {}).update(drivers)
+
+        started = time.perf_counter()
+        resources, _, _ = aws_estimator.load_workspace_resources(workspace, workers=workers, use_parse_cache=False)
+        parsed = time.perf_counter()
+        result = scenarios.simulate(resources, usage, samples, workers)
+        finished = time.perf_counter()
+
+    return {
+        'resources': n_resources,
+        'samples': samples,
+        'workers': workers or os.cpu_count(),
+        'parse_seconds': parsed - started,
+        'simulate_seconds': finished - parsed,
+        'total': result['total'],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark end-to-end estimation against a Pricing API stub.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Workspace sizes in resources')
+    parser.add_argument('--latency', type=float, default=0.05, help='Simulated Pricing API latency in seconds')
+    parser.add_argument('--concurrency', type=int, default=8, help='Maximum Pricing API requests in flight')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Fraction of requests to throttle')
+    parser.add_argument('--workers', type=int, help='Parser processes (default: CPU count)')
+    parser.add_argument('--vectorized', action='store_true', help='Use the vectorized cost engine')
+    parser.add_argument('--recording', help='Replay Pricing API responses from this recording')
+    parser.add_argument('--record', metavar='PATH', help='Record real Pricing API responses to PATH and exit')
+    parser.add_argument('--startup', action='store_true', help='Measure import time and a fully cached estimate')
+    parser.add_argument('--scenarios', type=int, metavar='SAMPLES',
+                        help='Time a Monte Carlo run with this many samples over the largest size')
+    parser.add_argument('--memory', type=int, metavar='PRODUCTS',
+                        help='Compare the memory of decoded PriceList dicts and compact SKU records')
+    parser.add_argument('--output', help='Write the results JSON here instead of stdout')
+    parser.add_argument('--single', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.record:
+        print(f'Recorded {record(args.record, max_concurrency=args.concurrency)} queries to {args.record}')
+        return 0
+
+    if args.startup:
+        results = measure_startup()
+    elif args.memory:
+        results = measure_sku_memory(args.memory)
+    elif args.scenarios:
+        results = measure_scenarios(max(args.sizes), args.scenarios, args.workers)
+    elif args.single is not None:
+        results = run_single(args.single, args.latency, args.concurrency, args.recording, args.workers,
+                             args.vectorized, args.throttle_rate)
+    else:
+        results = run_benchmark(args.sizes, args.latency, args.concurrency, args.recording, args.workers,
+                                args.vectorized, args.throttle_rate)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,202 @@
+import math
+
+import cost_formulas
+from tiered_pricing import TieredRate
+
+try:
+    import numpy as np
+except ImportError:  # Falls back to evaluating the formulas row by row
+    np = None
+
+
+class ServiceColumns:
+    """Columnar usage drivers and price keys for the resources of one service."""
+
+    def __init__(self, service):
+        self.service = service
+        self.formula = cost_formulas.SERVICE_FORMULAS[service]
+        self.rows = []
+        self.quantities = []
+        self.drivers = {name: [] for name, _ in self.formula.drivers}
+        self.key_index = {}
+        self.key_usages = []
+        self.inverse = []
+
+    def append(self, row, usage, price_key, defaults):
+        self.rows.append(row)
+        self.quantities.append(usage.get('quantity', 1))
+        for name, column in self.drivers.items():
+            column.append(usage.get(name, defaults[name]))
+        index = self.key_index.get(price_key)
+        if index is None:
+            index = self.key_index[price_key] = len(self.key_usages)
+            self.key_usages.append(usage)
+        self.inverse.append(index)
+
+
+def build_columns(requests, price_key, defaults):
+    """
+    Turn ``(service, usage)`` requests into per-service columnar tables.
+
+    Args:
+        requests (list): ``(service, usage)`` pairs, one per resource.
+        price_key (callable): ``price_key(service, usage)`` returns the hashable
+            key of the prices the resource needs; resources sharing a key share
+            one price lookup.
+        defaults (dict): Driver values used when a usage dict leaves one out.
+
+    Returns:
+        dict: ``{service: ServiceColumns}``.
+    """
+    tables = {}
+    for row, (service, usage) in enumerate(requests):
+        table = tables.get(service)
+        if table is None:
+            table = tables[service] = ServiceColumns(service)
+        table.append(row, usage, price_key(service, usage), defaults)
+    return tables
+
+
+def evaluate(requests, price_key, price_components, defaults):
+    """
+    Compute the monthly cost of every request with vectorized arithmetic.
+
+    Each distinct price key is resolved once through ``price_components``, its
+    components are gathered into per-row price arrays, and the service formula
+    is applied to whole columns at a time.
+
+    Args:
+        requests (list): ``(service, usage)`` pairs, one per resource.
+        price_key (callable): See ``build_columns``.
+        price_components (callable): ``price_components(service, usage)`` returns
+            a dict of named prices (see ``cost_formulas.SERVICE_FORMULAS``) or None.
+        defaults (dict): Driver values used when a usage dict leaves one out.
+
+    Returns:
+        tuple: ``(monthly_costs, components, errors)``: a list of monthly costs in
+        request order (NaN where no price was found), the components used for
+        each row, and ``{row: message}`` for rows that could not be priced.
+    """
+    costs = [math.nan] * len(requests)
+    row_components = [None] * len(requests)
+    errors = {}
+
+    for service, table in build_columns(requests, price_key, defaults).items():
+        formula = table.formula
+        key_components = []
+        for usage in table.key_usages:
+            try:
+                components = price_components(service, usage)
+                if components is not None and any(name not in components for name in formula.prices):
+                    components = None
+                key_components.append((components, None if components is not None else 'no price found'))
+            except Exception as e:
+                key_components.append((None, str(e)))
+
+        for row, index in zip(table.rows, table.inverse):
+            components, error = key_components[index]
+            row_components[row] = components
+            if error is not None:
+                errors[row] = error
+
+        if np is None:
+            _evaluate_rows(table, key_components, costs)
+        else:
+            _evaluate_columns(table, key_components, costs)
+
+    return costs, row_components, errors
+
+
+def _evaluate_columns(table, key_components, costs):
+    formula = table.formula
+    if any(isinstance(components[name], TieredRate)
+           for components, _ in key_components if components is not None for name in formula.prices):
+        _evaluate_key_groups(table, key_components, costs)
+        return
+    inverse = np.asarray(table.inverse, dtype=np.int64)
+    prices = []
+    for name in formula.prices:
+        per_key = np.array(
+            [components[name] if components is not None else np.nan for components, _ in key_components],
+            dtype=np.float64,
+        )
+        prices.append(per_key[inverse])
+
+    drivers = _driver_columns(table)
+
+    monthly = formula.function(*drivers, *prices) * np.asarray(table.quantities, dtype=np.float64)
+    for row, cost in zip(table.rows, monthly.tolist()):
+        costs[row] = cost
+
+
+def _driver_columns(table):
+    drivers = []
+    for name, cast in table.formula.drivers:
+        column = np.asarray(table.drivers[name], dtype=np.float64)
+        drivers.append(np.trunc(column) if cast is int else column)
+    return drivers
+
+
+def _evaluate_key_groups(table, key_components, costs):
+    # Tiered rates cannot be gathered into a price array, so the formula runs
+    # once per price key over all the rows sharing it
+    formula = table.formula
+    inverse = np.asarray(table.inverse, dtype=np.int64)
+    order = np.argsort(inverse, kind='stable')
+    bounds = np.searchsorted(inverse[order], np.arange(len(key_components) + 1))
+    drivers = _driver_columns(table)
+    quantities = np.asarray(table.quantities, dtype=np.float64)
+    rows = np.asarray(table.rows, dtype=np.int64)
+    for index, (components, _) in enumerate(key_components):
+        selected = order[bounds[index]:bounds[index + 1]]
+        if components is None or not len(selected):
+            continue
+        monthly = formula.function(*[driver[selected] for driver in drivers],
+                                   *[components[name] for name in formula.prices]) * quantities[selected]
+        for row, cost in zip(rows[selected].tolist(), monthly.tolist()):
+            costs[row] = cost
+
+
+def sweep(formula, usage, components, driver, values, defaults):
+    """
+    Evaluate one formula across many values of a single usage driver.
+
+    Args:
+        formula (cost_formulas.Formula): The service formula.
+        usage (dict): Values of the other drivers, and ``quantity``.
+        components (dict): Price components, flat or tiered.
+        driver (str): The driver to vary.
+        values (list): Its values.
+        defaults (dict): Driver values used when ``usage`` leaves one out.
+
+    Returns:
+        list: The monthly cost at each value.
+    """
+    prices = [components[name] for name in formula.prices]
+    quantity = usage.get('quantity', 1)
+    if np is None:
+        costs = []
+        for value in values:
+            drivers = [cast(value if name == driver else usage.get(name, defaults[name]))
+                       for name, cast in formula.drivers]
+            costs.append(formula.function(*drivers, *prices) * quantity)
+        return costs
+    drivers = []
+    for name, cast in formula.drivers:
+        if name == driver:
+            column = np.asarray(values, dtype=np.float64)
+            drivers.append(np.trunc(column) if cast is int else column)
+        else:
+            drivers.append(cast(usage.get(name, defaults[name])))
+    monthly = formula.function(*drivers, *prices) * quantity
+    return np.broadcast_to(monthly, (len(values),)).tolist()
+
+
+def _evaluate_rows(table, key_components, costs):
+    formula = table.formula
+    for position, (row, index) in enumerate(zip(table.rows, table.inverse)):
+        components = key_components[index][0]
+        if components is None:
+            continue
+        drivers = [cast(table.drivers[name][position]) for name, cast in formula.drivers]
+        costs[row] = formula.function(*drivers, *[components[name] for name in formula.prices]) * table.quantities[position]
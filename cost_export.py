@@ -0,0 +1,325 @@
+import csv
+import datetime
+import json
+import os
+import sys
+import urllib.parse
+import uuid
+
+# Columns of an exported line item, in file order
+EXPORT_FIELDS = (
+    'address',
+    'resource_type',
+    'service',
+    'sku',
+    'region',
+    'unit_price',
+    'quantity',
+    'monthly_cost',
+    'tags',
+    'module',
+    'file',
+)
+FORMATS = ('csv', 'jsonl', 'parquet')
+FORMAT_EXTENSIONS = {'csv': 'csv', 'jsonl': 'jsonl', 'parquet': 'parquet'}
+# Rows buffered per Parquet row group; bounds the memory an export holds
+DEFAULT_BATCH_SIZE = 50000
+
+
+def _pyarrow():
+    # Imported on first use: it is large, and only Parquet output needs it
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet export requires the 'pyarrow' package (pip install pyarrow)") from None
+    return pyarrow
+
+
+def export_row(line_item):
+    """
+    Flatten a line item (see ``aws_estimator.estimate_resources``) to the export columns.
+
+    Tags become a dict of strings. A tiered unit price is already reduced to
+    its first paid rate in the line item, so every column is a plain value.
+
+    Returns:
+        dict: One value per ``EXPORT_FIELDS`` column.
+    """
+    return {
+        'address': line_item['address'],
+        'resource_type': line_item.get('resource_type'),
+        'service': line_item.get('service'),
+        'sku': line_item.get('sku'),
+        'region': line_item.get('region'),
+        'unit_price': _float(line_item.get('unit_price')),
+        'quantity': _float(line_item.get('quantity')),
+        'monthly_cost': _float(line_item.get('monthly_cost')),
+        'tags': {str(key): str(value) for key, value in (line_item.get('tags') or {}).items()},
+        'module': line_item.get('module'),
+        'file': line_item.get('file'),
+    }
+
+
+def _float(value):
+    return None if value is None else float(value)
+
+
+class CsvWriter:
+    """Write rows to CSV, one line per row, with tags as a JSON object."""
+
+    def __init__(self, path):
+        self._file = open(path, 'w', newline='')
+        self._writer = csv.DictWriter(self._file, EXPORT_FIELDS)
+        self._writer.writeheader()
+
+    def write(self, row):
+        self._writer.writerow({**row, 'tags': json.dumps(row['tags'], sort_keys=True)})
+
+    def close(self):
+        self._file.close()
+
+
+class JsonLinesWriter:
+    """Write rows as JSON Lines."""
+
+    def __init__(self, path):
+        self._file = open(path, 'w')
+
+    def write(self, row):
+        self._file.write(json.dumps(row) + '\n')
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter:
+    """
+    Write rows to Parquet, one row group per ``batch_size`` rows.
+
+    Only the current batch is held in memory, as plain column lists, so an
+    export of any size stays within a fixed footprint.
+    """
+
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE):
+        pyarrow = _pyarrow()
+        self._pyarrow = pyarrow
+        self.schema = pyarrow.schema([
+            ('address', pyarrow.string()),
+            ('resource_type', pyarrow.string()),
+            ('service', pyarrow.string()),
+            ('sku', pyarrow.string()),
+            ('region', pyarrow.string()),
+            ('unit_price', pyarrow.float64()),
+            ('quantity', pyarrow.float64()),
+            ('monthly_cost', pyarrow.float64()),
+            ('tags', pyarrow.map_(pyarrow.string(), pyarrow.string())),
+            ('module', pyarrow.string()),
+            ('file', pyarrow.string()),
+        ])
+        self.batch_size = batch_size
+        self._writer = pyarrow.parquet.ParquetWriter(path, self.schema, compression='zstd')
+        self._columns = {field: [] for field in EXPORT_FIELDS}
+        self._rows = 0
+
+    def write(self, row):
+        for field, column in self._columns.items():
+            column.append(list(row[field].items()) if field == 'tags' else row[field])
+        self._rows += 1
+        if self._rows >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._rows:
+            return
+        self._writer.write_table(self._pyarrow.table(self._columns, schema=self.schema))
+        self._columns = {field: [] for field in EXPORT_FIELDS}
+        self._rows = 0
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+def _open_writer(path, export_format, batch_size):
+    if export_format == 'csv':
+        return CsvWriter(path)
+    if export_format == 'jsonl':
+        return JsonLinesWriter(path)
+    if export_format == 'parquet':
+        return ParquetWriter(path, batch_size)
+    raise ValueError(f"Unknown export format {export_format!r}; expected one of {', '.join(FORMATS)}")
+
+
+def format_from_path(path):
+    """Guess the export format from a file extension, defaulting to JSON Lines."""
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension in ('parquet', 'pq'):
+        return 'parquet'
+    if extension == 'csv':
+        return 'csv'
+    return 'jsonl'
+
+
+def export_line_items(line_items, path, export_format=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Stream line items into a CSV, JSON Lines or Parquet file.
+
+    Items are written as they are consumed, so passing a generator (such as
+    the events of ``aws_estimator.stream_estimate``, of which only ``resource``
+    events are kept) never materializes the whole estimate. The file is
+    written under a temporary name and renamed once complete.
+
+    Args:
+        line_items (iterable): Line item dicts, or ``stream_estimate`` events.
+        path (str): Destination file.
+        export_format (str): One of ``FORMATS``; guessed from ``path`` if omitted.
+        batch_size (int): Rows per Parquet row group.
+
+    Returns:
+        dict: ``path``, ``format``, ``rows`` and ``monthly_cost`` (their total).
+    """
+    export_format = export_format or format_from_path(path)
+    temporary_path = path + '.tmp'
+    writer = _open_writer(temporary_path, export_format, batch_size)
+    rows = 0
+    total = 0.0
+    try:
+        for line_item in line_items:
+            if line_item.get('type', 'resource') != 'resource':
+                continue
+            row = export_row(line_item)
+            writer.write(row)
+            rows += 1
+            total += row['monthly_cost'] or 0.0
+    except BaseException:
+        writer.close()
+        os.remove(temporary_path)
+        raise
+    writer.close()
+    os.replace(temporary_path, path)
+    return {'path': path, 'format': export_format, 'rows': rows, 'monthly_cost': total}
+
+
+def partition_path(root, stack, run_date, run_id, export_format='parquet'):
+    """
+    Return where a run is stored in a dataset: ``root/run_date=<date>/stack=<stack>/part-<run_id>.<ext>``.
+
+    The Hive-style directory names let readers (pyarrow, DuckDB, Spark, Athena)
+    skip every partition a query on date or stack rules out.
+    """
+    return os.path.join(
+        root,
+        f'run_date={run_date}',
+        f"stack={urllib.parse.quote(stack, safe='')}",
+        f'part-{run_id}.{FORMAT_EXTENSIONS[export_format]}',
+    )
+
+
+def append_run(line_items, root, stack, run_date=None, run_id=None, export_format='parquet',
+               batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Add one estimate run to a partitioned dataset.
+
+    Each run is a new file in its date and stack partition, so runs are never
+    rewritten and any number of writers can append concurrently.
+
+    Args:
+        line_items (iterable): As accepted by ``export_line_items``.
+        root (str): The dataset directory.
+        stack (str): Name of the estimated stack (workspace, account, ...).
+        run_date (str or datetime.date): Partition date, today (UTC) by default.
+        run_id (str): Unique name of the run's file, generated by default.
+        export_format (str): One of ``FORMATS``.
+
+    Returns:
+        dict: As ``export_line_items``, plus ``run_date``, ``stack`` and ``run_id``.
+    """
+    run_date = str(run_date or datetime.datetime.now(datetime.timezone.utc).date())
+    run_id = run_id or f"{datetime.datetime.now(datetime.timezone.utc):%H%M%S}-{uuid.uuid4().hex[:12]}"
+    path = partition_path(root, stack, run_date, run_id, export_format)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    result = export_line_items(line_items, path, export_format, batch_size)
+    return {**result, 'run_date': run_date, 'stack': stack, 'run_id': run_id}
+
+
+def open_dataset(root):
+    """
+    Open the Parquet runs under ``root`` as one ``pyarrow.dataset.Dataset``.
+
+    ``run_date`` and ``stack`` come from the partition directories, so filters
+    on them only read the matching files. Both are read as strings, whatever
+    their values look like (a date, a number).
+    """
+    pyarrow = _pyarrow()
+    import pyarrow.dataset
+
+    partitioning = pyarrow.dataset.partitioning(
+        pyarrow.schema([('run_date', pyarrow.string()), ('stack', pyarrow.string())]), flavor='hive'
+    )
+    return pyarrow.dataset.dataset(root, format='parquet', partitioning=partitioning)
+
+
+def cost_trend(root, stack=None, since=None):
+    """
+    Total monthly cost per run date and stack from a Parquet dataset.
+
+    Only the ``monthly_cost`` column of the selected partitions is read.
+
+    Args:
+        root (str): The dataset directory.
+        stack (str): Only this stack.
+        since (str): Only runs on or after this ISO date.
+
+    Returns:
+        list: ``{'run_date', 'stack', 'line_items', 'monthly_cost'}`` dicts,
+        oldest first. With several runs of a stack on one day, their line
+        items are all counted.
+    """
+    import pyarrow.compute
+
+    dataset = open_dataset(root)
+    condition = None
+    if stack is not None:
+        condition = pyarrow.compute.field('stack') == stack
+    if since is not None:
+        since_condition = pyarrow.compute.field('run_date') >= str(since)
+        condition = since_condition if condition is None else condition & since_condition
+    table = dataset.to_table(columns=['run_date', 'stack', 'monthly_cost'], filter=condition)
+    grouped = table.group_by(['run_date', 'stack']).aggregate([('monthly_cost', 'count'), ('monthly_cost', 'sum')])
+    rows = [
+        {'run_date': run_date, 'stack': stack_name, 'line_items': count, 'monthly_cost': total}
+        for run_date, stack_name, count, total in zip(
+            grouped['run_date'].to_pylist(),
+            grouped['stack'].to_pylist(),
+            grouped['monthly_cost_count'].to_pylist(),
+            grouped['monthly_cost_sum'].to_pylist(),
+        )
+    ]
+    return sorted(rows, key=lambda row: (row['run_date'], row['stack']))
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Query a partitioned cost export dataset.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    trend_parser = subparsers.add_parser('trend', help='Total monthly cost per run date and stack')
+    trend_parser.add_argument('root', help='Dataset directory')
+    trend_parser.add_argument('--stack', help='Only this stack')
+    trend_parser.add_argument('--since', help='Only runs on or after this date (YYYY-MM-DD)')
+    trend_parser.add_argument('--json', action='store_true', help='Print the rows as JSON')
+    args = parser.parse_args(argv)
+
+    rows = cost_trend(args.root, args.stack, args.since)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return 0
+    print(f"{'run date':<12} {'stack':<40} {'line items':>10} {'monthly cost':>16}")
+    for row in rows:
+        print(f"{row['run_date']:<12} {row['stack']:<40} {row['line_items']:>10} ${row['monthly_cost']:>15.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+from collections import namedtuple
+
+from tiered_pricing import tiered_cost
+
+DAYS_PER_MONTH = 30  # Approximate number of days in a month
+
+# Monthly cost formulas shared by the scalar get_*_pricing path and the
+# vectorized cost engine. They use plain arithmetic only, so each accepts Python
+# floats or NumPy arrays; one definition (and one operation order) per service
+# is what keeps both paths in exact agreement. Usage-priced components may be
+# flat prices or tiered_pricing.TieredRate objects, so they go through tiered_cost.
+
+
+def hourly_monthly_cost(hours_per_day, price_per_hour):
+    return hours_per_day * DAYS_PER_MONTH * price_per_hour
+
+
+def storage_monthly_cost(storage_gb, price_per_gb):
+    return tiered_cost(price_per_gb, storage_gb)
+
+
+def lambda_monthly_cost(requests_per_day, execution_time_seconds, memory_size_mb,
+                        price_per_request, price_per_gb_second):
+    total_requests = requests_per_day * DAYS_PER_MONTH
+    total_duration_gb_seconds = (execution_time_seconds / 1024) * memory_size_mb * total_requests  # GB-seconds
+    return tiered_cost(price_per_request, total_requests) + tiered_cost(price_per_gb_second, total_duration_gb_seconds)
+
+
+def dynamodb_monthly_cost(reads_per_month, writes_per_month, data_transfer_gb,
+                          price_per_read, price_per_write, price_per_data_transfer):
+    return (
+        tiered_cost(price_per_read, reads_per_month) +
+        tiered_cost(price_per_write, writes_per_month) +
+        tiered_cost(price_per_data_transfer, data_transfer_gb)
+    )
+
+
+def vpc_monthly_cost(hours_per_day, data_transfer_gb, elastic_ips_count,
+                     price_per_hour, price_per_data_transfer, price_per_elastic_ip):
+    return (
+        (hours_per_day * DAYS_PER_MONTH * price_per_hour) +
+        tiered_cost(price_per_data_transfer, data_transfer_gb) +
+        (elastic_ips_count * price_per_elastic_ip * DAYS_PER_MONTH)  # Cost for Elastic IPs
+    )
+
+
+def ecs_monthly_cost(ec2_hours_per_day, fargate_hours_per_day, price_per_hour_ec2, price_per_hour_fargate):
+    return (
+        (ec2_hours_per_day * DAYS_PER_MONTH * price_per_hour_ec2) +
+        (fargate_hours_per_day * DAYS_PER_MONTH * price_per_hour_fargate)
+    )
+
+
+def eks_monthly_cost(control_plane_hours_per_day, worker_node_hours_per_day,
+                     control_plane_price_per_hour, worker_node_price_per_hour):
+    return (
+        (control_plane_hours_per_day * DAYS_PER_MONTH * control_plane_price_per_hour) +
+        (worker_node_hours_per_day * DAYS_PER_MONTH * worker_node_price_per_hour)
+    )
+
+
+# drivers: (usage key, cast) pairs passed first; prices: price component names passed after
+Formula = namedtuple('Formula', ['drivers', 'prices', 'function'])
+
+SERVICE_FORMULAS = {
+    'EC2': Formula([('hours_per_day', float)], ['price_per_hour'], hourly_monthly_cost),
+    'RDS': Formula([('hours_per_day', float)], ['price_per_hour'], hourly_monthly_cost),
+    'S3': Formula([('storage_gb', float)], ['price_per_gb'], storage_monthly_cost),
+    'Lambda': Formula(
+        [('requests_per_day', int), ('execution_time_seconds', float), ('memory_size_mb', int)],
+        ['price_per_request', 'price_per_gb_second'],
+        lambda_monthly_cost,
+    ),
+    'DynamoDB': Formula(
+        [('reads_per_month', int), ('writes_per_month', int), ('data_transfer_gb', float)],
+        ['price_per_read', 'price_per_write', 'price_per_data_transfer'],
+        dynamodb_monthly_cost,
+    ),
+    'VPC': Formula(
+        [('hours_per_day', float), ('data_transfer_gb', float), ('elastic_ips_count', int)],
+        ['price_per_hour', 'price_per_data_transfer', 'price_per_elastic_ip'],
+        vpc_monthly_cost,
+    ),
+    'ECS': Formula(
+        [('ec2_hours_per_day', float), ('fargate_hours_per_day', float)],
+        ['price_per_hour_ec2', 'price_per_hour_fargate'],
+        ecs_monthly_cost,
+    ),
+    'EKS': Formula(
+        [('control_plane_hours_per_day', float), ('worker_node_hours_per_day', float)],
+        ['control_plane_price_per_hour', 'worker_node_price_per_hour'],
+        eks_monthly_cost,
+    ),
+}
+
+
+def component_quantities(service, drivers, names):
+    """
+    Monthly quantity of each named price component a resource consumes.
+
+    Each is the service formula evaluated with that price set to 1 and the
+    others to 0, so it works for Python numbers and NumPy arrays alike.
+
+    Args:
+        service (str): One of the ``SERVICE_FORMULAS`` keys.
+        drivers (list): Driver values, in ``Formula.drivers`` order.
+        names (iterable): Price component names.
+
+    Returns:
+        dict: ``{name: quantity}``.
+    """
+    formula = SERVICE_FORMULAS[service]
+    return {
+        name: formula.function(*drivers, *[1.0 if price == name else 0.0 for price in formula.prices])
+        for name in names
+    }
+
+
+# Reserved commitments are paid for every hour of the term, whether the
+# resource runs or not, at the offer's amortized (upfront spread) hourly rate.
+
+def commitment_monthly_cost(effective_hourly_rate):
+    return hourly_monthly_cost(24, effective_hourly_rate)
+
+
+def break_even_utilization(effective_hourly_rate, on_demand_price_per_hour):
+    """Fraction of hours a resource must run for the commitment to beat On-Demand."""
+    return effective_hourly_rate / on_demand_price_per_hour
@@ -0,0 +1,193 @@
+import bisect
+import re
+from collections import namedtuple
+
+DEFAULT_OPERATING_SYSTEM = 'Linux'
+DEFAULT_TENANCY = 'Shared'
+DEFAULT_PRE_INSTALLED_SW = 'NA'
+DEFAULT_CAPACITY_STATUS = 'Used'
+# Linux and license-included Windows SKUs; bring-your-own-license SKUs share every other dimension
+DEFAULT_LICENSE_MODEL = 'No License required'
+
+# Product families of EC2 instance-hour SKUs
+INSTANCE_PRODUCT_FAMILIES = {'Compute Instance', 'Compute Instance (bare metal)'}
+
+# Catalog columns read to build the index, in the order offers_from_rows expects
+INDEX_COLUMNS = [
+    'sku',
+    'region',
+    'instance_type',
+    'operating_system',
+    'tenancy',
+    'pre_installed_sw',
+    'capacity_status',
+    'license_model',
+    'vcpu',
+    'memory',
+    'product_family',
+    'unit',
+    'price_usd',
+]
+
+Ec2Offer = namedtuple('Ec2Offer', [
+    'sku',
+    'region',
+    'instance_type',
+    'operating_system',
+    'tenancy',
+    'pre_installed_sw',
+    'capacity_status',
+    'license_model',
+    'vcpu',
+    'memory_gib',
+    'price_per_hour',
+])
+
+_NUMBER = re.compile(r'[\d.]+')
+
+
+def parse_vcpu(value):
+    """Parse the ``vcpu`` attribute ("4") into an int, 0 if absent."""
+    match = _NUMBER.search(value or '')
+    return int(float(match.group())) if match else 0
+
+
+def parse_memory_gib(value):
+    """Parse the ``memory`` attribute ("16 GiB", "0.5 GiB") into GiB, 0.0 if absent."""
+    match = _NUMBER.search((value or '').replace(',', ''))
+    return float(match.group()) if match else 0.0
+
+
+def _fold(value):
+    return (value or '').casefold()
+
+
+def offers_from_rows(rows):
+    """
+    Turn catalog rows (``INDEX_COLUMNS`` order) into offers, keeping instance-hour prices only.
+
+    Yields:
+        Ec2Offer: One per On-Demand instance-hour SKU.
+    """
+    for (sku, region, instance_type, operating_system, tenancy, pre_installed_sw, capacity_status, license_model,
+         vcpu, memory, product_family, unit, price) in rows:
+        if product_family not in INSTANCE_PRODUCT_FAMILIES or unit != 'Hrs' or not instance_type:
+            continue
+        yield Ec2Offer(sku, region, instance_type, operating_system, tenancy, pre_installed_sw, capacity_status,
+                       license_model, parse_vcpu(vcpu), parse_memory_gib(memory), price)
+
+
+class _Group:
+    """Offers sharing region, OS, tenancy, software, capacity status and license model, sorted for range queries."""
+
+    def __init__(self, offers):
+        self.by_vcpu = sorted(offers, key=lambda offer: (offer.vcpu, offer.price_per_hour))
+        self.vcpus = [offer.vcpu for offer in self.by_vcpu]
+        # suffix_min[i] is the cheapest offer among by_vcpu[i:]
+        self.suffix_min = [None] * len(self.by_vcpu)
+        cheapest = None
+        for position in range(len(self.by_vcpu) - 1, -1, -1):
+            offer = self.by_vcpu[position]
+            if cheapest is None or offer.price_per_hour <= cheapest.price_per_hour:
+                cheapest = offer
+            self.suffix_min[position] = cheapest
+        self.by_price = sorted(offers, key=lambda offer: offer.price_per_hour)
+
+
+class Ec2PriceIndex:
+    """
+    In-memory index of EC2 On-Demand instance prices over every pricing dimension.
+
+    Exact lookups on (region, instance type, operating system, tenancy,
+    pre-installed software, capacity status, license model) are a single dict
+    access. Wildcard questions such as "cheapest Linux shared instance with at
+    least 8 vCPUs in eu-west-1" are answered from per-group arrays sorted by
+    vCPU count with a precomputed suffix minimum, i.e. one binary search.
+
+    Values are matched case-insensitively, like the catalog. When several SKUs
+    still share all seven dimensions, the first in catalog order is kept: the
+    one ``PriceCatalog.get_products`` returns for the same filters, so prices,
+    SKUs and commitments agree whether or not the index is built.
+    """
+
+    def __init__(self, offers):
+        """
+        Args:
+            offers (iterable): ``Ec2Offer``s in catalog order.
+        """
+        self._exact = {}
+        grouped = {}
+        for offer in offers:
+            group_key = (_fold(offer.region), _fold(offer.operating_system), _fold(offer.tenancy),
+                         _fold(offer.pre_installed_sw), _fold(offer.capacity_status), _fold(offer.license_model))
+            key = group_key[:1] + (_fold(offer.instance_type),) + group_key[1:]
+            if key not in self._exact:
+                self._exact[key] = offer
+        for key, offer in self._exact.items():
+            grouped.setdefault(key[:1] + key[2:], []).append(offer)
+        self._groups = {key: _Group(offers) for key, offers in grouped.items()}
+
+    @classmethod
+    def from_catalog(cls, catalog):
+        """Build the index from a ``PriceCatalog``, or return None if it holds no EC2 prices."""
+        if 'AmazonEC2' not in catalog.services():
+            return None
+        return cls(offers_from_rows(catalog.select_prices('AmazonEC2', INDEX_COLUMNS)))
+
+    def __len__(self):
+        return len(self._exact)
+
+    def get(self, region, instance_type, operating_system=DEFAULT_OPERATING_SYSTEM, tenancy=DEFAULT_TENANCY,
+            pre_installed_sw=DEFAULT_PRE_INSTALLED_SW, capacity_status=DEFAULT_CAPACITY_STATUS,
+            license_model=DEFAULT_LICENSE_MODEL):
+        """
+        Look up one instance price.
+
+        Returns:
+            Ec2Offer: The offer, or None if no SKU matches all dimensions.
+        """
+        return self._exact.get((_fold(region), _fold(instance_type), _fold(operating_system), _fold(tenancy),
+                                _fold(pre_installed_sw), _fold(capacity_status), _fold(license_model)))
+
+    def _group(self, region, operating_system, tenancy, pre_installed_sw, capacity_status, license_model):
+        return self._groups.get((_fold(region), _fold(operating_system), _fold(tenancy),
+                                 _fold(pre_installed_sw), _fold(capacity_status), _fold(license_model)))
+
+    def cheapest(self, region, min_vcpu=0, min_memory_gib=0.0, operating_system=DEFAULT_OPERATING_SYSTEM,
+                 tenancy=DEFAULT_TENANCY, pre_installed_sw=DEFAULT_PRE_INSTALLED_SW,
+                 capacity_status=DEFAULT_CAPACITY_STATUS, license_model=DEFAULT_LICENSE_MODEL):
+        """
+        Find the cheapest instance with at least ``min_vcpu`` vCPUs and ``min_memory_gib`` GiB.
+
+        A vCPU-only query is a binary search; adding a memory floor walks the
+        group in price order and stops at the first instance that fits.
+
+        Returns:
+            Ec2Offer: The cheapest match, or None.
+        """
+        group = self._group(region, operating_system, tenancy, pre_installed_sw, capacity_status, license_model)
+        if group is None:
+            return None
+        if not min_memory_gib:
+            position = bisect.bisect_left(group.vcpus, min_vcpu)
+            return group.suffix_min[position] if position < len(group.suffix_min) else None
+        for offer in group.by_price:
+            if offer.vcpu >= min_vcpu and offer.memory_gib >= min_memory_gib:
+                return offer
+        return None
+
+    def offers(self, region, min_vcpu=0, max_vcpu=None, operating_system=DEFAULT_OPERATING_SYSTEM,
+               tenancy=DEFAULT_TENANCY, pre_installed_sw=DEFAULT_PRE_INSTALLED_SW,
+               capacity_status=DEFAULT_CAPACITY_STATUS, license_model=DEFAULT_LICENSE_MODEL):
+        """
+        List the instances of a region within a vCPU range, for right-sizing sweeps.
+
+        Returns:
+            list: Offers ordered by vCPU count, then price.
+        """
+        group = self._group(region, operating_system, tenancy, pre_installed_sw, capacity_status, license_model)
+        if group is None:
+            return []
+        start = bisect.bisect_left(group.vcpus, min_vcpu)
+        end = len(group.vcpus) if max_vcpu is None else bisect.bisect_right(group.vcpus, max_vcpu)
+        return group.by_vcpu[start:end]
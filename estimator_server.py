@@ -0,0 +1,334 @@
+import argparse
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import aws_estimator
+import cost_formulas
+import pricing_fetch
+import terraform_parse
+from price_resolver import PriceResolver
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8787
+# Latency percentiles are computed over this many of the most recent requests
+LATENCY_WINDOW = 2048
+# How long a price fetched from the Pricing API is reused before being asked for again
+DEFAULT_PRICE_TTL_SECONDS = 24 * 3600
+
+
+class LatencyWindow:
+    """Thread-safe rolling window of request latencies and outcome counters."""
+
+    def __init__(self, size=LATENCY_WINDOW):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, failed=False):
+        with self._lock:
+            self.samples.append(seconds)
+            self.count += 1
+            self.errors += failed
+
+    def stats(self):
+        with self._lock:
+            samples = sorted(self.samples)
+            count, errors = self.count, self.errors
+        return {
+            'count': count,
+            'errors': errors,
+            'p50_ms': _percentile(samples, 50) * 1000,
+            'p99_ms': _percentile(samples, 99) * 1000,
+        }
+
+
+def _percentile(sorted_samples, percent):
+    """Nearest-rank percentile of an already sorted list (0.0 when empty)."""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, -(-len(sorted_samples) * percent // 100))
+    return sorted_samples[int(rank) - 1]
+
+
+class EstimatorService:
+    """
+    The state one server process keeps warm across requests.
+
+    Prices resolved for one pipeline are reused by the next through the
+    shared ``aws_estimator.price_resolver``; parsed HCL stays in an in-memory
+    LRU in front of the on-disk parse cache; the price catalog is opened once
+    and its EC2 prices are indexed in memory.
+
+    Before each request the catalog file is checked: once a ``catalog refresh``
+    replaces it, or it goes stale, the catalog is reopened and the EC2 index
+    and memoized prices are rebuilt. Prices fetched from the API expire after
+    ``price_ttl_seconds``.
+    """
+
+    def __init__(self, max_concurrency=pricing_fetch.DEFAULT_MAX_CONCURRENCY, parse_cache_entries=4096,
+                 price_ttl_seconds=DEFAULT_PRICE_TTL_SECONDS):
+        self.max_concurrency = max_concurrency
+        self.parse_cache = terraform_parse.MemoryParseCache(terraform_parse.ParseCache(), parse_cache_entries)
+        aws_estimator.set_parse_cache(self.parse_cache)
+        self.price_ttl_seconds = price_ttl_seconds
+        aws_estimator.price_resolver = PriceResolver(ttl_seconds=price_ttl_seconds)
+        self.catalog_reloads = 0
+        self._catalog_lock = threading.Lock()
+        self._open_catalog()
+        self.started = time.time()
+        self.latencies = {}
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def _open_catalog(self):
+        self.catalog = aws_estimator.get_price_catalog()
+        self.ec2_index = aws_estimator.get_ec2_index()
+
+    def check_catalog(self):
+        """Reopen the price catalog if it was refreshed or went stale; return True if it was."""
+        with self._catalog_lock:
+            if not aws_estimator.reload_price_catalog():
+                return False
+            self._open_catalog()
+            self.catalog_reloads += 1
+            return True
+
+    def track(self, endpoint):
+        with self._lock:
+            window = self.latencies.get(endpoint)
+            if window is None:
+                window = self.latencies[endpoint] = LatencyWindow()
+            self.in_flight += 1
+        return window
+
+    def done(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def stream_estimate(self, request):
+        usage = request.get('usage')
+        if usage is None and request.get('usage_file'):
+            usage = aws_estimator.load_usage_file(request['usage_file'])
+        tfvars = request.get('tfvars')
+        if tfvars is None and request.get('tfvars_file'):
+            tfvars = aws_estimator.load_tfvars(request['tfvars_file'])
+        return aws_estimator.stream_estimate(request['path'], usage, tfvars,
+                                             request.get('max_concurrency', self.max_concurrency))
+
+    def price(self, request):
+        """
+        Estimate one unit of a service, see ``aws_estimator.estimate_service_cost``.
+
+        Returns:
+            dict: ``monthly_cost``, ``unit_price`` and ``details``, or None if
+            no price was found.
+        """
+        service = request['service']
+        if service not in cost_formulas.SERVICE_FORMULAS:
+            raise ValueError(f'unknown service {service!r}')
+        # Missing usage drivers fall back to DEFAULT_USAGE; nothing prompts on the server's TTY
+        usage = dict(request.get('usage') or {})
+        for field in ('region', 'instance_type'):
+            if request.get(field) is not None:
+                usage[field] = request[field]
+        return aws_estimator.estimate_service_cost(service, usage)
+
+    def health(self):
+        return {'status': 'ok', 'uptime_seconds': time.time() - self.started, 'in_flight': self.in_flight}
+
+    def metrics(self):
+        with self._lock:
+            endpoints = dict(self.latencies)
+        self.check_catalog()
+        catalog = {'reloads': self.catalog_reloads}
+        if self.catalog is not None:
+            catalog.update({'path': self.catalog.path, 'services': self.catalog.services(),
+                            'refreshed_at': self.catalog.get_meta('refreshed_at'),
+                            'schema_version': self.catalog.get_meta('schema_version'),
+                            'age_seconds': self.catalog.age_seconds(),
+                            'ec2_index_entries': len(self.ec2_index) if self.ec2_index is not None else 0})
+        return {
+            **self.health(),
+            'requests': {endpoint: window.stats() for endpoint, window in sorted(endpoints.items())},
+            'price_resolver': aws_estimator.price_resolver.stats(),
+            'parse_cache': self.parse_cache.stats(),
+            'catalog': catalog,
+        }
+
+
+class EstimatorRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP front end of an ``EstimatorService``.
+
+    ``POST /estimate`` streams newline-delimited JSON events (see
+    ``aws_estimator.stream_estimate``) using chunked transfer encoding;
+    ``POST /price`` estimates one unit of a service; ``GET /health`` and
+    ``GET /metrics`` report liveness, latency percentiles and cache hit rates.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'aws-estimator'
+    verbose = False
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def address_string(self):
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/health':
+            self._send_json(200, self.service.health())
+        elif path == '/metrics':
+            self._send_json(200, self.service.metrics())
+        else:
+            self._send_json(404, {'error': f'no such endpoint: {path}'})
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        if path not in ('/estimate', '/price'):
+            self._send_json(404, {'error': f'no such endpoint: {path}'})
+            return
+        window = self.service.track(path)
+        started = time.perf_counter()
+        failed = True
+        try:
+            self.service.check_catalog()
+            request = self._read_json()
+            if path == '/estimate':
+                failed = not self._stream_estimate(request)
+            else:
+                estimate = self.service.price(request)
+                if estimate is None:
+                    self._send_json(404, {'error': f"no price found for {request['service']}"})
+                else:
+                    self._send_json(200, estimate)
+                    failed = False
+        except (KeyError, ValueError) as e:
+            self._send_json(400, {'error': f'bad request: {e}'})
+        except Exception as e:
+            self._send_json(500, {'error': str(e)})
+        finally:
+            window.record(time.perf_counter() - started, failed)
+            self.service.done()
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        if not isinstance(request, dict):
+            raise ValueError('expected a JSON object')
+        return request
+
+    def _stream_estimate(self, request):
+        if not os.path.exists(request['path']):
+            self._send_json(400, {'error': f"no such file or directory: {request['path']}"})
+            return False
+        events = self.service.stream_estimate(request)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        ok = True
+        try:
+            for event in events:
+                self._write_chunk(json.dumps(event, default=str).encode() + b'\n')
+        except (BrokenPipeError, ConnectionResetError):
+            return False
+        except Exception as e:
+            # Headers are already sent, so the failure is reported in the stream
+            self._write_chunk(json.dumps({'type': 'failed', 'error': str(e)}).encode() + b'\n')
+            ok = False
+        self._write_chunk(b'')
+        return ok
+
+    def _write_chunk(self, data):
+        self.wfile.write(f'{len(data):X}\r\n'.encode() + data + b'\r\n')
+        self.wfile.flush()
+
+    def _send_json(self, status, body):
+        data = json.dumps(body, default=str).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class UnixThreadingHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        # A socket file left behind by a previous server would make bind fail
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        super().server_bind()
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None):
+    """
+    Create (but do not start) an HTTP server for ``service``.
+
+    Args:
+        service (EstimatorService): The warm estimator state.
+        host (str): TCP address to listen on.
+        port (int): TCP port; 0 picks a free one.
+        socket_path (str): Listen on this Unix socket instead of TCP.
+
+    Returns:
+        socketserver.BaseServer: Call ``serve_forever()`` on it.
+    """
+    if socket_path:
+        server = UnixThreadingHTTPServer(socket_path, EstimatorRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), EstimatorRequestHandler)
+        server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve cost estimates over HTTP with warm price and parse caches.')
+    parser.add_argument('--host', default=DEFAULT_HOST, help='Address to listen on')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='Port to listen on')
+    parser.add_argument('--socket', help='Listen on this Unix socket instead of TCP')
+    parser.add_argument('--concurrency', type=int, default=pricing_fetch.DEFAULT_MAX_CONCURRENCY,
+                        help='Maximum Pricing API requests in flight per estimate')
+    parser.add_argument('--price-ttl', type=float, default=DEFAULT_PRICE_TTL_SECONDS,
+                        help='Seconds a price fetched from the Pricing API is reused')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+    args = parser.parse_args(argv)
+
+    EstimatorRequestHandler.verbose = args.verbose
+    service = EstimatorService(args.concurrency, price_ttl_seconds=args.price_ttl)
+    server = make_server(service, args.host, args.port, args.socket)
+    print(f"Serving estimates on {args.socket or f'http://{args.host}:{server.server_port}'}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+import hashlib
+import json
+import os
+
+STATE_VERSION = 1
+
+
+def resource_key(address, location=None):
+    """Return the state key of a resource; addresses in child modules are prefixed with the module."""
+    module = (location or {}).get('module', '.')
+    return address if module == '.' else f'{module}:{address}'
+
+
+def fingerprint(resource_type, attributes, usage):
+    """Hash everything that can change a resource's cost: its type, attributes and usage."""
+    payload = json.dumps([resource_type, attributes, usage], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def load_state(path):
+    """
+    Load the previous run's per-resource breakdown.
+
+    Returns:
+        dict: The state, or an empty state if the file is missing or was
+        written by another state version.
+    """
+    try:
+        with open(path, 'r') as file:
+            state = json.load(file)
+    except (OSError, ValueError):
+        state = None
+    if not state or state.get('version') != STATE_VERSION:
+        return {'version': STATE_VERSION, 'price_version': None, 'resources': {}, 'total_monthly_cost': 0.0}
+    return state
+
+
+def save_state(path, state):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary_path = path + '.tmp'
+    with open(temporary_path, 'w') as file:
+        json.dump(state, file, default=str)
+    os.replace(temporary_path, path)
+
+
+def diff_resources(previous, fingerprints):
+    """
+    Compare the current resources with the previous run.
+
+    Args:
+        previous (dict): ``state['resources']`` of the previous run.
+        fingerprints (dict): ``{key: fingerprint}`` of the current resources.
+
+    Returns:
+        dict: Lists of keys that were ``added``, ``changed``, ``removed`` or are ``unchanged``.
+    """
+    changes = {'added': [], 'changed': [], 'removed': [], 'unchanged': []}
+    for key, digest in fingerprints.items():
+        entry = previous.get(key)
+        if entry is None:
+            changes['added'].append(key)
+        elif entry['fingerprint'] != digest:
+            changes['changed'].append(key)
+        else:
+            changes['unchanged'].append(key)
+    changes['removed'] = [key for key in previous if key not in fingerprints]
+    return changes
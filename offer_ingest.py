@@ -0,0 +1,191 @@
+import gzip
+import resource
+import sys
+import time
+
+import price_catalog
+
+try:
+    import ijson
+except ImportError:  # Only needed for bulk ingestion
+    ijson = None
+
+TERM_TYPES = ('OnDemand', 'Reserved')
+BATCH_ROWS = 5000  # Price rows buffered between catalog writes
+PROGRESS_EVERY = 100000  # Report throughput after this many SKUs
+
+# Product attributes kept from the offer file; everything else is dropped while parsing
+PROJECTED_ATTRIBUTES = sorted({name for _, names in price_catalog.ATTRIBUTE_COLUMNS for name in names})
+# Quoted, as some attribute names (group) are SQL keywords
+_PROJECTED_COLUMNS = ', '.join(f'"{name}"' for name in PROJECTED_ATTRIBUTES)
+
+_STAGING_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS offer_products (
+    sku TEXT PRIMARY KEY,
+    product_family TEXT NOT NULL,
+    {', '.join(f'"{name}" TEXT' for name in PROJECTED_ATTRIBUTES)}
+);
+"""
+
+
+def _open_offer_file(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def read_offer_code(path):
+    """Return the ``offerCode`` from the header of an offer file, or None."""
+    _require_ijson()
+    with _open_offer_file(path) as file:
+        for prefix, event, value in ijson.parse(file):
+            if prefix == 'offerCode':
+                return value
+            if prefix in ('products', 'terms'):
+                return None
+    return None
+
+
+def iter_offer_section(path, section):
+    """
+    Stream the entries of one section of a bulk offer file.
+
+    Each pass only materializes one entry at a time, so memory use does not
+    depend on the size of the file; the C backend of ijson skips everything
+    outside the section without building objects.
+
+    Args:
+        path (str): Offer file location, optionally gzip-compressed.
+        section (str): ``'products'`` or a term section such as ``'terms.OnDemand'``.
+
+    Yields:
+        tuple: ``(sku, entry)`` pairs.
+    """
+    _require_ijson()
+    with _open_offer_file(path) as file:
+        yield from ijson.kvitems(file, section)
+
+
+def _require_ijson():
+    if ijson is None:
+        raise RuntimeError("Bulk ingestion requires the 'ijson' package (pip install ijson)")
+
+
+def ingest_offer_file(path, catalog, service=None):
+    """
+    Load a bulk price-list offer file into the catalog.
+
+    Products are projected down to the attributes the catalog indexes and staged
+    in SQLite, so the terms can be joined to them in later passes without keeping
+    the product table in memory.
+
+    Args:
+        path (str): Local path to an offer file, optionally gzip-compressed.
+        catalog (PriceCatalog): The catalog to write into.
+        service (str): Service code, defaults to the file's ``offerCode``.
+
+    Returns:
+        dict: Ingestion statistics, including throughput in SKUs per second.
+    """
+    connection = catalog.connection
+    connection.executescript(_STAGING_SCHEMA)
+    connection.execute('DELETE FROM offer_products')
+    insert_product = (
+        f'INSERT OR REPLACE INTO offer_products (sku, product_family, {_PROJECTED_COLUMNS}) '
+        f'VALUES ({", ".join("?" * (len(PROJECTED_ATTRIBUTES) + 2))})'
+    )
+    select_product = f'SELECT product_family, {_PROJECTED_COLUMNS} FROM offer_products WHERE sku = ?'
+
+    stats = {'path': path, 'service': service, 'products': 0, 'term_blocks': 0, 'rows': 0, 'orphan_terms': 0}
+    product_batch = []
+    term_batch = []
+    started = time.perf_counter()
+
+    def flush():
+        if product_batch:
+            connection.executemany(insert_product, product_batch)
+            product_batch.clear()
+        if term_batch:
+            stats['rows'] += catalog.add_products(term_batch, stats['service'])
+            term_batch.clear()
+
+    stats['service'] = stats['service'] or read_offer_code(path)
+    for sku, product in iter_offer_section(path, 'products'):
+        attributes = product.get('attributes', {})
+        product_batch.append(
+            (sku, product.get('productFamily', ''))
+            + tuple(attributes.get(name) for name in PROJECTED_ATTRIBUTES)
+        )
+        stats['products'] += 1
+        if len(product_batch) >= BATCH_ROWS:
+            flush()
+    flush()
+
+    for term_type in TERM_TYPES:
+        for sku, offers in iter_offer_section(path, f'terms.{term_type}'):
+            row = connection.execute(select_product, (sku,)).fetchone()
+            if row is None:
+                stats['orphan_terms'] += 1
+                continue
+            attributes = {
+                name: attribute for name, attribute in zip(PROJECTED_ATTRIBUTES, row[1:])
+                if attribute is not None
+            }
+            term_batch.append({
+                'product': {'sku': sku, 'productFamily': row[0], 'attributes': attributes},
+                'terms': {term_type: offers},
+            })
+            stats['term_blocks'] += 1
+            if len(term_batch) >= BATCH_ROWS:
+                flush()
+            if stats['term_blocks'] % PROGRESS_EVERY == 0:
+                elapsed = time.perf_counter() - started
+                print(f"Ingest {stats['service']}: {stats['products']} SKUs, "
+                      f"{stats['term_blocks']} term blocks after {elapsed:.1f}s")
+    flush()
+
+    connection.execute('DROP TABLE offer_products')
+    catalog.commit()
+
+    stats['seconds'] = time.perf_counter() - started
+    stats['skus_per_second'] = stats['products'] / stats['seconds'] if stats['seconds'] else 0.0
+    stats['peak_rss_mb'] = peak_rss_mb()
+    return stats
+
+
+def peak_rss_mb():
+    """
+    Return the peak resident set size of this process so far.
+
+    Returns:
+        float: Peak RSS in megabytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def build_catalog_from_offer_files(paths, path=price_catalog.DEFAULT_CATALOG_PATH):
+    """
+    Rebuild the catalog from local bulk offer files.
+
+    Args:
+        paths (list): Offer file locations, one per service.
+        path (str): Catalog location.
+
+    Returns:
+        list: The statistics of each ingested file.
+    """
+    results = []
+
+    def ingest(catalog):
+        for offer_path in paths:
+            stats = ingest_offer_file(offer_path, catalog)
+            print(f"Ingested {stats['service']} from {offer_path}: {stats['products']} SKUs, "
+                  f"{stats['rows']} price rows in {stats['seconds']:.1f}s "
+                  f"({stats['skus_per_second']:,.0f} SKUs/sec, peak RSS {stats['peak_rss_mb']:.0f} MB)")
+            results.append(stats)
+        return sorted({stats['service'] for stats in results})
+
+    price_catalog.rebuild_catalog(path, ingest)
+    return results
@@ -0,0 +1,169 @@
+import json
+import re
+
+try:
+    import ijson
+except ImportError:  # Plans are then loaded whole, which is fine for small ones
+    ijson = None
+
+_INDEX_SUFFIX = re.compile(r'\[[^\[\]]*\]$')
+_INDEX = re.compile(r'\[[^\[\]]*\]')
+
+
+def base_address(address):
+    """Strip the ``count``/``for_each`` index: ``aws_instance.web[0]`` -> ``aws_instance.web``."""
+    return _INDEX_SUFFIX.sub('', address)
+
+
+def _iter_items(path, prefix):
+    with open(path, 'rb') as file:
+        if ijson is not None:
+            yield from ijson.items(file, prefix, use_float=True)
+            return
+        document = json.load(file)
+    for key in prefix.split('.'):
+        if key == 'item':
+            yield from document or []
+            return
+        document = (document or {}).get(key)
+    if document is not None:
+        yield document
+
+
+def read_provider_regions(path):
+    """
+    Return the constant ``region`` of each AWS provider configuration in the plan.
+
+    Returns:
+        dict: ``{provider_config_key: region}``, e.g. ``{'aws': 'us-east-1'}``.
+    """
+    regions = {}
+    for provider_config in _iter_items(path, 'configuration.provider_config'):
+        for key, config in provider_config.items():
+            if config.get('name') != 'aws':
+                continue
+            region = config.get('expressions', {}).get('region', {}).get('constant_value')
+            if region:
+                regions[key] = region
+    return regions
+
+
+def read_resource_providers(path):
+    """
+    Return the provider configuration each resource block of the plan uses.
+
+    Returns:
+        dict: ``{block_address: provider_config_key}`` for the root module and
+        every module call, with module addresses unindexed, e.g.
+        ``{'module.app.aws_instance.web': 'module.app:aws'}``.
+    """
+    providers = {}
+
+    def walk(module, prefix):
+        for resource in module.get('resources', []):
+            if 'provider_config_key' in resource:
+                providers[prefix + resource['address']] = resource['provider_config_key']
+        for name, call in module.get('module_calls', {}).items():
+            walk(call.get('module', {}), f'{prefix}module.{name}.')
+
+    for root_module in _iter_items(path, 'configuration.root_module'):
+        walk(root_module, '')
+    return providers
+
+
+def resource_region(address, provider_config_key, regions):
+    """
+    Region of a resource from the provider configuration it uses.
+
+    A module without its own default ``aws`` configuration inherits its
+    parent's, as Terraform does; aliased configurations are never inherited.
+
+    Returns:
+        str: The region, or None when it cannot be told from the plan.
+    """
+    if provider_config_key is None:
+        return regions.get('aws') if not address.startswith('module.') else None
+    while provider_config_key not in regions:
+        module, separator, name = provider_config_key.rpartition(':')
+        if not separator or name != 'aws':
+            return None
+        parent = module.rpartition('.module.')[0] if '.module.' in module else ''
+        provider_config_key = f'{parent}:aws' if parent else 'aws'
+    return regions[provider_config_key]
+
+
+def iter_planned_resources(path):
+    """
+    Stream the managed resources a plan will leave in place.
+
+    ``resource_changes`` is read one entry at a time, so memory does not grow
+    with the size of the plan. Resources being deleted and data sources are skipped.
+
+    Args:
+        path (str): Output of ``terraform show -json <planfile>``.
+
+    Yields:
+        tuple: ``(address, resource_type, attributes, location)``, one per
+        expanded instance; ``location`` holds the ``module`` address.
+    """
+    regions = read_provider_regions(path)
+    providers = read_resource_providers(path)
+    for change in _iter_items(path, 'resource_changes.item'):
+        if change.get('mode', 'managed') != 'managed':
+            continue
+        after = change.get('change', {}).get('after')
+        if after is None:
+            continue
+        if not after.get('region'):
+            # Resources on a provider whose region is unknown are left without one
+            region = resource_region(change['address'], providers.get(_INDEX.sub('', change['address'])), regions)
+            if region:
+                after = dict(after, region=region)
+        location = {'module': change.get('module_address') or '.'}
+        yield change['address'], change['type'], after, location
+
+
+def aggregate_instances(resources, group_key):
+    """
+    Collapse ``count``/``for_each`` instances that would price identically.
+
+    Instances of one resource block that produce the same ``group_key`` are
+    replaced by a single representative whose ``count`` attribute holds the
+    number of instances, so each distinct configuration is priced once and
+    multiplied rather than priced per instance.
+
+    Args:
+        resources (iterable): ``(address, resource_type, attributes, location)`` tuples.
+        group_key (callable): ``group_key(address, resource_type, attributes)``
+            returns a hashable summary of everything that affects the price,
+            including usage looked up by address.
+
+    Returns:
+        tuple: ``(aggregated_resources, stats)``.
+    """
+    groups = {}
+    instances = 0
+    for address, resource_type, attributes, location in resources:
+        instances += 1
+        key = (location['module'], base_address(address), resource_type, group_key(address, resource_type, attributes))
+        group = groups.get(key)
+        if group is None:
+            groups[key] = [address, resource_type, attributes, location, 1]
+        else:
+            group[4] += 1
+
+    groups_per_block = {}
+    for module, block_address, _, _ in groups:
+        groups_per_block[(module, block_address)] = groups_per_block.get((module, block_address), 0) + 1
+
+    aggregated = []
+    for (module, block_address, _, price_key), (address, resource_type, attributes, location, count) in groups.items():
+        # One group per block is named after the block; otherwise after its first instance.
+        # The group is priced again under its new name, so only rename when that
+        # resolves the same way (a per-instance usage entry would be lost).
+        if (groups_per_block[(module, block_address)] == 1
+                and group_key(block_address, resource_type, attributes) == price_key):
+            address = block_address
+        aggregated.append((address, resource_type, dict(attributes, count=count), dict(location, instances=count)))
+
+    return aggregated, {'instances': instances, 'priced_groups': len(aggregated)}
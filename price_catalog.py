@@ -0,0 +1,594 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import pricing_crawler
+import pricing_fetch
+import sku_record
+
+# Bump whenever the table layout or the normalization rules change; a catalog
+# written with another version is treated as stale and must be refreshed.
+SCHEMA_VERSION = 4
+
+DEFAULT_CATALOG_PATH = os.path.join(
+    os.path.expanduser('~'), '.cache', 'aws_estimator', 'price_catalog.sqlite3'
+)
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600  # AWS publishes price changes at most a few times a month
+
+# Services fetched by a refresh, i.e. everything the get_*_pricing functions ask for
+CATALOG_SERVICES = [
+    'AmazonEC2',
+    'AmazonS3',
+    'AmazonRDS',
+    'AWSLambda',
+    'AmazonDynamoDB',
+    'AmazonVPC',
+    'AWSFargate',
+    'AmazonEKS',
+]
+
+# Pricing API filter fields the catalog can answer, mapped to their column
+FILTER_COLUMNS = {
+    'regionCode': 'region',
+    'instanceType': 'instance_type',
+    'dbInstanceClass': 'instance_type',
+    'operatingSystem': 'operating_system',
+    'tenancy': 'tenancy',
+    'databaseEngine': 'database_engine',
+    'licenseModel': 'license_model',
+    'storageClass': 'storage_class',
+    'productFamily': 'product_family',
+    'preInstalledSw': 'pre_installed_sw',
+    'capacitystatus': 'capacity_status',
+    'group': 'product_group',
+}
+
+# Product attribute for each column; the first attribute present wins
+ATTRIBUTE_COLUMNS = [
+    ('region', ('regionCode',)),
+    ('instance_type', ('instanceType', 'dbInstanceClass')),
+    ('operating_system', ('operatingSystem',)),
+    ('tenancy', ('tenancy',)),
+    ('database_engine', ('databaseEngine',)),
+    ('license_model', ('licenseModel',)),
+    ('storage_class', ('storageClass',)),
+    ('pre_installed_sw', ('preInstalledSw',)),
+    ('capacity_status', ('capacitystatus',)),
+    ('vcpu', ('vcpu',)),
+    ('memory', ('memory',)),
+    ('product_group', ('group',)),
+]
+
+# Reserved offer term attribute for each column
+TERM_ATTRIBUTE_COLUMNS = [
+    ('lease_contract_length', 'LeaseContractLength'),
+    ('purchase_option', 'PurchaseOption'),
+    ('offering_class', 'OfferingClass'),
+]
+
+# Hours a commitment of each lease length is paid for
+LEASE_HOURS = {
+    '1yr': 365 * 24,
+    '3yr': 3 * 365 * 24,
+}
+
+PRICE_COLUMNS = [
+    'rate_code',
+    'sku',
+    'service',
+    'product_family',
+    'region',
+    'instance_type',
+    'operating_system',
+    'tenancy',
+    'database_engine',
+    'license_model',
+    'storage_class',
+    'pre_installed_sw',
+    'capacity_status',
+    'vcpu',
+    'memory',
+    'product_group',
+    'term',
+    'offer_term_code',
+    'lease_contract_length',
+    'purchase_option',
+    'offering_class',
+    'description',
+    'unit',
+    'begin_range',
+    'end_range',
+    'price_usd',
+]
+
+# INSERT OR REPLACE would delete and re-insert the row, moving it to the end
+_UPSERT_PRICE = (
+    f'INSERT INTO prices ({", ".join(PRICE_COLUMNS)}) VALUES ({", ".join("?" * len(PRICE_COLUMNS))}) '
+    f'ON CONFLICT (rate_code) DO UPDATE SET '
+    f'{", ".join(f"{column} = excluded.{column}" for column in PRICE_COLUMNS[1:])}'
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS prices (
+    rate_code TEXT PRIMARY KEY,
+    sku TEXT NOT NULL,
+    service TEXT NOT NULL,
+    product_family TEXT NOT NULL COLLATE NOCASE,
+    region TEXT NOT NULL,
+    instance_type TEXT NOT NULL COLLATE NOCASE,
+    operating_system TEXT NOT NULL COLLATE NOCASE,
+    tenancy TEXT NOT NULL COLLATE NOCASE,
+    database_engine TEXT NOT NULL COLLATE NOCASE,
+    license_model TEXT NOT NULL COLLATE NOCASE,
+    storage_class TEXT NOT NULL COLLATE NOCASE,
+    pre_installed_sw TEXT NOT NULL COLLATE NOCASE,
+    capacity_status TEXT NOT NULL COLLATE NOCASE,
+    vcpu TEXT NOT NULL,
+    memory TEXT NOT NULL,
+    product_group TEXT NOT NULL COLLATE NOCASE,
+    term TEXT NOT NULL,
+    offer_term_code TEXT NOT NULL,
+    lease_contract_length TEXT NOT NULL,
+    purchase_option TEXT NOT NULL,
+    offering_class TEXT NOT NULL,
+    description TEXT NOT NULL,
+    unit TEXT NOT NULL,
+    begin_range REAL NOT NULL,
+    end_range REAL,
+    price_usd REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS prices_lookup
+    ON prices (service, instance_type, region, operating_system, tenancy, term);
+CREATE INDEX IF NOT EXISTS prices_sku ON prices (sku);
+CREATE TABLE IF NOT EXISTS commitment_rates (
+    sku TEXT NOT NULL,
+    offer_term_code TEXT NOT NULL,
+    service TEXT NOT NULL,
+    lease_contract_length TEXT NOT NULL,
+    purchase_option TEXT NOT NULL,
+    offering_class TEXT NOT NULL,
+    upfront_usd REAL NOT NULL,
+    hourly_usd REAL NOT NULL,
+    effective_hourly_usd REAL NOT NULL,
+    PRIMARY KEY (sku, offer_term_code)
+);
+"""
+
+
+def normalize_product(product, service=None):
+    """
+    Flatten one Pricing API product into catalog rows.
+
+    Args:
+        product: A ``sku_record.SkuRecord``, or a decoded entry of a
+            get_products ``PriceList``.
+        service (str): The service code, used when the product does not carry one.
+
+    Returns:
+        list: One tuple per price dimension, in ``PRICE_COLUMNS`` order.
+    """
+    if not isinstance(product, sku_record.SkuRecord):
+        product = sku_record.from_product(product, service)
+    service = service or product.service
+
+    dimensions = []
+    for column, names in ATTRIBUTE_COLUMNS:
+        dimensions.append(next((product.attribute(name) for name in names if product.attribute(name)), ''))
+
+    rows = []
+    for term in product.terms:
+        for dimension in term.dimensions:
+            rows.append((
+                dimension.rate_code,
+                product.sku,
+                service,
+                product.product_family,
+                *dimensions,
+                term.term_type,
+                term.offer_term_code,
+                term.lease_contract_length,
+                term.purchase_option,
+                term.offering_class,
+                dimension.description,
+                dimension.unit,
+                dimension.begin_range,
+                dimension.end_range,
+                dimension.price_usd,
+            ))
+    return rows
+
+
+class PriceCatalog:
+    """
+    Local SQLite store of normalized SKU prices.
+
+    The catalog answers the same questions the get_*_pricing functions send to
+    the Pricing API, so a refreshed catalog makes a cost estimate network-free.
+    Results are memoized per filter set, so repeated lookups for the same
+    instance type never touch SQLite twice.
+    """
+
+    def __init__(self, path=DEFAULT_CATALOG_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(_SCHEMA)
+        # Guards the connection and the memos: one catalog is shared by server and prefetch threads.
+        # Reentrant, as queries read metadata through the same methods callers use.
+        self._lock = threading.RLock()
+        self._memo = {}
+        self._commitment_memo = {}
+
+    def close(self):
+        self.connection.close()
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self.connection.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        with self._lock:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, str(value))
+            )
+
+    def services(self):
+        """Return the service codes the last refresh covered."""
+        return json.loads(self.get_meta('services', '[]'))
+
+    def age_seconds(self):
+        """Return seconds since the last refresh, or None if never refreshed."""
+        refreshed_at = self.get_meta('refreshed_at')
+        if refreshed_at is None:
+            return None
+        return time.time() - float(refreshed_at)
+
+    def is_stale(self, ttl_seconds=DEFAULT_TTL_SECONDS):
+        """
+        Check whether the catalog must be refreshed before use.
+
+        Only the version stamp and refresh time stored in the catalog itself are
+        inspected, so this never touches the network.
+
+        Args:
+            ttl_seconds (float): Maximum accepted age of the data.
+
+        Returns:
+            bool: True if the catalog is empty, outdated or from another schema version.
+        """
+        if self.get_meta('schema_version') != str(SCHEMA_VERSION):
+            return True
+        age = self.age_seconds()
+        return age is None or age > ttl_seconds
+
+    def add_products(self, products, service=None):
+        """
+        Insert Pricing API products (``SkuRecord``s or decoded documents),
+        replacing rows with the same rate code.
+
+        A replaced row keeps its place (rowid), so writing a page again, as a
+        resumed or restarted crawl does, never reorders the catalog; lookups
+        that take the first SKU in catalog order depend on that.
+
+        Returns:
+            int: The number of price rows written.
+        """
+        rows = []
+        for product in products:
+            rows.extend(normalize_product(product, service))
+        with self._lock:
+            self.connection.executemany(_UPSERT_PRICE, rows)
+            self._memo.clear()
+            self._commitment_memo.clear()
+        return len(rows)
+
+    def commit(self):
+        with self._lock:
+            self.connection.commit()
+
+    def get_products(self, service_code, filters, max_results=1):
+        """
+        Answer a get_products call from the catalog.
+
+        Args:
+            service_code (str): The Pricing API service code (e.g., "AmazonEC2").
+            filters (list): TERM_MATCH filters, as passed to get_products.
+            max_results (int): Maximum number of products to return.
+
+        Returns:
+            list: ``sku_record.SkuRecord``s, or
+            None if the catalog cannot answer (service not refreshed or an
+            unsupported filter field), in which case the caller should ask the API.
+        """
+        key = (service_code, tuple((f['Field'], f['Value']) for f in filters), max_results)
+        with self._lock:
+            if key not in self._memo:
+                self._memo[key] = self._query_products(key)
+            return self._memo[key]
+
+    def _query_products(self, key):
+        service_code, filters, max_results = key
+        if service_code not in self.services():
+            return None
+        clauses = ['service = ?']
+        params = [service_code]
+        for field, value in filters:
+            column = FILTER_COLUMNS.get(field)
+            if column is None:
+                return None
+            clauses.append(f'{column} = ?')
+            params.append(value)
+
+        skus = [row[0] for row in self.connection.execute(
+            f'SELECT sku FROM prices WHERE {" AND ".join(clauses)} '
+            f'GROUP BY sku ORDER BY MIN(rowid) LIMIT ?',
+            (*params, max_results),
+        )]
+        return [self._build_product(sku) for sku in skus]
+
+    def select_prices(self, service_code, columns, term='OnDemand'):
+        """
+        Read the price rows of one service and term type, in catalog (insertion) order.
+
+        Args:
+            service_code (str): The Pricing API service code.
+            columns (list): ``PRICE_COLUMNS`` to select.
+            term (str): ``OnDemand`` or ``Reserved``.
+
+        Returns:
+            list: One tuple of the selected columns per row.
+        """
+        with self._lock:
+            return self.connection.execute(
+                f'SELECT {", ".join(columns)} FROM prices WHERE service = ? AND term = ? ORDER BY rowid',
+                (service_code, term)
+            ).fetchall()
+
+    def build_commitment_rates(self):
+        """
+        Precompute the amortized hourly rate of every Reserved offer.
+
+        Each Reserved offer has an hourly fee (unit ``Hrs``) and an upfront fee
+        (unit ``Quantity``); its effective hourly rate spreads the upfront fee
+        over the hours of the lease. The result is one ``commitment_rates`` row
+        per SKU and offer, so comparing commitments never re-reads the price rows.
+
+        Returns:
+            int: The number of commitment offers stored.
+        """
+        lease_hours = ' '.join(f"WHEN '{lease}' THEN {hours}" for lease, hours in LEASE_HOURS.items())
+        self.connection.execute('DELETE FROM commitment_rates')
+        self.connection.execute(f"""
+            INSERT INTO commitment_rates
+            SELECT sku, offer_term_code, service, lease_contract_length, purchase_option, offering_class,
+                   upfront, hourly, hourly + upfront / (CASE lease_contract_length {lease_hours} END)
+            FROM (
+                SELECT sku, offer_term_code, MIN(service) AS service,
+                       MIN(lease_contract_length) AS lease_contract_length,
+                       MIN(purchase_option) AS purchase_option, MIN(offering_class) AS offering_class,
+                       SUM(CASE WHEN unit = 'Quantity' THEN price_usd ELSE 0 END) AS upfront,
+                       SUM(CASE WHEN unit = 'Hrs' THEN price_usd ELSE 0 END) AS hourly
+                FROM prices
+                WHERE term = 'Reserved' AND lease_contract_length IN ({', '.join(f"'{lease}'" for lease in LEASE_HOURS)})
+                GROUP BY sku, offer_term_code
+            )
+        """)
+        with self._lock:
+            self._commitment_memo.clear()
+            return self.connection.execute('SELECT COUNT(*) FROM commitment_rates').fetchone()[0]
+
+    def commitment_rates(self, sku):
+        """
+        Return the Reserved offers of a SKU, cheapest effective hourly rate first.
+
+        Returns:
+            list: One dict per offer with ``lease_contract_length``,
+            ``purchase_option``, ``offering_class``, ``upfront_usd``,
+            ``hourly_usd`` and ``effective_hourly_usd``; empty if the SKU has none.
+        """
+        columns = ['lease_contract_length', 'purchase_option', 'offering_class',
+                   'upfront_usd', 'hourly_usd', 'effective_hourly_usd']
+        with self._lock:
+            rates = self._commitment_memo.get(sku)
+            if rates is None:
+                rows = self.connection.execute(
+                    f'SELECT {", ".join(columns)} FROM commitment_rates WHERE sku = ? '
+                    f'ORDER BY effective_hourly_usd, offer_term_code',
+                    (sku,),
+                ).fetchall()
+                rates = self._commitment_memo[sku] = [dict(zip(columns, row)) for row in rows]
+            return rates
+
+    def _build_product(self, sku):
+        values = None
+        terms = {}
+        for row in self.connection.execute(
+            f'SELECT {", ".join(PRICE_COLUMNS)} FROM prices WHERE sku = ? ORDER BY rowid', (sku,)
+        ):
+            values = dict(zip(PRICE_COLUMNS, row))
+            term = terms.get((values['term'], values['offer_term_code']))
+            if term is None:
+                term = terms[values['term'], values['offer_term_code']] = sku_record.OfferTerm(
+                    values['term'], values['offer_term_code'],
+                    *[values[column] for column, _ in TERM_ATTRIBUTE_COLUMNS], [],
+                )
+            term.dimensions.append(sku_record.PriceDimension(
+                values['rate_code'], sys.intern(values['description']), sys.intern(values['unit']),
+                values['begin_range'], values['end_range'], sku_record.to_fixed(values['price_usd']),
+            ))
+        if values is None:
+            return None
+        attributes = dict.fromkeys(sku_record.RECORD_ATTRIBUTES, '')
+        for column, names in ATTRIBUTE_COLUMNS:
+            attributes[names[0]] = sys.intern(values[column])
+        for term in terms.values():
+            term.dimensions = tuple(term.dimensions)
+        return sku_record.SkuRecord(sku, values['service'], values['product_family'], tuple(attributes.values()),
+                                    tuple(terms.values()))
+
+
+def rebuild_catalog(path, build, resume=False):
+    """
+    Build a fresh catalog next to ``path`` and swap it in atomically.
+
+    An interrupted rebuild leaves the previous catalog untouched and usable.
+
+    Args:
+        path (str): Catalog location.
+        build (callable): Fills the new catalog and returns the service codes it covers.
+        resume (bool): Keep the partial catalog an interrupted rebuild left
+            behind, for builds that know where they stopped.
+    """
+    temporary_path = path + '.tmp'
+    if os.path.exists(temporary_path) and not resume:
+        os.remove(temporary_path)
+
+    catalog = PriceCatalog(temporary_path)
+    # The file is only swapped in once complete, so durability of each write is moot
+    catalog.connection.execute('PRAGMA synchronous = OFF')
+    try:
+        services = build(catalog)
+        catalog.build_commitment_rates()
+        catalog.set_meta('schema_version', SCHEMA_VERSION)
+        catalog.set_meta('refreshed_at', time.time())
+        catalog.set_meta('services', json.dumps(services))
+        catalog.commit()
+    finally:
+        catalog.close()
+
+    os.replace(temporary_path, path)
+
+
+def refresh_catalog(client, path=DEFAULT_CATALOG_PATH, services=None, regions=None,
+                    max_concurrency=pricing_fetch.DEFAULT_MAX_CONCURRENCY, resume=True):
+    """
+    Rebuild the catalog from the Pricing API.
+
+    Services (and regions, when given) are crawled in parallel with
+    ``pricing_crawler.crawl``. Progress is checkpointed next to the catalog, so
+    a refresh that fails or is interrupted resumes where it stopped the next
+    time it runs; the previous catalog stays in use until the crawl completes.
+
+    Args:
+        client: A boto3 ``pricing`` client.
+        path (str): Catalog location.
+        services (list): Service codes to fetch, defaults to ``CATALOG_SERVICES``.
+        regions (list): Region codes to keep, defaults to all regions.
+        max_concurrency (int): Upper bound on Pricing API requests in flight.
+        resume (bool): Continue an interrupted refresh instead of starting over.
+
+    Returns:
+        int: The number of price rows stored.
+
+    Raises:
+        RuntimeError: If some pages could not be fetched; run again to resume.
+    """
+    services = services or CATALOG_SERVICES
+    checkpoint_path = path + '.crawl.json'
+    # Progress only means something alongside the partial catalog it was written to
+    resume = resume and os.path.exists(checkpoint_path) and os.path.exists(path + '.tmp')
+    checkpoint = pricing_crawler.CrawlCheckpoint(checkpoint_path)
+    if not resume:
+        checkpoint.remove()
+
+    def report(service_code, filters, state):
+        scope = ' '.join([service_code] + [f['Value'] for f in filters])
+        print(f"Catalog: {scope} done ({state['products']} products in {state['pages']} pages)")
+
+    def fetch(catalog):
+        stats = pricing_crawler.crawl(client, catalog, pricing_crawler.crawl_tasks(services, regions), checkpoint,
+                                      max_concurrency, progress=report)
+        if stats['errors']:
+            failed = '; '.join(f'{key}: {error}' for key, error in sorted(stats['errors'].items()))
+            raise RuntimeError(f"{len(stats['errors'])} of {stats['tasks']} crawl tasks failed ({failed}); "
+                               f"progress is saved, refresh again to resume")
+        return services
+
+    rebuild_catalog(path, fetch, resume)
+    checkpoint.remove()
+    catalog = PriceCatalog(path)
+    try:
+        return catalog.connection.execute('SELECT COUNT(*) FROM prices').fetchone()[0]
+    finally:
+        catalog.close()
+
+
+def open_catalog(path=None):
+    """
+    Open the catalog at ``path`` (or ``$AWS_ESTIMATOR_CATALOG``) if it exists.
+
+    Returns:
+        PriceCatalog: The catalog, or None if it has never been refreshed.
+    """
+    path = path or os.environ.get('AWS_ESTIMATOR_CATALOG', DEFAULT_CATALOG_PATH)
+    if not os.path.exists(path):
+        return None
+    return PriceCatalog(path)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Manage the local AWS price catalog.')
+    parser.add_argument('--catalog', default=os.environ.get('AWS_ESTIMATOR_CATALOG', DEFAULT_CATALOG_PATH),
+                        help='Catalog location')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    refresh_parser = subparsers.add_parser('refresh', help='Rebuild the catalog from the Pricing API')
+    refresh_parser.add_argument('--service', action='append', dest='services',
+                                help='Service code to fetch (repeatable, default: all estimator services)')
+    refresh_parser.add_argument('--region', action='append', dest='regions',
+                                help='Region code to keep (repeatable, default: all regions)')
+    refresh_parser.add_argument('--concurrency', type=int, default=pricing_fetch.DEFAULT_MAX_CONCURRENCY,
+                                help='Maximum Pricing API requests in flight')
+    refresh_parser.add_argument('--restart', action='store_true',
+                                help='Discard the progress of an interrupted refresh and start over')
+    ingest_parser = subparsers.add_parser('ingest', help='Rebuild the catalog from local bulk offer files')
+    ingest_parser.add_argument('offer_files', nargs='+', help='Offer file (index.json, optionally .gz) per service')
+    subparsers.add_parser('status', help='Show catalog age and staleness')
+    args = parser.parse_args(argv)
+
+    if args.command == 'refresh':
+        import boto3
+
+        client = boto3.Session(region_name='us-east-1').client('pricing')
+        try:
+            rows = refresh_catalog(client, args.catalog, args.services, args.regions, args.concurrency,
+                                   resume=not args.restart)
+        except RuntimeError as e:
+            print(f"Catalog refresh incomplete: {e}")
+            return 1
+        print(f"Catalog refreshed: {rows} price rows written to {args.catalog}")
+        return 0
+
+    if args.command == 'ingest':
+        import offer_ingest
+
+        results = offer_ingest.build_catalog_from_offer_files(args.offer_files, args.catalog)
+        print(f"Catalog rebuilt from {len(results)} offer files into {args.catalog}")
+        return 0
+
+    catalog = open_catalog(args.catalog)
+    if catalog is None:
+        print(f"No catalog at {args.catalog}; run the refresh command first.")
+        return 1
+    age = catalog.age_seconds()
+    print(f"Catalog: {args.catalog}")
+    print(f"Schema version: {catalog.get_meta('schema_version')} (expected {SCHEMA_VERSION})")
+    print(f"Services: {', '.join(catalog.services()) or 'none'}")
+    print(f"Age: {'never refreshed' if age is None else f'{age / 3600:.1f} hours'}")
+    print(f"Stale: {'yes' if catalog.is_stale() else 'no'}")
+    return 1 if catalog.is_stale() else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
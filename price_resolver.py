@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 4096
+
+
+class _Flight:
+    """A lookup in progress that concurrent callers for the same key wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class PriceResolver:
+    """
+    Memoizing front for price lookups.
+
+    Results are kept in a size-bounded LRU keyed by the full filter tuple. Empty
+    results ("no price found") are cached too, so a missing SKU is only asked
+    for once. Concurrent callers asking for a key that is already being fetched
+    wait for that fetch instead of issuing their own (single-flight).
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, negative_ttl_seconds=None, ttl_seconds=None):
+        """
+        Args:
+            max_entries (int): Maximum number of cached keys before the least
+                recently used one is evicted.
+            negative_ttl_seconds (float): How long an empty result stays cached,
+                or None to keep it until evicted.
+            ttl_seconds (float): How long a price stays cached, or None to keep
+                it until evicted. Long-running processes set it so price
+                changes are eventually picked up.
+        """
+        self.max_entries = max_entries
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def resolve(self, key, loader):
+        """
+        Return the cached value for ``key``, calling ``loader()`` on a miss.
+
+        Errors raised by the loader are passed to every waiting caller and are
+        not cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    if value:
+                        self.hits += 1
+                    else:
+                        self.negative_hits += 1
+                    return value
+                del self._entries[key]
+
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader()
+        except Exception as e:
+            flight.error = e
+            raise
+        else:
+            self._store(key, flight.value)
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.value
+
+    def _store(self, key, value):
+        ttl_seconds = self.ttl_seconds if value else self.negative_ttl_seconds
+        expires_at = time.monotonic() + ttl_seconds if ttl_seconds is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return the hit/miss/eviction counters and the current cache size."""
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses + self.coalesced
+            return {
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'hit_rate': (lookups - self.misses) / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,192 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pricing_fetch
+import sku_record
+
+PAGE_SIZE = 100  # The largest MaxResults get_products accepts
+
+# Server-side errors worth retrying; throttling is handled by call_with_backoff
+TRANSIENT_ERROR_CODES = {
+    'InternalErrorException',
+    'ServiceUnavailableException',
+    'ServiceUnavailable',
+}
+# A checkpointed NextToken the API no longer accepts; the task restarts from its first page
+EXPIRED_TOKEN_ERROR_CODES = {
+    'ExpiredNextTokenException',
+    'InvalidNextTokenException',
+}
+
+
+def _error_code(error):
+    response = getattr(error, 'response', None) or {}
+    return response.get('Error', {}).get('Code')
+
+
+def task_key(service_code, filters):
+    """Return the checkpoint key of a crawl task: a service code and its TERM_MATCH filters."""
+    return json.dumps([service_code, [[f['Field'], f['Value']] for f in filters]])
+
+
+def crawl_tasks(services, regions=None):
+    """
+    Split a crawl into independent tasks, one per service, or per service and region.
+
+    Returns:
+        list: ``(service_code, filters)`` pairs.
+    """
+    if not regions:
+        return [(service_code, []) for service_code in services]
+    return [
+        (service_code, [{'Type': 'TERM_MATCH', 'Field': 'regionCode', 'Value': region}])
+        for service_code in services
+        for region in regions
+    ]
+
+
+class CrawlCheckpoint:
+    """
+    On-disk record of how far each crawl task got.
+
+    Each task stores the ``NextToken`` of its next page, the pages and
+    products written so far, and whether it finished. The file is rewritten
+    atomically after every page, once that page is committed to the catalog,
+    so a crawl interrupted at any point resumes without losing or skipping a
+    page. Re-fetching the page in flight is harmless: catalog writes replace
+    rows by rate code.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.tasks = {}
+        if path and os.path.exists(path):
+            with open(path, 'r') as file:
+                self.tasks = json.load(file).get('tasks', {})
+
+    def get(self, key):
+        return self.tasks.get(key)
+
+    def update(self, key, next_token, pages, products, done=False):
+        self.tasks[key] = {'next_token': next_token, 'pages': pages, 'products': products, 'done': done}
+        self.save()
+
+    def save(self):
+        if not self.path:
+            return
+        temporary_path = self.path + '.tmp'
+        with open(temporary_path, 'w') as file:
+            json.dump({'saved_at': time.time(), 'tasks': self.tasks}, file)
+        os.replace(temporary_path, self.path)
+
+    def remove(self):
+        self.tasks = {}
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def crawl(client, catalog, tasks, checkpoint=None, max_concurrency=pricing_fetch.DEFAULT_MAX_CONCURRENCY,
+          max_retries=pricing_fetch.DEFAULT_MAX_RETRIES, page_size=PAGE_SIZE, progress=None,
+          sleep=time.sleep):
+    """
+    Page through get_products for every task and write the products into a catalog.
+
+    Tasks run in parallel, at most ``max_concurrency`` requests in flight
+    under a shared ``AdaptiveLimiter``; the pages of one task are sequential
+    because each needs the previous page's ``NextToken``. Throttling and
+    transient server errors are retried with backoff. A task that still fails
+    is reported in ``errors`` and keeps its checkpoint, so calling ``crawl``
+    again with the same checkpoint resumes it; finished tasks are skipped.
+
+    Args:
+        client: A boto3 ``pricing`` client, or a stub with ``get_products``.
+        catalog (price_catalog.PriceCatalog): Where products are written.
+        tasks (list): ``(service_code, filters)`` pairs, see ``crawl_tasks``.
+        checkpoint (CrawlCheckpoint): Progress to resume from and update.
+        max_concurrency (int): Upper bound on requests in flight.
+        max_retries (int): Retries per page for throttling and transient errors.
+        page_size (int): ``MaxResults`` of each request.
+        progress (callable): Called with ``(service_code, filters, state)``
+            when a task finishes.
+
+    Returns:
+        dict: ``tasks``, ``completed``, ``resumed``, ``pages``, ``products``,
+        ``rows``, ``retries``, ``throttled``, ``restarted`` and
+        ``errors`` (``{task_key: message}``).
+    """
+    checkpoint = checkpoint or CrawlCheckpoint(None)
+    limiter = pricing_fetch.AdaptiveLimiter(max_concurrency)
+    write_lock = threading.Lock()
+    stats = {'tasks': len(tasks), 'completed': 0, 'resumed': 0, 'pages': 0, 'products': 0, 'rows': 0,
+             'retries': 0, 'restarted': 0, 'errors': {}}
+
+    def fetch_page(service_code, filters, next_token):
+        kwargs = {'ServiceCode': service_code, 'Filters': filters, 'MaxResults': page_size}
+        if next_token:
+            kwargs['NextToken'] = next_token
+        attempt = 0
+        while True:
+            try:
+                return pricing_fetch.call_with_backoff(lambda: client.get_products(**kwargs), limiter,
+                                                       max_retries, sleep)
+            except Exception as e:
+                if _error_code(e) not in TRANSIENT_ERROR_CODES or attempt >= max_retries:
+                    raise
+                sleep(pricing_fetch.backoff_delay(attempt))
+                attempt += 1
+                with write_lock:
+                    stats['retries'] += 1
+
+    def run(task):
+        service_code, filters = task
+        key = task_key(service_code, filters)
+        state = checkpoint.get(key) or {'next_token': None, 'pages': 0, 'products': 0, 'done': False}
+        if state['done']:
+            with write_lock:
+                stats['completed'] += 1
+            return
+        if state['next_token']:
+            with write_lock:
+                stats['resumed'] += 1
+        next_token, pages, products = state['next_token'], state['pages'], state['products']
+        restarted = False
+        while True:
+            try:
+                page, retries = fetch_page(service_code, filters, next_token)
+            except Exception as e:
+                if _error_code(e) in EXPIRED_TOKEN_ERROR_CODES and next_token and not restarted:
+                    # Pages already written are rewritten identically on the way back
+                    next_token, pages, products, restarted = None, 0, 0, True
+                    with write_lock:
+                        stats['restarted'] += 1
+                    continue
+                with write_lock:
+                    stats['errors'][key] = str(e)
+                return
+            records = [sku_record.from_json(product, service_code) for product in page.get('PriceList', [])]
+            next_token = page.get('NextToken')
+            pages += 1
+            products += len(records)
+            with write_lock:
+                stats['rows'] += catalog.add_products(records, service_code)
+                catalog.commit()
+                checkpoint.update(key, next_token, pages, products, done=not next_token)
+                stats['pages'] += 1
+                stats['products'] += len(records)
+                stats['retries'] += retries
+                if not next_token:
+                    stats['completed'] += 1
+            if not next_token:
+                break
+        if progress is not None:
+            progress(service_code, filters, checkpoint.get(key))
+
+    if tasks:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(tasks)))) as executor:
+            list(executor.map(run, tasks))
+
+    stats['throttled'] = limiter.throttled
+    return stats
@@ -0,0 +1,165 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_MAX_RETRIES = 6
+BASE_BACKOFF_SECONDS = 0.2
+MAX_BACKOFF_SECONDS = 10.0
+
+THROTTLING_ERROR_CODES = {
+    'Throttling',
+    'ThrottlingException',
+    'TooManyRequestsException',
+    'RequestLimitExceeded',
+}
+
+
+def is_throttling_error(error):
+    """Return True if ``error`` is a botocore-style throttling error."""
+    response = getattr(error, 'response', None) or {}
+    return response.get('Error', {}).get('Code') in THROTTLING_ERROR_CODES
+
+
+def backoff_delay(attempt, base=BASE_BACKOFF_SECONDS, cap=MAX_BACKOFF_SECONDS):
+    """Exponential backoff with full jitter for the given retry attempt (0-based)."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit that backs off when the Pricing API throttles.
+
+    The limit is halved on every throttling error and grows back by one slot
+    after a run of successful calls (additive increase, multiplicative decrease),
+    so the crawl settles just under the account's request rate.
+    """
+
+    def __init__(self, max_concurrency=DEFAULT_MAX_CONCURRENCY, increase_after=10):
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.increase_after = increase_after
+        self.active = 0
+        self.throttled = 0
+        self._successes = 0
+        self._condition = threading.Condition()
+
+    def __enter__(self):
+        with self._condition:
+            while self.active >= self.limit:
+                self._condition.wait()
+            self.active += 1
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify_all()
+        return False
+
+    def on_success(self):
+        with self._condition:
+            self._successes += 1
+            if self._successes >= self.increase_after and self.limit < self.max_concurrency:
+                self.limit += 1
+                self._successes = 0
+                self._condition.notify_all()
+
+    def on_throttle(self):
+        with self._condition:
+            self.throttled += 1
+            self._successes = 0
+            self.limit = max(1, self.limit // 2)
+
+
+def call_with_backoff(call, limiter=None, max_retries=DEFAULT_MAX_RETRIES, sleep=time.sleep):
+    """
+    Run ``call()``, retrying throttling errors with jittered exponential backoff.
+
+    Args:
+        call (callable): The request to make.
+        limiter (AdaptiveLimiter): Optional shared limiter to hold a slot in and
+            to report throttling to.
+        max_retries (int): Retries before the throttling error is raised.
+
+    Returns:
+        tuple: ``(result, retries)``.
+    """
+    attempt = 0
+    while True:
+        try:
+            if limiter is None:
+                result = call()
+            else:
+                with limiter:
+                    result = call()
+        except Exception as e:
+            if not is_throttling_error(e) or attempt >= max_retries:
+                raise
+            if limiter is not None:
+                limiter.on_throttle()
+            sleep(backoff_delay(attempt))
+            attempt += 1
+            continue
+        if limiter is not None:
+            limiter.on_success()
+        return result, attempt
+
+
+def fetch_all(keys, fetch, max_concurrency=DEFAULT_MAX_CONCURRENCY, max_retries=DEFAULT_MAX_RETRIES,
+              trace_tags=None, sleep=time.sleep):
+    """
+    Resolve many pricing keys in parallel.
+
+    Args:
+        keys (iterable): Hashable pricing keys; duplicates are fetched once.
+        fetch (callable): Called with one key, returns its price data.
+        max_concurrency (int): Upper bound on requests in flight.
+        max_retries (int): Throttling retries per key.
+        trace_tags (callable): Returns the tracing tags of a key; each fetch
+            is then traced as a ``price_fetch`` span tagged with its retries.
+        sleep (callable): Waits out a backoff delay.
+
+    Returns:
+        dict: ``{'results': {key: value}, 'errors': {key: exception},
+        'retries': int, 'throttled': int, 'final_concurrency': int}``, where
+        ``retries`` counts the retries of every key, failed ones included.
+    """
+    unique_keys = list(dict.fromkeys(keys))
+    limiter = AdaptiveLimiter(max_concurrency)
+    outcome = {'results': {}, 'errors': {}, 'retries': 0}
+    lock = threading.Lock()
+
+    def run(key):
+        tags = trace_tags(key) if trace_tags is not None and tracing.enabled() else {}
+        attempts = 0
+
+        def call():
+            nonlocal attempts
+            attempts += 1
+            return fetch(key)
+
+        with tracing.span('price_fetch', 'pricing', **tags) as span:
+            try:
+                value, _ = call_with_backoff(call, limiter, max_retries, sleep)
+            except Exception as e:
+                span.tag(error=type(e).__name__, retries=attempts - 1)
+                with lock:
+                    outcome['errors'][key] = e
+                    outcome['retries'] += attempts - 1
+                return
+            span.tag(retries=attempts - 1)
+        with lock:
+            outcome['results'][key] = value
+            outcome['retries'] += attempts - 1
+
+    if unique_keys:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(unique_keys)))) as executor:
+            list(executor.map(run, unique_keys))
+
+    outcome['throttled'] = limiter.throttled
+    outcome['final_concurrency'] = limiter.limit
+    return outcome
@@ -0,0 +1,367 @@
+import hashlib
+import json
+import random
+import threading
+import time
+
+try:
+    from botocore.exceptions import ClientError
+except ImportError:  # The stub must work without the AWS SDK installed
+    class ClientError(Exception):
+        def __init__(self, error_response, operation_name):
+            super().__init__(f"An error occurred ({error_response['Error']['Code']}) "
+                             f"when calling the {operation_name} operation")
+            self.response = error_response
+            self.operation_name = operation_name
+
+
+def throttling_error():
+    return ClientError(
+        {'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'}}, 'GetProducts'
+    )
+
+
+# Price dimension descriptions per service, matching what the get_*_pricing parsers
+# look for, optionally with the beginRange of each volume tier
+SYNTHETIC_DIMENSIONS = {
+    'AmazonEC2': [('Linux/UNIX On Demand instance hour', 'Hrs')],
+    'AmazonRDS': [('RDS On Demand instance hour', 'Hrs')],
+    'AmazonS3': [('Storage per GB-month', 'GB-Mo', [0, 51200, 512000])],
+    'AWSLambda': [('AWS Lambda - Total Requests', 'Requests'), ('AWS Lambda - Total Compute', 'Lambda-GB-Second')],
+    'AmazonDynamoDB': [
+        ('ReadCapacityUnit-Hrs', 'ReadCapacityUnit-Hrs'),
+        ('WriteCapacityUnit-Hrs', 'WriteCapacityUnit-Hrs'),
+        ('DataTransfer-Out-Bytes', 'GB', [0, 10240, 51200]),
+    ],
+    'AmazonVPC': [('VPC endpoint hour', 'Hrs'), ('DataTransfer-Regional-Bytes', 'GB', [0, 10240, 51200])],
+    'AWSFargate': [('AWS Fargate - vCPU - Fargate hours', 'hours')],
+    'AmazonEKS': [('Amazon EKS cluster usage', 'Hrs')],
+}
+# Unit of the dimensions a product ``group`` holds, for services that publish
+# each price component as its own product
+SYNTHETIC_GROUP_UNITS = {
+    'AWS-Lambda-Requests': 'Requests',
+    'AWS-Lambda-Duration': 'Lambda-GB-Second',
+}
+
+
+# vCPUs of an instance size; "<n>xlarge" has 4 * n
+INSTANCE_SIZE_VCPUS = {'nano': 2, 'micro': 2, 'small': 2, 'medium': 2, 'large': 2, 'xlarge': 4}
+
+
+def _instance_attributes(instance_type):
+    size = instance_type.split('.')[-1]
+    if size in INSTANCE_SIZE_VCPUS:
+        vcpu = INSTANCE_SIZE_VCPUS[size]
+    elif size.endswith('xlarge') and size[:-6].isdigit():
+        vcpu = 4 * int(size[:-6])
+    else:
+        vcpu = 2
+    return {'vcpu': str(vcpu), 'memory': f'{vcpu * 4} GiB'}
+
+
+# Fraction of the On-Demand rate each synthetic Reserved offer costs over its term
+SYNTHETIC_RESERVED_DISCOUNTS = {
+    ('1yr', 'No Upfront'): 0.70,
+    ('1yr', 'Partial Upfront'): 0.66,
+    ('1yr', 'All Upfront'): 0.64,
+    ('3yr', 'No Upfront'): 0.50,
+    ('3yr', 'Partial Upfront'): 0.45,
+    ('3yr', 'All Upfront'): 0.42,
+}
+SYNTHETIC_LEASE_HOURS = {'1yr': 8760, '3yr': 26280}
+
+
+def _synthetic_reserved_terms(sku, on_demand_price, offering_classes):
+    terms = {}
+    for position, ((lease, purchase_option), discount) in enumerate(sorted(SYNTHETIC_RESERVED_DISCOUNTS.items())):
+        for class_position, offering_class in enumerate(offering_classes):
+            # Convertible offers trade some of the discount for flexibility
+            rate = on_demand_price * (discount + 0.08 * class_position)
+            upfront_share = {'No Upfront': 0.0, 'Partial Upfront': 0.5, 'All Upfront': 1.0}[purchase_option]
+            offer_term_code = f'RI{position:02d}{class_position}'
+            dimensions = {
+                f'{sku}.{offer_term_code}.HOURLY': {
+                    'description': f'{purchase_option} hourly fee',
+                    'unit': 'Hrs',
+                    'pricePerUnit': {'USD': f'{rate * (1 - upfront_share):.10f}'},
+                },
+                f'{sku}.{offer_term_code}.UPFRONT': {
+                    'description': 'Upfront Fee',
+                    'unit': 'Quantity',
+                    'pricePerUnit': {'USD': f'{rate * upfront_share * SYNTHETIC_LEASE_HOURS[lease]:.10f}'},
+                },
+            }
+            terms[f'{sku}.{offer_term_code}'] = {
+                'offerTermCode': offer_term_code,
+                'sku': sku,
+                'priceDimensions': {
+                    rate_code: {'rateCode': rate_code, 'beginRange': '0', 'endRange': 'Inf', **dimension}
+                    for rate_code, dimension in dimensions.items()
+                },
+                'termAttributes': {
+                    'LeaseContractLength': lease,
+                    'PurchaseOption': purchase_option,
+                    **({'OfferingClass': offering_class} if offering_class else {}),
+                },
+            }
+    return terms
+
+
+def synthetic_product(service_code, filters):
+    """
+    Build a deterministic product document for a get_products query.
+
+    Prices are derived from a hash of the query, so the same filters always
+    price the same and different instance types price differently.
+    """
+    attributes = {f['Field']: f['Value'] for f in filters}
+    if service_code == 'AmazonEC2' and 'instanceType' in attributes:
+        attributes.setdefault('productFamily', 'Compute Instance')
+        attributes.update(_instance_attributes(attributes['instanceType']))
+    digest = hashlib.sha1(json.dumps([service_code, sorted(attributes.items())]).encode()).hexdigest()
+    sku = digest[:16].upper()
+    price_dimensions = {}
+    group_unit = SYNTHETIC_GROUP_UNITS.get(attributes.get('group'))
+    for position, (description, unit, *tiers) in enumerate(SYNTHETIC_DIMENSIONS.get(service_code, [('Usage', 'Hrs')])):
+        if group_unit is not None and unit != group_unit:
+            continue
+        price = (int(digest[16 + position * 4:24 + position * 4], 16) % 100000) / 100000 + 0.001
+        begins = tiers[0] if tiers else [0]
+        for tier, begin in enumerate(begins):
+            # Each volume tier is 10% cheaper than the one before
+            rate_code = f'{sku}.JRTCKXETXF.{position * 10 + tier:010d}'
+            price_dimensions[rate_code] = {
+                'rateCode': rate_code,
+                'description': description,
+                'unit': unit,
+                'beginRange': str(begin),
+                'endRange': str(begins[tier + 1]) if tier + 1 < len(begins) else 'Inf',
+                'pricePerUnit': {'USD': f'{price * (1 - 0.1 * tier):.10f}'},
+            }
+    terms = {
+        'OnDemand': {
+            f'{sku}.JRTCKXETXF': {
+                'offerTermCode': 'JRTCKXETXF',
+                'sku': sku,
+                'priceDimensions': price_dimensions,
+            }
+        }
+    }
+    if service_code == 'AmazonEC2' and 'instanceType' in attributes:
+        terms['Reserved'] = _synthetic_reserved_terms(sku, price, ['standard', 'convertible'])
+    elif service_code == 'AmazonRDS' and 'dbInstanceClass' in attributes:
+        terms['Reserved'] = _synthetic_reserved_terms(sku, price, [''])
+    return {
+        'serviceCode': service_code,
+        'product': {'sku': sku, 'productFamily': attributes.get('productFamily', ''), 'attributes': attributes},
+        'terms': terms,
+    }
+
+
+def recording_key(service_code, filters):
+    return json.dumps([service_code, [[f['Type'], f['Field'], f['Value']] for f in filters]])
+
+
+class StubPricingClient:
+    """
+    Local stand-in for the boto3 ``pricing`` client.
+
+    Answers get_products with synthetic products after a configurable latency
+    and raises throttling errors at a configurable rate, so the concurrent fetch
+    path can be exercised without network access or credentials.
+    """
+
+    def __init__(self, latency_seconds=0.05, throttle_rate=0.0, seed=None, product_factory=synthetic_product):
+        self.latency_seconds = latency_seconds
+        self.throttle_rate = throttle_rate
+        self.product_factory = product_factory
+        self.calls = 0
+        self.throttled = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def get_products(self, ServiceCode, Filters=(), MaxResults=100, **kwargs):
+        with self._lock:
+            self.calls += 1
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+            throttle = self._random.random() < self.throttle_rate
+        try:
+            time.sleep(self.latency_seconds)
+            if throttle:
+                with self._lock:
+                    self.throttled += 1
+                raise throttling_error()
+            product = self.product_factory(ServiceCode, list(Filters))
+            price_list = [json.dumps(product)] if product is not None else []
+            return {'PriceList': price_list[:MaxResults], 'FormatVersion': 'aws_v1'}
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+
+class RecordingPricingClient:
+    """
+    Wraps a real ``pricing`` client and records every get_products response.
+
+    Call ``save()`` to write the recording for ``ReplayPricingClient``.
+    """
+
+    def __init__(self, client, path):
+        self.client = client
+        self.path = path
+        self.responses = {}
+        self._lock = threading.Lock()
+
+    def get_products(self, ServiceCode, Filters=(), **kwargs):
+        response = self.client.get_products(ServiceCode=ServiceCode, Filters=Filters, **kwargs)
+        with self._lock:
+            self.responses[recording_key(ServiceCode, Filters)] = response['PriceList']
+        return response
+
+    def save(self):
+        with open(self.path, 'w') as file:
+            json.dump(self.responses, file)
+
+
+class ReplayPricingClient(StubPricingClient):
+    """
+    Replays get_products responses recorded by ``RecordingPricingClient``.
+
+    Queries missing from the recording are answered with synthetic products,
+    so a small recording still drives a large generated configuration.
+    """
+
+    def __init__(self, path, latency_seconds=0.05, throttle_rate=0.0, seed=None):
+        with open(path, 'r') as file:
+            self.recording = json.load(file)
+        super().__init__(latency_seconds, throttle_rate, seed, self._replay)
+        self.replayed = 0
+
+    def _replay(self, service_code, filters):
+        price_list = self.recording.get(recording_key(service_code, filters))
+        if price_list is None:
+            return synthetic_product(service_code, filters)
+        with self._lock:
+            self.replayed += 1
+        return json.loads(price_list[0]) if price_list else None
+
+
+# Instance types and regions of the synthetic price list served by PaginatingPricingClient
+SYNTHETIC_INSTANCE_TYPES = [
+    f'{family}.{size}'
+    for family in ('t3', 'm5', 'c5', 'r5')
+    for size in ('micro', 'medium', 'large', 'xlarge', '2xlarge', '4xlarge')
+]
+SYNTHETIC_REGIONS = ['us-east-1', 'us-west-2', 'eu-west-1', 'ap-southeast-1']
+
+
+def synthetic_price_list(service_code, regions=SYNTHETIC_REGIONS, products_per_region=50):
+    """
+    Build the full synthetic price list of a service, as ``get_products`` pages would return it.
+
+    EC2 and RDS get one product per instance type and region; other services get
+    ``products_per_region`` usage types per region.
+
+    Returns:
+        list: Decoded product documents, in a stable order.
+    """
+    products = []
+    for region in regions:
+        if service_code in ('AmazonEC2', 'AmazonRDS'):
+            field = 'instanceType' if service_code == 'AmazonEC2' else 'dbInstanceClass'
+            prefix = '' if service_code == 'AmazonEC2' else 'db.'
+            attribute_sets = [{field: prefix + instance_type} for instance_type in SYNTHETIC_INSTANCE_TYPES]
+        else:
+            attribute_sets = [{'usagetype': f'{region}-Usage{index:04d}'} for index in range(products_per_region)]
+        for attributes in attribute_sets:
+            filters = [{'Type': 'TERM_MATCH', 'Field': field, 'Value': value}
+                       for field, value in [('regionCode', region)] + sorted(attributes.items())]
+            products.append(synthetic_product(service_code, filters))
+    return products
+
+
+class PaginatingPricingClient:
+    """
+    Offline stand-in for get_products paging, for exercising pricing_crawler.
+
+    Serves a fixed price list per service (``synthetic_price_list`` by
+    default) in ``MaxResults`` pages linked by opaque ``NextToken``s,
+    applying TERM_MATCH filters like the API does. Throttling and transient
+    ``InternalErrorException`` failures are injected at configurable rates;
+    ``outage_after`` makes every call after that many fail, to interrupt a
+    crawl, and ``expire_tokens`` rejects tokens issued before it was set, like
+    a checkpoint resumed too late.
+    """
+
+    def __init__(self, price_lists=None, latency_seconds=0.0, throttle_rate=0.0, failure_rate=0.0,
+                 outage_after=None, seed=None):
+        self.price_lists = price_lists if price_lists is not None else {}
+        self.latency_seconds = latency_seconds
+        self.throttle_rate = throttle_rate
+        self.failure_rate = failure_rate
+        self.outage_after = outage_after
+        self.token_generation = 0
+        self.calls = 0
+        self.pages = 0
+        self.throttled = 0
+        self.failures = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def expire_tokens(self):
+        with self._lock:
+            self.token_generation += 1
+
+    def _price_list(self, service_code):
+        if service_code not in self.price_lists:
+            self.price_lists[service_code] = synthetic_price_list(service_code)
+        return self.price_lists[service_code]
+
+    def get_products(self, ServiceCode, Filters=(), MaxResults=100, NextToken=None, **kwargs):
+        with self._lock:
+            self.calls += 1
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+            outage = self.outage_after is not None and self.calls > self.outage_after
+            throttle = self._random.random() < self.throttle_rate
+            failure = outage or self._random.random() < self.failure_rate
+            generation = self.token_generation
+            price_list = self._price_list(ServiceCode)
+        try:
+            time.sleep(self.latency_seconds)
+            if throttle:
+                with self._lock:
+                    self.throttled += 1
+                raise throttling_error()
+            if failure:
+                with self._lock:
+                    self.failures += 1
+                raise ClientError({'Error': {'Code': 'InternalErrorException',
+                                             'Message': 'An internal error occurred'}}, 'GetProducts')
+            offset = 0
+            if NextToken is not None:
+                token_generation, _, offset = NextToken.partition(':')
+                if int(token_generation) != generation:
+                    raise ClientError({'Error': {'Code': 'ExpiredNextTokenException',
+                                                 'Message': 'The pagination token expired'}}, 'GetProducts')
+                offset = int(offset)
+            matching = [
+                product for product in price_list
+                if all(product['product']['attributes'].get(f['Field']) == f['Value'] for f in Filters)
+            ]
+            page = matching[offset:offset + MaxResults]
+            response = {'PriceList': [json.dumps(product) for product in page], 'FormatVersion': 'aws_v1'}
+            if offset + MaxResults < len(matching):
+                response['NextToken'] = f'{generation}:{offset + MaxResults}'
+            with self._lock:
+                self.pages += 1
+            return response
+        finally:
+            with self._lock:
+                self._in_flight -= 1
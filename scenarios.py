@@ -0,0 +1,332 @@
+import argparse
+import json
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import aws_estimator
+import cost_formulas
+import pricing_fetch
+import tiered_pricing
+
+try:
+    import numpy as np
+except ImportError:  # Only needed to run scenarios
+    np = None
+
+DEFAULT_SAMPLES = 10000
+PERCENTILES = (10, 50, 90)
+# Upper bound on resources x samples drawn in one batch, which bounds the
+# memory of each worker (a few float64 arrays of this size)
+BATCH_ELEMENTS = 1 << 21
+
+# Parameters of each distribution a usage driver can be given
+DISTRIBUTIONS = {
+    'uniform': ('low', 'high'),
+    'normal': ('mean', 'sd'),
+    'lognormal': ('median', 'sigma'),
+    'triangular': ('low', 'mode', 'high'),
+    'choice': ('values',),
+}
+
+
+def parse_distribution(value):
+    """
+    Parse the value of a usage driver in a scenario usage file.
+
+    A number is a fixed value. A ``[low, high]`` list is a uniform range, and a
+    mapping names one of ``DISTRIBUTIONS`` with its parameters::
+
+        requests_per_day: [1000, 50000]
+        execution_time_seconds: {distribution: lognormal, median: 0.2, sigma: 0.5}
+        data_transfer_gb: {distribution: triangular, low: 1, mode: 5, high: 40}
+        quantity: {distribution: choice, values: [2, 3, 4], weights: [1, 2, 1]}
+
+    Returns:
+        tuple: ``(name, params...)``, hashable so resources with the same
+        distribution share a batch, or None for a fixed value.
+    """
+    if isinstance(value, (list, tuple)):
+        if len(value) != 2:
+            raise ValueError(f'a range must be [low, high], got {value!r}')
+        value = {'distribution': 'uniform', 'low': value[0], 'high': value[1]}
+    if not isinstance(value, dict):
+        return None
+    name = value.get('distribution', 'uniform')
+    if name not in DISTRIBUTIONS:
+        raise ValueError(f"unknown distribution {name!r}; expected one of {', '.join(DISTRIBUTIONS)}")
+    missing = [param for param in DISTRIBUTIONS[name] if param not in value]
+    if missing:
+        raise ValueError(f"{name} distribution needs {', '.join(missing)}")
+    if name == 'choice':
+        values = tuple(float(choice) for choice in value['values'])
+        weights = value.get('weights')
+        if weights is not None:
+            total = float(sum(weights))
+            weights = tuple(float(weight) / total for weight in weights)
+        return name, values, weights
+    return (name,) + tuple(float(value[param]) for param in DISTRIBUTIONS[name])
+
+
+def draw(spec, rng, shape):
+    """Draw samples of a parsed distribution (see ``parse_distribution``) as an array of ``shape``."""
+    name, *params = spec
+    if name == 'uniform':
+        return rng.uniform(params[0], params[1], shape)
+    if name == 'normal':
+        # Usage cannot be negative, so the left tail is clipped at zero
+        return np.maximum(rng.normal(params[0], params[1], shape), 0.0)
+    if name == 'lognormal':
+        return rng.lognormal(math.log(params[0]), params[1], shape)
+    if name == 'triangular':
+        return rng.triangular(params[0], params[1], params[2], shape)
+    values, weights = params
+    return rng.choice(np.asarray(values), shape, p=weights)
+
+
+def _driver_names(service):
+    return [name for name, _ in cost_formulas.SERVICE_FORMULAS[service].drivers] + ['quantity']
+
+
+def _driver_casts(service):
+    # quantity is a resource count, cast like the integer drivers
+    return [cast for _, cast in cost_formulas.SERVICE_FORMULAS[service].drivers] + [int]
+
+
+def _evaluate_batch(batch):
+    """
+    Cost one batch of resources sharing a service, prices and distributions.
+
+    Fixed drivers are ``(resources, 1)`` columns and sampled ones
+    ``(resources, samples)`` matrices, so the service formula runs once over the
+    whole batch and broadcasts.
+
+    Returns:
+        tuple: ``(service, costs, free_tier_usage)``: the batch's monthly cost
+        summed over its resources for each sample (a single value when nothing
+        is sampled) and, for resources counted against the free tier,
+        ``{component: (rate, quantities, resources)}``, one row per resource.
+    """
+    service, components, specs, fixed, samples, seed, free_tier = batch
+    formula = cost_formulas.SERVICE_FORMULAS[service]
+    rng = np.random.default_rng(seed)
+    fixed = np.asarray(fixed, dtype=np.float64)
+    columns = []
+    for position, (spec, cast) in enumerate(zip(specs, _driver_casts(service))):
+        if spec is None:
+            column = fixed[:, position:position + 1]
+        else:
+            column = draw(spec, rng, (len(fixed), samples))
+        columns.append(np.trunc(column) if cast is int else column)
+    *drivers, quantity = columns
+    monthly = formula.function(*drivers, *[components[name] for name in formula.prices]) * quantity
+    free_tier_usage = None
+    if free_tier:
+        allowances = tiered_pricing.FREE_TIER_ALLOWANCES[service]
+        # Kept per resource, as the credit is taken off each one's tiered cost
+        free_tier_usage = {
+            name: (components[name], *np.broadcast_arrays(component_quantity, quantity))
+            for name, component_quantity in cost_formulas.component_quantities(service, drivers, allowances).items()
+            if name in components
+        }
+    return service, monthly.sum(axis=0), free_tier_usage
+
+
+def build_batches(resources, usage=None, samples=DEFAULT_SAMPLES, seed=0,
+                  max_concurrency=pricing_fetch.DEFAULT_MAX_CONCURRENCY):
+    """
+    Group resources into batches that share a service, prices and driver distributions.
+
+    Prices are resolved once per group, through the same price cache and
+    catalog as ``estimate_resources``.
+
+    Args:
+        resources (iterable): As accepted by ``aws_estimator.estimate_resources``.
+        usage (dict): A usage file whose driver values may be distributions.
+        samples (int): Samples drawn per resource.
+        seed (int): Seed of the random draws; each batch derives its own from it.
+        max_concurrency (int): Upper bound on Pricing API requests in flight.
+
+    Returns:
+        tuple: ``(batches, counts, errors, skipped)``: the batches for
+        ``_evaluate_batch``, resources per service, ``{address, error}`` dicts
+        and addresses of unsupported resource types.
+    """
+    groups = {}
+    counts = {}
+    errors = []
+    skipped = []
+    for address, resource_type, attributes, *_ in resources:
+        service = aws_estimator.RESOURCE_SERVICES.get(resource_type)
+        if service is None:
+            skipped.append(address)
+            continue
+        resource_usage = aws_estimator.resource_usage(address, resource_type, attributes, usage)
+        names = _driver_names(service)
+        specs = []
+        fixed = []
+        for name in names:
+            value = resource_usage.get(name, aws_estimator.DEFAULT_USAGE.get(name, 1))
+            try:
+                spec = parse_distribution(value)
+            except ValueError as e:
+                raise ValueError(f'{address}: {name}: {e}') from None
+            specs.append(spec)
+            fixed.append(0.0 if spec is not None else float(value))
+        for name, value in resource_usage.items():
+            if name not in names and isinstance(value, (dict, list)):
+                raise ValueError(f'{address}: {name} cannot be sampled; only usage drivers of {service} can')
+        free_tier = bool(resource_usage.get('free_tier')) and service in tiered_pricing.FREE_TIER_ALLOWANCES
+        key = (service, aws_estimator.service_price_key(service, resource_usage), tuple(specs), free_tier)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = (resource_usage, [], [])
+        group[1].append(address)
+        group[2].append(fixed)
+
+    aws_estimator.prefetch_prices(
+        list(dict.fromkeys(pricing_key for (service, *_), (resource_usage, _, _) in groups.items()
+                           for pricing_key in aws_estimator.service_pricing_keys(service, resource_usage))),
+        max_concurrency,
+    )
+
+    batches = []
+    batch_rows = max(1, BATCH_ELEMENTS // samples)
+    for (service, _, specs, free_tier), (resource_usage, addresses, fixed) in groups.items():
+        try:
+            components = aws_estimator.service_price_components(service, resource_usage)
+            error = None if components is not None else 'no price found'
+        except Exception as e:
+            error = str(e)
+        if error is not None:
+            errors.extend({'address': address, 'error': error} for address in addresses)
+            continue
+        counts[service] = counts.get(service, 0) + len(addresses)
+        for start in range(0, len(fixed), batch_rows):
+            # Seeding by batch position keeps results independent of the worker count
+            batches.append((service, components, specs, fixed[start:start + batch_rows], samples,
+                            (seed, len(batches)), free_tier))
+    return batches, counts, errors, skipped
+
+
+def summarize(costs):
+    """Return the mean and ``PERCENTILES`` of an array of sampled monthly costs."""
+    percentiles = np.percentile(costs, PERCENTILES)
+    return {'mean': float(np.mean(costs)),
+            **{f'p{percent}': float(value) for percent, value in zip(PERCENTILES, percentiles)}}
+
+
+def simulate(resources, usage=None, samples=DEFAULT_SAMPLES, workers=None, seed=0,
+             max_concurrency=pricing_fetch.DEFAULT_MAX_CONCURRENCY):
+    """
+    Run a Monte Carlo estimate of ``resources`` under uncertain usage.
+
+    Every resource draws its own ``samples`` values of each driver that has a
+    distribution; sample ``i`` of the total is the sum of sample ``i`` of every
+    resource. Batches are evaluated across a process pool.
+
+    Args:
+        resources (iterable): As accepted by ``aws_estimator.estimate_resources``.
+        usage (dict): A usage file whose driver values may be distributions
+            (see ``parse_distribution``).
+        samples (int): Samples per resource.
+        workers (int): Processes, defaults to the CPU count; 1 runs in process.
+        seed (int): Seed of the random draws, for reproducible results.
+        max_concurrency (int): Upper bound on Pricing API requests in flight.
+
+    Returns:
+        dict: ``services`` (per service: ``resources``, ``mean``, ``p10``,
+        ``p50``, ``p90``), ``total``, ``samples``, ``errors`` and ``skipped``.
+    """
+    if np is None:
+        raise RuntimeError("Scenarios require the 'numpy' package (pip install numpy)")
+    batches, counts, errors, skipped = build_batches(resources, usage, samples, seed, max_concurrency)
+
+    workers = workers or os.cpu_count() or 1
+    totals = {service: np.zeros(samples) for service in counts}
+    free_tier_usages = {}
+
+    def add(service, costs, free_tier_usage):
+        totals[service] += costs
+        for name, (rate, quantities, resources) in (free_tier_usage or {}).items():
+            free_tier_usages.setdefault((service, name), []).extend(
+                (rate, row_quantity, row_resources) for row_quantity, row_resources in zip(quantities, resources))
+
+    if workers == 1 or len(batches) < 2:
+        for result in map(_evaluate_batch, batches):
+            add(*result)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(batches))) as executor:
+            for result in executor.map(_evaluate_batch, batches):
+                add(*result)
+    # One allowance per account, shared by the service's resources in batch order
+    for (service, name), entries in free_tier_usages.items():
+        totals[service] -= tiered_pricing.free_tier_credit(tiered_pricing.FREE_TIER_ALLOWANCES[service][name], entries)
+
+    total = sum(totals.values(), np.zeros(samples))
+    return {
+        'samples': samples,
+        'services': {service: {'resources': counts[service], **summarize(costs)}
+                     for service, costs in sorted(totals.items())},
+        'total': summarize(total),
+        'errors': errors,
+        'skipped': skipped,
+    }
+
+
+def run_scenarios(path, usage=None, tfvars=None, samples=DEFAULT_SAMPLES, workers=None, seed=0,
+                  max_concurrency=pricing_fetch.DEFAULT_MAX_CONCURRENCY):
+    """
+    Run ``simulate`` over a ``.tf`` file, a workspace directory or a plan JSON file.
+
+    Returns:
+        dict: The result of ``simulate`` plus ``parse_errors``.
+    """
+    resources, parse_errors, _ = aws_estimator.load_resources(path, usage, tfvars)
+    result = simulate(resources, usage, samples, workers, seed, max_concurrency)
+    result['parse_errors'] = parse_errors
+    return result
+
+
+def _print_scenarios(result):
+    print(f"{'service':<12} {'resources':>9} {'p10':>14} {'p50':>14} {'p90':>14}")
+    rows = list(result['services'].items()) + [('total', {'resources': sum(
+        service['resources'] for service in result['services'].values()), **result['total']})]
+    for name, stats in rows:
+        costs = ' '.join(f"{f'${stats[percent]:,.2f}':>14}" for percent in ('p10', 'p50', 'p90'))
+        print(f"{name:<12} {stats['resources']:>9} {costs}")
+    for error in result['parse_errors'] + result['errors']:
+        print(f"{error.get('address', error.get('file')):<60} error: {error['error']}")
+    if result['skipped']:
+        print(f"Skipped {len(result['skipped'])} unsupported resources")
+    print(f"Monthly cost over {result['samples']} samples: p10 ${result['total']['p10']:.2f}, "
+          f"p50 ${result['total']['p50']:.2f}, p90 ${result['total']['p90']:.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Estimate the monthly cost range of Terraform configuration '
+                                                 'under uncertain usage (Monte Carlo).')
+    parser.add_argument('path', help='Terraform file, workspace directory or `terraform show -json` output')
+    parser.add_argument('--usage', help='YAML or JSON usage file; driver values may be ranges or distributions')
+    parser.add_argument('--tfvars', help='.tfvars or .tfvars.json file for the root module')
+    parser.add_argument('--samples', type=int, default=DEFAULT_SAMPLES, help='Samples per resource')
+    parser.add_argument('--workers', type=int, help='Processes evaluating samples (default: CPU count)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random draws')
+    parser.add_argument('--concurrency', type=int, default=pricing_fetch.DEFAULT_MAX_CONCURRENCY,
+                        help='Maximum Pricing API requests in flight')
+    parser.add_argument('--json', action='store_true', help='Print the full result as JSON')
+    args = parser.parse_args(argv)
+
+    usage = aws_estimator.load_usage_file(args.usage) if args.usage else None
+    tfvars = aws_estimator.load_tfvars(args.tfvars) if args.tfvars else None
+    result = run_scenarios(args.path, usage, tfvars, args.samples, args.workers, args.seed, args.concurrency)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        _print_scenarios(result)
+    return 1 if result['errors'] or result['parse_errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
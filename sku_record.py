@@ -0,0 +1,194 @@
+import json
+import sys
+
+# Prices are held as integer multiples of 1e-10 USD, the precision the Pricing API publishes
+PRICE_SCALE = 10 ** 10
+PRICE_DIGITS = 10
+
+# Product attributes a record keeps: everything the catalog indexes and the
+# get_*_pricing functions read. The dozens of other attributes are dropped.
+RECORD_ATTRIBUTES = (
+    'regionCode',
+    'instanceType',
+    'dbInstanceClass',
+    'operatingSystem',
+    'tenancy',
+    'databaseEngine',
+    'licenseModel',
+    'storageClass',
+    'preInstalledSw',
+    'capacitystatus',
+    'vcpu',
+    'memory',
+    'group',
+)
+_ATTRIBUTE_POSITIONS = {name: position for position, name in enumerate(RECORD_ATTRIBUTES)}
+
+TERM_TYPES = ('OnDemand', 'Reserved')
+ON_DEMAND = ('OnDemand',)
+
+_EMPTY = ''
+
+
+def _intern(value):
+    # Attribute values, units and descriptions repeat across thousands of SKUs
+    return sys.intern(str(value)) if value else _EMPTY
+
+
+def to_fixed(price):
+    """
+    Convert a price ("0.0960000000", a float or a Decimal) to fixed point.
+
+    Decimal strings of up to ``PRICE_DIGITS`` places convert exactly.
+
+    Returns:
+        int: The price in units of ``1 / PRICE_SCALE`` USD.
+    """
+    if isinstance(price, float):
+        return round(price * PRICE_SCALE)
+    text = str(price).strip()
+    whole, _, fraction = text.partition('.')
+    if len(fraction) > PRICE_DIGITS or not (whole.lstrip('-') + fraction).isdigit():
+        return round(float(text) * PRICE_SCALE)
+    magnitude = int(whole.lstrip('-') or '0') * PRICE_SCALE + int(fraction.ljust(PRICE_DIGITS, '0'))
+    return -magnitude if whole.startswith('-') else magnitude
+
+
+def from_fixed(value):
+    """Convert a fixed-point price back to USD, as the same float ``float("<decimal>")`` gives."""
+    return value / PRICE_SCALE
+
+
+class PriceDimension:
+    """One price dimension of an offer term: a rate over a usage range."""
+
+    __slots__ = ('rate_code', 'description', 'unit', 'begin_range', 'end_range', 'price')
+
+    def __init__(self, rate_code, description, unit, begin_range, end_range, price):
+        self.rate_code = rate_code
+        self.description = description
+        self.unit = unit
+        self.begin_range = begin_range
+        self.end_range = end_range  # None for the open-ended last tier
+        self.price = price  # Fixed point, see PRICE_SCALE
+
+    @property
+    def price_usd(self):
+        return from_fixed(self.price)
+
+    def __repr__(self):
+        return f'PriceDimension({self.rate_code!r}, {self.unit!r}, {self.price_usd!r})'
+
+
+class OfferTerm:
+    """An On-Demand or Reserved offer of a SKU, with its price dimensions."""
+
+    __slots__ = ('term_type', 'offer_term_code', 'lease_contract_length', 'purchase_option', 'offering_class',
+                 'dimensions')
+
+    def __init__(self, term_type, offer_term_code, lease_contract_length, purchase_option, offering_class,
+                 dimensions):
+        self.term_type = term_type
+        self.offer_term_code = offer_term_code
+        self.lease_contract_length = lease_contract_length
+        self.purchase_option = purchase_option
+        self.offering_class = offering_class
+        self.dimensions = dimensions
+
+
+class SkuRecord:
+    """
+    Compact form of one Pricing API product.
+
+    Holds the SKU, its ``RECORD_ATTRIBUTES`` as a tuple of interned strings
+    and its offer terms, with prices as fixed-point integers, in a few hundred
+    bytes instead of the tens of kilobytes of the decoded document.
+    """
+
+    __slots__ = ('sku', 'service', 'product_family', 'attributes', 'terms')
+
+    def __init__(self, sku, service, product_family, attributes, terms):
+        self.sku = sku
+        self.service = service
+        self.product_family = product_family
+        self.attributes = attributes  # Values in RECORD_ATTRIBUTES order, '' when absent
+        self.terms = terms
+
+    def attribute(self, name):
+        position = _ATTRIBUTE_POSITIONS.get(name)
+        return self.attributes[position] if position is not None else _EMPTY
+
+    @property
+    def on_demand(self):
+        """Every On-Demand price dimension, in document order."""
+        return [dimension for term in self.terms if term.term_type == 'OnDemand' for dimension in term.dimensions]
+
+    def __repr__(self):
+        return f'SkuRecord({self.sku!r}, {self.service!r}, {len(self.terms)} terms)'
+
+
+def _parse_range(value):
+    if value is None or value == 'Inf':
+        return None
+    return float(value)
+
+
+def from_product(product_data, service=None, term_types=TERM_TYPES):
+    """
+    Build a record from a decoded ``PriceList`` entry (or bulk offer file product).
+
+    Args:
+        product_data (dict): The decoded product document.
+        service (str): The service code, used when the document does not carry one.
+        term_types (tuple): Term types to keep; lookups only need ``ON_DEMAND``.
+
+    Returns:
+        SkuRecord: The record.
+    """
+    product = product_data.get('product', {})
+    attributes = product.get('attributes', {})
+    terms = []
+    for term_type, offers in product_data.get('terms', {}).items():
+        if term_type not in term_types:
+            continue
+        term_type = _intern(term_type)
+        for offer_term_code, offer in offers.items():
+            term_attributes = offer.get('termAttributes', {})
+            dimensions = []
+            for rate_code, dimension in offer.get('priceDimensions', {}).items():
+                price = dimension.get('pricePerUnit', {}).get('USD')
+                if price is None:
+                    continue
+                dimensions.append(PriceDimension(
+                    rate_code,
+                    _intern(dimension.get('description', '')),
+                    _intern(dimension.get('unit', '')),
+                    float(dimension.get('beginRange', 0)),
+                    _parse_range(dimension.get('endRange', 'Inf')),
+                    to_fixed(price),
+                ))
+            terms.append(OfferTerm(
+                term_type,
+                _intern(offer.get('offerTermCode', offer_term_code)),
+                _intern(term_attributes.get('LeaseContractLength')),
+                _intern(term_attributes.get('PurchaseOption')),
+                _intern(term_attributes.get('OfferingClass')),
+                tuple(dimensions),
+            ))
+    return SkuRecord(
+        product.get('sku', ''),
+        _intern(service or product_data.get('serviceCode') or attributes.get('servicecode', '')),
+        _intern(product.get('productFamily', '')),
+        tuple(_intern(attributes.get(name)) for name in RECORD_ATTRIBUTES),
+        tuple(terms),
+    )
+
+
+def from_json(entry, service=None, term_types=TERM_TYPES):
+    """
+    Build a record from one ``PriceList`` JSON string.
+
+    The decoded document is only alive while the record is built, so a page of
+    results never stays in memory in its dict form.
+    """
+    return from_product(json.loads(entry), service, term_types)
@@ -0,0 +1,202 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+import tracing
+
+DEFAULT_PARSE_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'aws_estimator', 'parsed_hcl')
+
+# Directories that never hold configuration of the workspace being estimated
+SKIPPED_DIRECTORIES = {'.terraform', '.git'}
+
+
+def find_terraform_files(root):
+    """
+    Find every ``.tf`` file under ``root``, in a stable order.
+
+    Returns:
+        list: File paths, sorted.
+    """
+    if os.path.isfile(root):
+        return [root]
+    paths = []
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories[:] = sorted(name for name in subdirectories if name not in SKIPPED_DIRECTORIES)
+        paths.extend(os.path.join(directory, name) for name in sorted(files) if name.endswith('.tf'))
+    return paths
+
+
+def module_name(path, root):
+    """Return the module a file belongs to: its directory relative to ``root`` ('.' for the root)."""
+    if os.path.isfile(root):
+        return '.'
+    return os.path.relpath(os.path.dirname(path), root)
+
+
+def _parse_source(source):
+    """Parse HCL source, returning the exception instead of raising it."""
+    import hcl2
+
+    try:
+        return hcl2.loads(source)
+    except Exception as e:
+        # Parser exceptions do not always survive pickling back from a worker
+        return ValueError(f'{type(e).__name__}: {e}')
+
+
+def _parse_source_timed(source):
+    """``_parse_source`` that also reports when and where it ran, for tracing."""
+    started = time.perf_counter_ns()
+    config = _parse_source(source)
+    return config, started, time.perf_counter_ns() - started, os.getpid()
+
+
+class ParseCache:
+    """
+    On-disk cache of parsed HCL keyed by the SHA-256 of the file content.
+
+    Unchanged files are never re-parsed, wherever they live and whatever their
+    modification time.
+    """
+
+    def __init__(self, directory=DEFAULT_PARSE_CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, digest):
+        return os.path.join(self.directory, digest[:2], digest + '.pickle')
+
+    def get(self, digest):
+        try:
+            with open(self._path(digest), 'rb') as file:
+                return pickle.load(file)
+        except (OSError, pickle.PickleError, EOFError):
+            return None
+
+    def put(self, digest, config):
+        path = self._path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Unique per thread too: server threads may store the same file at once
+        temporary_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temporary_path, 'wb') as file:
+            pickle.dump(config, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, path)
+
+
+class MemoryParseCache:
+    """
+    In-memory LRU of parsed HCL in front of another cache (usually a ``ParseCache``).
+
+    Meant for long-lived processes such as the estimator server, where the
+    same workspaces are estimated over and over and even unpickling from disk
+    is avoidable work.
+    """
+
+    def __init__(self, backing=None, max_entries=4096):
+        self.backing = backing
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest):
+        with self._lock:
+            config = self._entries.get(digest)
+            if config is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return config
+            self.misses += 1
+        config = self.backing.get(digest) if self.backing is not None else None
+        if config is not None:
+            self._remember(digest, config)
+        return config
+
+    def put(self, digest, config):
+        self._remember(digest, config)
+        if self.backing is not None:
+            self.backing.put(digest, config)
+
+    def _remember(self, digest, config):
+        with self._lock:
+            self._entries[digest] = config
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+def parse_files(paths, workers=None, cache=None):
+    """
+    Parse Terraform files across a process pool, skipping cached ones.
+
+    Args:
+        paths (list): ``.tf`` file paths.
+        workers (int): Worker processes, defaults to the CPU count. With 1 the
+            files are parsed in this process.
+        cache (ParseCache): Parse cache, or None to always parse.
+
+    Returns:
+        tuple: ``(configs, stats)``: ``{path: parsed config}`` (or an exception
+        for files that failed to parse) and ``{'parsed': n, 'cached': n}``.
+    """
+    with tracing.span('parse_files', 'parse', files=len(paths)) as span:
+        configs, stats = _parse_files(paths, workers, cache)
+        span.tag(**stats)
+    return configs, stats
+
+
+def _parse_files(paths, workers, cache):
+    configs = {}
+    pending = {}
+    for path in paths:
+        with open(path, 'r') as file:
+            source = file.read()
+        digest = hashlib.sha256(source.encode()).hexdigest()
+        config = cache.get(digest) if cache is not None else None
+        if config is not None:
+            configs[path] = config
+        else:
+            pending[path] = (digest, source)
+
+    stats = {'parsed': len(pending), 'cached': len(configs)}
+    if not pending:
+        return configs, stats
+
+    workers = workers or os.cpu_count() or 1
+    sources = [source for _, source in pending.values()]
+    tracer = tracing.get_tracer()
+    parse = _parse_source if tracer is None else _parse_source_timed
+    if workers == 1 or len(pending) == 1:
+        results = [parse(source) for source in sources]
+    else:
+        # Imported here: multiprocessing is slow to import and a cached run never needs it
+        from concurrent.futures import ProcessPoolExecutor
+
+        workers = min(workers, len(pending))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(parse, sources, chunksize=max(1, len(sources) // (workers * 4))))
+    if tracer is not None:
+        # Worker spans are recorded here, on a track per worker process
+        for path, (config, started, duration, pid) in zip(pending, results):
+            tracer.add('parse_file', 'parse', started, duration, {'file': path}, pid=pid, tid=pid)
+        results = [result[0] for result in results]
+
+    for (path, (digest, _)), config in zip(pending.items(), results):
+        configs[path] = config
+        if cache is not None and not isinstance(config, Exception):
+            cache.put(digest, config)
+    return configs, stats
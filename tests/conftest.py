@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aws_estimator
+import terraform_parse
+from price_resolver import PriceResolver
+from pricing_stub import StubPricingClient
+
+
+@pytest.fixture
+def estimator(tmp_path, monkeypatch):
+    """``aws_estimator`` priced by the stub, with no catalog and empty caches."""
+    monkeypatch.setenv('HOME', str(tmp_path))
+    monkeypatch.setenv('AWS_ESTIMATOR_CATALOG', str(tmp_path / 'no-catalog.sqlite3'))
+    monkeypatch.setattr(aws_estimator, 'pricing_client', StubPricingClient(latency_seconds=0))
+    monkeypatch.setattr(aws_estimator, 'price_resolver', PriceResolver())
+    monkeypatch.setattr(aws_estimator, '_parse_cache', terraform_parse.MemoryParseCache())
+    monkeypatch.setattr(aws_estimator, '_catalog', None)
+    monkeypatch.setattr(aws_estimator, '_catalog_checked', False)
+    monkeypatch.setattr(aws_estimator, '_ec2_index', None)
+    monkeypatch.setattr(aws_estimator, '_ec2_index_checked', False)
+    return aws_estimator
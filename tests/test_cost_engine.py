@@ -0,0 +1,81 @@
+import pytest
+
+import cost_formulas
+
+# One or more resources of every service, with volumes that cross price tiers
+RESOURCES = [
+    ('aws_instance.web', 'aws_instance', {'instance_type': 'm5.large', 'region': 'us-east-1', 'count': 3}),
+    ('aws_instance.batch', 'aws_instance', {'instance_type': 'c5.xlarge', 'region': 'eu-west-1'}),
+    ('aws_db_instance.main', 'aws_db_instance', {'instance_class': 'db.m5.large', 'engine': 'postgres'}),
+    ('aws_s3_bucket.small', 'aws_s3_bucket', {}),
+    ('aws_s3_bucket.archive', 'aws_s3_bucket', {}),
+    ('aws_lambda_function.api', 'aws_lambda_function', {'memory_size': 1024}),
+    ('aws_lambda_function.worker', 'aws_lambda_function', {'memory_size': 256}),
+    ('aws_dynamodb_table.events', 'aws_dynamodb_table', {}),
+    ('aws_vpc.main', 'aws_vpc', {}),
+    ('aws_ecs_service.app', 'aws_ecs_service', {'launch_type': 'FARGATE', 'desired_count': 2}),
+    ('aws_ecs_service.legacy', 'aws_ecs_service', {'desired_count': 3}),
+    ('aws_eks_cluster.main', 'aws_eks_cluster', {}),
+]
+
+USAGE = {
+    'resource_usage': {
+        'aws_instance.batch': {'hours_per_day': 7.5},
+        'aws_db_instance.main': {'storage_gb': 250, 'hours_per_day': 12},
+        'aws_s3_bucket.small': {'storage_gb': 12.5},
+        'aws_s3_bucket.archive': {'storage_gb': 600000, 'storage_class': 'Archive'},
+        'aws_lambda_function.api': {'requests_per_day': 900000, 'execution_time_seconds': 0.35, 'free_tier': True},
+        'aws_lambda_function.worker': {'requests_per_day': 20000, 'execution_time_seconds': 2.5, 'free_tier': True},
+        'aws_dynamodb_table.events': {'reads_per_month': 3000000, 'writes_per_month': 800000,
+                                      'data_transfer_gb': 60000, 'free_tier': True},
+        'aws_vpc.main': {'data_transfer_gb': 20000, 'elastic_ips_count': 2},
+        'aws_ecs_service.app': {'fargate_hours_per_day': 18},
+        'aws_eks_cluster.main': {'worker_node_hours_per_day': 10},
+    },
+}
+
+
+def free_tier_usage(line_item):
+    # Rates are compared by value
+    return {name: {**entry, 'rate': repr(entry['rate'])} for name, entry in (line_item.get('free_tier_usage') or {}).items()}
+
+
+def test_every_service_is_covered(estimator):
+    services = {estimator.RESOURCE_SERVICES[resource_type] for _, resource_type, _ in RESOURCES}
+    assert services == set(cost_formulas.SERVICE_FORMULAS)
+
+
+def test_vectorized_costs_equal_scalar_costs(estimator):
+    scalar = estimator.estimate_resources(RESOURCES, USAGE)
+    vectorized = estimator.estimate_resources(RESOURCES, USAGE, vectorized=True)
+
+    assert not scalar['errors'] and not vectorized['errors']
+    assert [(item['address'], item['monthly_cost']) for item in vectorized['resources']] == \
+        [(item['address'], item['monthly_cost']) for item in scalar['resources']]
+    assert [free_tier_usage(item) for item in vectorized['resources']] == \
+        [free_tier_usage(item) for item in scalar['resources']]
+    assert vectorized['free_tier'] == scalar['free_tier']
+    for total in ('total_monthly_cost', 'total_monthly_cost_with_commitments', 'free_tier_credit'):
+        assert vectorized[total] == scalar[total]
+
+
+def test_parity_covers_tiered_and_free_tier_rates(estimator):
+    result = estimator.estimate_resources(RESOURCES, USAGE)
+    archive = next(item for item in result['resources'] if item['address'] == 'aws_s3_bucket.archive')
+    rate = archive['details']['price_per_gb']
+
+    # The archive bucket spans all three storage tiers, so it costs less than its first-tier price
+    assert len(rate.prices) == 3
+    assert archive['monthly_cost'] < 600000 * archive['unit_price']
+    assert set(result['free_tier']) == {'Lambda', 'DynamoDB'}
+    assert result['free_tier_credit'] > 0
+
+
+@pytest.mark.parametrize('service', sorted(cost_formulas.SERVICE_FORMULAS))
+def test_service_formulas_agree_per_resource(estimator, service):
+    resources = [resource for resource in RESOURCES if estimator.RESOURCE_SERVICES[resource[1]] == service]
+    scalar = estimator.estimate_resources(resources, USAGE)
+    vectorized = estimator.estimate_resources(resources, USAGE, vectorized=True)
+
+    assert [item['monthly_cost'] for item in vectorized['resources']] == \
+        [item['monthly_cost'] for item in scalar['resources']]
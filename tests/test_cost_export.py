@@ -0,0 +1,48 @@
+import pytest
+
+import cost_export
+
+pytest.importorskip('pyarrow')
+
+
+def line_items(*costs):
+    return [{'address': f'aws_instance.web{i}', 'service': 'EC2', 'monthly_cost': cost, 'tags': {'team': 'a'}}
+            for i, cost in enumerate(costs)]
+
+
+def test_runs_round_trip_through_the_dataset(tmp_path):
+    root = str(tmp_path / 'dataset')
+    cost_export.append_run(line_items(10.0, 5.0), root, '2024', run_date='2024-05-01')
+    cost_export.append_run(line_items(7.5), root, '2024', run_date='2024-05-02')
+    cost_export.append_run(line_items(1.0), root, 'team a/prod', run_date='2024-05-02')
+
+    assert cost_export.cost_trend(root) == [
+        {'run_date': '2024-05-01', 'stack': '2024', 'line_items': 2, 'monthly_cost': 15.0},
+        {'run_date': '2024-05-02', 'stack': '2024', 'line_items': 1, 'monthly_cost': 7.5},
+        {'run_date': '2024-05-02', 'stack': 'team a/prod', 'line_items': 1, 'monthly_cost': 1.0},
+    ]
+    assert cost_export.cost_trend(root, stack='2024', since='2024-05-02') == [
+        {'run_date': '2024-05-02', 'stack': '2024', 'line_items': 1, 'monthly_cost': 7.5},
+    ]
+    assert cost_export.cost_trend(root, stack='team a/prod') == [
+        {'run_date': '2024-05-02', 'stack': 'team a/prod', 'line_items': 1, 'monthly_cost': 1.0},
+    ]
+
+
+@pytest.mark.parametrize('export_format', ['csv', 'jsonl', 'parquet'])
+def test_export_reports_rows_and_total(tmp_path, export_format):
+    path = str(tmp_path / f'items.{export_format}')
+
+    result = cost_export.export_line_items(line_items(1.25, 2.5), path, export_format)
+
+    assert (result['rows'], result['monthly_cost']) == (2, 3.75)
+
+
+def test_numeric_stack_names_are_filtered_as_text(tmp_path):
+    root = str(tmp_path / 'dataset')
+    cost_export.append_run(line_items(3.0), root, '2024', run_date='2024-05-01')
+    cost_export.append_run(line_items(4.0), root, '2025', run_date='2024-05-01')
+
+    assert cost_export.cost_trend(root, stack='2025', since='2024-05-01') == [
+        {'run_date': '2024-05-01', 'stack': '2025', 'line_items': 1, 'monthly_cost': 4.0},
+    ]
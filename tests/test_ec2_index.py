@@ -0,0 +1,61 @@
+import json
+
+import aws_estimator
+import ec2_index
+import price_catalog
+from pricing_stub import synthetic_product
+
+USAGE = {'instance_type': 'm5.large', 'region': 'us-east-1'}
+
+
+def ec2_product(sku, hourly_price, **attributes):
+    filters = aws_estimator.ec2_filters('m5.large', 'us-east-1')
+    product = synthetic_product('AmazonEC2', filters)
+    # Rate codes embed the SKU, and the catalog replaces rows by rate code
+    product = json.loads(json.dumps(product).replace(product['product']['sku'], sku))
+    product['product']['attributes'].update(attributes)
+    for offer in product['terms']['OnDemand'].values():
+        for dimension in offer['priceDimensions'].values():
+            dimension['pricePerUnit']['USD'] = f'{hourly_price:.10f}'
+    return product
+
+
+def build_catalog(path, products):
+    def build(catalog):
+        catalog.add_products(products, 'AmazonEC2')
+        return ['AmazonEC2']
+
+    price_catalog.rebuild_catalog(str(path), build)
+
+
+def test_index_and_catalog_price_the_same_sku(tmp_path, monkeypatch, estimator):
+    catalog_path = tmp_path / 'catalog.sqlite3'
+    monkeypatch.setenv('AWS_ESTIMATOR_CATALOG', str(catalog_path))
+    build_catalog(catalog_path, [
+        ec2_product('BYOL', 0.05, licenseModel='Bring your own license'),
+        ec2_product('FIRST', 0.3),
+        ec2_product('CHEAPER_DUPLICATE', 0.1),
+    ])
+
+    from_catalog = estimator.get_ec2_offer('m5.large', 'us-east-1')
+    catalog_commitments = estimator.commitment_options('EC2', USAGE)
+    assert estimator.get_ec2_index() is not None
+    from_index = estimator.get_ec2_offer('m5.large', 'us-east-1')
+
+    assert from_catalog == from_index == (0.3, 'FIRST')
+    assert estimator.service_sku('EC2', USAGE) == 'FIRST'
+    assert estimator.commitment_options('EC2', USAGE) == catalog_commitments != []
+    assert estimator.get_ec2_offer('m5.large', 'us-east-1', license_model='Bring your own license') == (0.05, 'BYOL')
+
+
+def test_cheapest_stays_within_a_license_model():
+    offers = [
+        ec2_index.Ec2Offer('A', 'us-east-1', 'm5.large', 'Windows', 'Shared', 'NA', 'Used',
+                           'Bring your own license', 2, 8.0, 0.1),
+        ec2_index.Ec2Offer('B', 'us-east-1', 'm5.large', 'Windows', 'Shared', 'NA', 'Used',
+                           'No License required', 2, 8.0, 0.2),
+    ]
+    index = ec2_index.Ec2PriceIndex(offers)
+
+    assert index.cheapest('us-east-1', 2, operating_system='Windows').sku == 'B'
+    assert index.get('us-east-1', 'M5.LARGE', 'windows', license_model='bring your own license').sku == 'A'
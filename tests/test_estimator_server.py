@@ -0,0 +1,77 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+import aws_estimator
+import estimator_server
+import price_catalog
+from pricing_stub import synthetic_product
+
+
+@pytest.fixture
+def server(estimator):
+    server = estimator_server.make_server(estimator_server.EstimatorService(), port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://{estimator_server.DEFAULT_HOST}:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+
+def post(url, body):
+    request = urllib.request.Request(url, json.dumps(body).encode(), {'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_price_is_a_monthly_estimate(server, estimator):
+    status, body = post(server + '/price', {'service': 'EC2', 'region': 'us-east-1', 'instance_type': 't3.micro'})
+
+    hourly = estimator.get_ec2_pricing('t3.micro', 'us-east-1')
+    assert status == 200
+    assert body['unit_price'] == hourly
+    assert body['monthly_cost'] == pytest.approx(hourly * 24 * 30)
+    assert body['monthly_cost'] == estimator.estimate_service_cost(
+        'EC2', {'instance_type': 't3.micro', 'region': 'us-east-1'})['monthly_cost']
+
+
+def test_price_rejects_unknown_services(server):
+    status, body = post(server + '/price', {'service': 'Glacier'})
+
+    assert status == 400
+    assert 'Glacier' in body['error']
+
+
+def build_catalog(path, instance_type, hourly_price):
+    product = synthetic_product('AmazonEC2', aws_estimator.ec2_filters(instance_type, 'us-east-1'))
+    for offer in product['terms']['OnDemand'].values():
+        for dimension in offer['priceDimensions'].values():
+            dimension['pricePerUnit']['USD'] = f'{hourly_price:.10f}'
+
+    def build(catalog):
+        catalog.add_products([product], 'AmazonEC2')
+        return ['AmazonEC2']
+
+    price_catalog.rebuild_catalog(str(path), build)
+
+
+def test_refreshed_catalog_is_picked_up(tmp_path, monkeypatch, estimator):
+    catalog_path = tmp_path / 'catalog.sqlite3'
+    monkeypatch.setenv('AWS_ESTIMATOR_CATALOG', str(catalog_path))
+    build_catalog(catalog_path, 'm5.large', 0.1)
+    service = estimator_server.EstimatorService()
+    request = {'service': 'EC2', 'region': 'us-east-1', 'instance_type': 'm5.large'}
+    assert service.price(request)['unit_price'] == 0.1
+
+    build_catalog(catalog_path, 'm5.large', 0.2)
+
+    assert service.check_catalog()
+    assert service.price(request)['unit_price'] == 0.2
+    assert not service.check_catalog()
+    assert service.metrics()['catalog']['reloads'] == 1
@@ -0,0 +1,99 @@
+import pytest
+
+import pricing_stub
+import scenarios
+import tiered_pricing
+from pricing_stub import StubPricingClient
+
+LAMBDA_USAGE = {'requests_per_day': 100000, 'execution_time_seconds': 0.2, 'memory_size_mb': 512}
+
+
+def lambda_functions(n):
+    return [(f'aws_lambda_function.fn{i}', 'aws_lambda_function', {'memory_size': 512}) for i in range(n)]
+
+
+def lambda_usage(free_tier):
+    return {'resource_type_default_usage': {'aws_lambda_function': {**LAMBDA_USAGE, 'free_tier': free_tier}}}
+
+
+def test_free_tier_is_shared_by_every_function(estimator):
+    paid = estimator.estimate_resources(lambda_functions(62), lambda_usage(False))
+    free = estimator.estimate_resources(lambda_functions(62), lambda_usage(True))
+
+    prices = estimator.lambda_pricing_info()
+    requests = 62 * LAMBDA_USAGE['requests_per_day'] * estimator.DAYS_PER_MONTH
+    gb_seconds = requests * LAMBDA_USAGE['execution_time_seconds'] * 0.5
+    allowances = tiered_pricing.FREE_TIER_ALLOWANCES['Lambda']
+    credit = (allowances['price_per_request'] * tiered_pricing.unit_price(prices['price_per_request'])
+              + allowances['price_per_gb_second'] * tiered_pricing.unit_price(prices['price_per_gb_second']))
+
+    # Line items keep their full cost; the allowance comes off the total once
+    assert [item['monthly_cost'] for item in free['resources']] == [item['monthly_cost'] for item in paid['resources']]
+    assert free['free_tier']['Lambda']['price_per_request']['quantity'] == pytest.approx(requests)
+    assert free['free_tier']['Lambda']['price_per_gb_second']['quantity'] == pytest.approx(gb_seconds)
+    assert free['free_tier_credit'] == pytest.approx(credit)
+    assert free['total_monthly_cost'] == pytest.approx(paid['total_monthly_cost'] - credit)
+
+
+def test_free_tier_never_exceeds_usage(estimator):
+    usage = lambda_usage(True)
+    usage['resource_type_default_usage']['aws_lambda_function']['requests_per_day'] = 10
+    result = estimator.estimate_resources(lambda_functions(3), usage)
+
+    assert result['free_tier_credit'] == pytest.approx(sum(item['monthly_cost'] for item in result['resources']))
+    assert result['total_monthly_cost'] == pytest.approx(0.0)
+
+
+def test_lambda_components_come_from_their_own_products(estimator, monkeypatch):
+    # Like the Pricing API, never put both Lambda dimensions in one product
+    def product_factory(service_code, filters):
+        if service_code == 'AWSLambda' and not any(f['Field'] == 'group' for f in filters):
+            return None
+        return pricing_stub.synthetic_product(service_code, filters)
+
+    monkeypatch.setattr(estimator, 'pricing_client', StubPricingClient(latency_seconds=0, product_factory=product_factory))
+    prices = estimator.lambda_pricing_info()
+    requests = pricing_stub.synthetic_product('AWSLambda', estimator.group_filters('AWS-Lambda-Requests'))
+
+    assert set(prices) == {'price_per_request', 'price_per_gb_second'}
+    assert {dimension['unit'] for term in requests['terms']['OnDemand'].values()
+            for dimension in term['priceDimensions'].values()} == {'Requests'}
+    result = estimator.estimate_resources(lambda_functions(1), lambda_usage(False))
+    assert not result['errors'] and result['total_monthly_cost'] > 0
+
+
+def free_first_tier_product(service_code, filters):
+    # Like real data transfer pricing, the first tier of VPC transfer is free
+    product = pricing_stub.synthetic_product(service_code, filters)
+    if service_code == 'AmazonVPC':
+        for term in product['terms']['OnDemand'].values():
+            for dimension in term['priceDimensions'].values():
+                if 'DataTransfer' in dimension['description'] and dimension['beginRange'] == '0':
+                    dimension['pricePerUnit'] = {'USD': '0.0000000000'}
+    return product
+
+
+@pytest.mark.parametrize('data_transfer_gb', [1, 10300])
+def test_free_first_tier_is_not_credited(estimator, monkeypatch, data_transfer_gb):
+    monkeypatch.setattr(estimator, 'pricing_client',
+                        StubPricingClient(latency_seconds=0, product_factory=free_first_tier_product))
+    usage = {'resource_usage': {'aws_vpc.main': {'data_transfer_gb': data_transfer_gb, 'hours_per_day': 0,
+                                                 'free_tier': True}}}
+    result = estimator.estimate_resources([('aws_vpc.main', 'aws_vpc', {})], usage)
+    rate = estimator.vpc_pricing_info()['price_per_data_transfer']
+    line_cost = result['resources'][0]['monthly_cost']
+
+    assert rate.prices[0] == 0.0
+    assert result['free_tier_credit'] == pytest.approx(rate.cost(data_transfer_gb) - rate.cost(data_transfer_gb - 100))
+    assert result['free_tier_credit'] <= line_cost
+    assert result['total_monthly_cost'] == pytest.approx(line_cost - result['free_tier_credit'])
+    assert result['total_monthly_cost'] >= 0
+
+
+def test_scenarios_credit_the_free_tier_like_the_estimate(estimator):
+    resources = lambda_functions(4)
+    usage = lambda_usage(True)
+    estimate = estimator.estimate_resources(resources, usage)
+    simulated = scenarios.simulate(resources, usage, samples=10, workers=1)
+
+    assert simulated['total']['mean'] == pytest.approx(estimate['total_monthly_cost'])
@@ -0,0 +1,62 @@
+import json
+
+import incremental
+
+
+def write_plan(path, instance_types):
+    path.write_text(json.dumps({'resource_changes': [
+        {
+            'address': f'aws_instance.{name}',
+            'mode': 'managed',
+            'type': 'aws_instance',
+            'change': {'actions': ['create'], 'after': {'instance_type': instance_type, 'region': 'us-east-1'}},
+        }
+        for name, instance_type in instance_types.items()
+    ]}))
+    return str(path)
+
+
+def test_plan_reuses_unchanged_resources(tmp_path, estimator):
+    state = str(tmp_path / 'state.json')
+    plan = write_plan(tmp_path / 'plan.json', {'web': 'm5.large', 'db': 't3.micro'})
+    first = estimator.estimate_incremental(plan, state)
+
+    plan = write_plan(tmp_path / 'plan.json', {'web': 'm5.xlarge', 'db': 't3.micro'})
+    second = estimator.estimate_incremental(plan, state)
+
+    assert first['repriced'] == 2 and first['total_monthly_cost'] > 0
+    assert (second['changed'], second['reused'], second['repriced']) == (['aws_instance.web'], 1, 1)
+    assert second['total_monthly_cost'] == estimator.estimate(plan)['total_monthly_cost']
+
+
+def test_parse_errors_leave_the_state_alone(tmp_path, estimator):
+    state = str(tmp_path / 'state.json')
+    workspace = tmp_path / 'workspace'
+    workspace.mkdir()
+    (workspace / 'main.tf').write_text('resource "aws_instance" "web" {\n  instance_type = "m5.large"\n}\n')
+    estimator.estimate_incremental(str(workspace), state, workers=1)
+    saved = incremental.load_state(state)
+
+    (workspace / 'main.tf').write_text('resource "aws_instance" "web" {\n')
+    result = estimator.estimate_incremental(str(workspace), state, workers=1)
+
+    assert result['parse_errors'] and not result['state_saved']
+    assert incremental.load_state(state) == saved
+
+
+def test_catalog_refresh_still_reports_removed_resources(tmp_path, estimator):
+    state = str(tmp_path / 'state.json')
+    plan = write_plan(tmp_path / 'plan.json', {'web': 'm5.large', 'db': 't3.micro'})
+    first = estimator.estimate_incremental(plan, state)
+    saved = incremental.load_state(state)
+    saved['price_version'] = 'an older catalog'
+    incremental.save_state(state, saved)
+
+    plan = write_plan(tmp_path / 'plan.json', {'web': 'm5.large'})
+    second = estimator.estimate_incremental(plan, state)
+
+    db_cost = saved['resources']['aws_instance.db']['line_item']['monthly_cost']
+    assert second['removed'] == ['aws_instance.db']
+    assert (second['repriced'], second['reused']) == (1, 0)
+    assert second['line_item_deltas'] == [{'key': 'aws_instance.db', 'before': db_cost, 'after': 0.0, 'delta': -db_cost}]
+    assert second['delta_monthly_cost'] == second['total_monthly_cost'] - first['total_monthly_cost']
@@ -0,0 +1,46 @@
+import gzip
+import json
+
+import pytest
+
+import offer_ingest
+import price_catalog
+from pricing_stub import synthetic_price_list
+
+pytest.importorskip('ijson')
+
+
+def offer_file(products, service_code):
+    """The bulk offer file document holding ``products`` (get_products entries)."""
+    document = {'formatVersion': 'v1.0', 'offerCode': service_code, 'products': {}, 'terms': {}}
+    for product in products:
+        sku = product['product']['sku']
+        document['products'][sku] = {**product['product'], 'sku': sku}
+        for term_type, offers in product['terms'].items():
+            document['terms'].setdefault(term_type, {})[sku] = offers
+    return document
+
+
+def price_rows(catalog):
+    return sorted(catalog.connection.execute('SELECT * FROM prices').fetchall())
+
+
+@pytest.mark.parametrize('service_code', ['AmazonEC2', 'AmazonS3'])
+@pytest.mark.parametrize('compressed', [False, True])
+def test_ingest_matches_the_api_path(tmp_path, service_code, compressed):
+    products = synthetic_price_list(service_code, regions=['us-east-1', 'eu-west-1'], products_per_region=5)
+    path = tmp_path / ('offer.json.gz' if compressed else 'offer.json')
+    with (gzip.open if compressed else open)(path, 'wt') as file:
+        json.dump(offer_file(products, service_code), file)
+
+    api = price_catalog.PriceCatalog(str(tmp_path / 'api.sqlite3'))
+    api.add_products(products, service_code)
+    ingested = price_catalog.PriceCatalog(str(tmp_path / 'ingested.sqlite3'))
+    stats = offer_ingest.ingest_offer_file(str(path), ingested)
+
+    assert stats['service'] == service_code
+    assert (stats['products'], stats['orphan_terms']) == (len(products), 0)
+    assert price_rows(ingested) == price_rows(api)
+    assert stats['rows'] == len(price_rows(api))
+    api.close()
+    ingested.close()
@@ -0,0 +1,90 @@
+import json
+
+import plan_json
+
+
+def write_plan(path, resource_changes):
+    path.write_text(json.dumps({'resource_changes': resource_changes}))
+    return str(path)
+
+
+def instance_change(address, instance_type='m5.large'):
+    return {
+        'address': address,
+        'mode': 'managed',
+        'type': 'aws_instance',
+        'change': {'actions': ['create'], 'after': {'instance_type': instance_type, 'region': 'us-east-1'}},
+    }
+
+
+def test_identical_instances_collapse_to_the_block(tmp_path, estimator):
+    plan = write_plan(tmp_path / 'plan.json', [instance_change(f'aws_instance.web[{i}]') for i in range(3)])
+
+    resources, stats = estimator._plan_resources(plan, None)
+
+    assert stats == {'instances': 3, 'priced_groups': 1}
+    assert [(address, attributes['count']) for address, _, attributes, _ in resources] == [('aws_instance.web', 3)]
+
+
+def test_instance_usage_survives_aggregation(tmp_path, estimator):
+    plan = write_plan(tmp_path / 'plan.json', [instance_change('aws_instance.web[0]')])
+    usage = {'resource_usage': {'aws_instance.web[0]': {'hours_per_day': 8}}}
+    full_day = estimator.estimate_service_cost('EC2', {'instance_type': 'm5.large', 'region': 'us-east-1'})
+
+    result = estimator.estimate(plan, usage)
+
+    [line_item] = result['resources']
+    assert line_item['usage']['hours_per_day'] == 8
+    assert line_item['monthly_cost'] == full_day['monthly_cost'] * 8 / 24
+
+
+def test_instances_with_different_usage_are_priced_apart(tmp_path, estimator):
+    plan = write_plan(tmp_path / 'plan.json', [instance_change(f'aws_instance.web[{i}]') for i in range(3)])
+    usage = {'resource_usage': {'aws_instance.web[1]': {'hours_per_day': 8}}}
+
+    result = estimator.estimate(plan, usage)
+
+    costs = {item['address']: (item['quantity'], item['usage'].get('hours_per_day')) for item in result['resources']}
+    assert costs == {'aws_instance.web[0]': (2, None), 'aws_instance.web[1]': (1, 8)}
+
+
+def test_base_address():
+    assert plan_json.base_address('aws_instance.web[0]') == 'aws_instance.web'
+    assert plan_json.base_address('aws_instance.web["a"]') == 'aws_instance.web'
+    assert plan_json.base_address('aws_instance.web') == 'aws_instance.web'
+
+
+def test_resources_take_the_region_of_their_provider(tmp_path, estimator):
+    def change(address):
+        return {'address': address, 'mode': 'managed', 'type': 'aws_instance',
+                'change': {'actions': ['create'], 'after': {'instance_type': 'm5.large'}}}
+
+    def provider(region, alias=None):
+        return {'name': 'aws', **({'alias': alias} if alias else {}),
+                'expressions': {'region': {'constant_value': region}} if region else {}}
+
+    plan = tmp_path / 'plan.json'
+    plan.write_text(json.dumps({
+        'resource_changes': [change('aws_instance.east'), change('aws_instance.west[0]'),
+                             change('aws_instance.unknown'), change('module.app[0].aws_instance.web')],
+        'configuration': {
+            'provider_config': {'aws': provider('us-east-1'), 'aws.west': provider('us-west-2', 'west'),
+                                'aws.unknown': provider(None, 'unknown')},
+            'root_module': {
+                'resources': [
+                    {'address': 'aws_instance.east', 'provider_config_key': 'aws'},
+                    {'address': 'aws_instance.west', 'provider_config_key': 'aws.west'},
+                    {'address': 'aws_instance.unknown', 'provider_config_key': 'aws.unknown'},
+                ],
+                'module_calls': {'app': {'module': {'resources': [
+                    {'address': 'aws_instance.web', 'provider_config_key': 'module.app:aws'},
+                ]}}},
+            },
+        },
+    }))
+
+    regions = {address: attributes.get('region')
+               for address, _, attributes, _ in plan_json.iter_planned_resources(str(plan))}
+
+    assert regions == {'aws_instance.east': 'us-east-1', 'aws_instance.west[0]': 'us-west-2',
+                       'aws_instance.unknown': None, 'module.app[0].aws_instance.web': 'us-east-1'}
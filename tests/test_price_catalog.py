@@ -0,0 +1,99 @@
+import threading
+
+import pytest
+
+import price_catalog
+import pricing_stub
+
+FILTERS = [
+    {'Type': 'TERM_MATCH', 'Field': 'regionCode', 'Value': 'us-east-1'},
+    {'Type': 'TERM_MATCH', 'Field': 'storageClass', 'Value': 'General Purpose'},
+]
+
+
+def contents(products):
+    # Records are rebuilt after every write, so compare them by value
+    return [(product.sku, product.attributes, [(dimension.rate_code, dimension.price) for dimension in product.on_demand])
+            for product in products]
+
+
+def build(catalog):
+    catalog.add_products([pricing_stub.synthetic_product('AmazonS3', FILTERS)], 'AmazonS3')
+    return ['AmazonS3']
+
+
+@pytest.fixture
+def catalog_path(tmp_path):
+    path = str(tmp_path / 'catalog.sqlite3')
+    price_catalog.rebuild_catalog(path, build)
+    return path
+
+
+@pytest.fixture
+def catalog(catalog_path):
+    catalog = price_catalog.PriceCatalog(catalog_path)
+    yield catalog
+    catalog.close()
+
+
+def test_rebuilt_catalog_is_fresh(catalog):
+    assert catalog.get_meta('schema_version') == str(price_catalog.SCHEMA_VERSION)
+    assert catalog.age_seconds() < 60
+    assert not catalog.is_stale()
+
+
+def test_catalog_older_than_ttl_is_stale(catalog, monkeypatch):
+    refreshed_at = float(catalog.get_meta('refreshed_at'))
+    monkeypatch.setattr(price_catalog.time, 'time', lambda: refreshed_at + 3600)
+
+    assert not catalog.is_stale(ttl_seconds=7200)
+    assert catalog.is_stale(ttl_seconds=1800)
+
+
+def test_catalog_from_another_schema_version_is_stale(catalog):
+    catalog.set_meta('schema_version', price_catalog.SCHEMA_VERSION - 1)
+
+    assert catalog.is_stale()
+
+
+def test_empty_catalog_is_stale(tmp_path):
+    catalog = price_catalog.PriceCatalog(str(tmp_path / 'empty.sqlite3'))
+    catalog.set_meta('schema_version', price_catalog.SCHEMA_VERSION)
+
+    assert catalog.age_seconds() is None
+    assert catalog.is_stale()
+    catalog.close()
+
+
+def test_concurrent_lookups_and_writes_share_the_memo(catalog):
+    expected = contents(catalog.get_products('AmazonS3', FILTERS))
+    other_filters = [{**FILTERS[0], 'Value': 'eu-west-1'}, FILTERS[1]]
+    results = []
+    failures = []
+    start = threading.Barrier(8)
+
+    def lookup():
+        start.wait()
+        try:
+            for _ in range(200):
+                results.append(contents(catalog.get_products('AmazonS3', FILTERS)))
+        except Exception as error:
+            failures.append(error)
+
+    def write():
+        start.wait()
+        try:
+            for _ in range(50):
+                catalog.add_products([pricing_stub.synthetic_product('AmazonS3', other_filters)], 'AmazonS3')
+        except Exception as error:
+            failures.append(error)
+
+    threads = [threading.Thread(target=lookup) for _ in range(6)] + [threading.Thread(target=write) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert expected and not failures
+    assert len(results) == 6 * 200
+    assert all(products == expected for products in results)
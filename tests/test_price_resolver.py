@@ -0,0 +1,100 @@
+import threading
+
+import pytest
+
+import price_resolver
+from price_resolver import PriceResolver
+from pricing_stub import StubPricingClient
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(price_resolver, 'time', clock)
+    return clock
+
+
+def loader(client, service_code='AmazonEC2'):
+    return lambda: client.get_products(ServiceCode=service_code)['PriceList']
+
+
+def test_concurrent_misses_make_one_upstream_call():
+    client = StubPricingClient(latency_seconds=0.05)
+    resolver = PriceResolver()
+    barrier = threading.Barrier(8)
+    results = []
+
+    def resolve():
+        barrier.wait()
+        results.append(resolver.resolve('key', loader(client)))
+
+    threads = [threading.Thread(target=resolve) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert client.calls == 1
+    assert len(results) == 8 and all(result == results[0] for result in results)
+    assert resolver.stats()['misses'] == 1 and resolver.stats()['coalesced'] == 7
+
+
+def test_loader_errors_are_not_cached():
+    resolver = PriceResolver()
+
+    def fail():
+        raise RuntimeError('upstream down')
+
+    with pytest.raises(RuntimeError):
+        resolver.resolve('key', fail)
+    assert 'key' not in resolver
+    assert resolver.resolve('key', lambda: ['price']) == ['price']
+
+
+def test_empty_results_are_cached(clock):
+    client = StubPricingClient(latency_seconds=0, product_factory=lambda service_code, filters: None)
+    resolver = PriceResolver(negative_ttl_seconds=60)
+
+    assert resolver.resolve('missing', loader(client)) == []
+    assert resolver.resolve('missing', loader(client)) == []
+    assert client.calls == 1 and resolver.stats()['negative_hits'] == 1
+
+    clock.now += 61
+    resolver.resolve('missing', loader(client))
+    assert client.calls == 2
+
+
+def test_least_recently_used_key_is_evicted():
+    client = StubPricingClient(latency_seconds=0)
+    resolver = PriceResolver(max_entries=2)
+    resolver.resolve('a', loader(client))
+    resolver.resolve('b', loader(client))
+    resolver.resolve('a', loader(client))  # 'b' is now the least recently used
+    resolver.resolve('c', loader(client))
+
+    assert 'a' in resolver and 'c' in resolver and 'b' not in resolver
+    assert resolver.stats()['evictions'] == 1 and resolver.stats()['size'] == 2
+    resolver.resolve('b', loader(client))
+    assert client.calls == 4
+
+
+def test_prices_expire_after_their_ttl(clock):
+    client = StubPricingClient(latency_seconds=0)
+    resolver = PriceResolver(ttl_seconds=3600)
+    resolver.resolve('key', loader(client))
+
+    clock.now += 3599
+    resolver.resolve('key', loader(client))
+    assert client.calls == 1
+
+    clock.now += 2
+    resolver.resolve('key', loader(client))
+    assert client.calls == 2 and resolver.stats()['misses'] == 2
@@ -0,0 +1,82 @@
+import pytest
+
+import price_catalog
+import pricing_crawler
+from pricing_stub import PaginatingPricingClient
+
+SERVICES = ['AmazonEC2', 'AmazonS3']
+PAGE_SIZE = 10
+
+
+def no_sleep(seconds):
+    pass
+
+
+def crawl(client, catalog, checkpoint=None):
+    return pricing_crawler.crawl(client, catalog, pricing_crawler.crawl_tasks(SERVICES), checkpoint,
+                                 max_concurrency=2, max_retries=0, page_size=PAGE_SIZE, sleep=no_sleep)
+
+
+def rate_codes(catalog, service_code):
+    return [row[0] for row in catalog.connection.execute(
+        'SELECT rate_code FROM prices WHERE service = ? ORDER BY rowid', (service_code,))]
+
+
+@pytest.fixture
+def fresh(tmp_path):
+    """A catalog crawled without interruption, to compare resumed crawls with."""
+    client = PaginatingPricingClient()
+    catalog = price_catalog.PriceCatalog(str(tmp_path / 'fresh.sqlite3'))
+    assert not crawl(client, catalog)['errors']
+    yield client, catalog
+    catalog.close()
+
+
+def interrupted_crawl(tmp_path, fresh_client):
+    client = PaginatingPricingClient(price_lists=fresh_client.price_lists, outage_after=7)
+    catalog = price_catalog.PriceCatalog(str(tmp_path / 'resumed.sqlite3'))
+    checkpoint = pricing_crawler.CrawlCheckpoint(str(tmp_path / 'crawl.json'))
+    stats = crawl(client, catalog, checkpoint)
+    assert stats['errors'] and stats['pages'] > 0
+    return catalog, pricing_crawler.CrawlCheckpoint(checkpoint.path), stats['pages']
+
+
+def test_interrupted_crawl_resumes_where_it_stopped(tmp_path, fresh):
+    fresh_client, fresh_catalog = fresh
+    catalog, checkpoint, pages_before = interrupted_crawl(tmp_path, fresh_client)
+
+    client = PaginatingPricingClient(price_lists=fresh_client.price_lists)
+    stats = crawl(client, catalog, checkpoint)
+
+    assert not stats['errors'] and stats['resumed'] > 0
+    # No page is fetched twice and none is skipped
+    assert pages_before + client.pages == fresh_client.pages
+    for service_code in SERVICES:
+        key = pricing_crawler.task_key(service_code, [])
+        assert checkpoint.get(key)['products'] == len(fresh_client.price_lists[service_code])
+        assert rate_codes(catalog, service_code) == rate_codes(fresh_catalog, service_code)
+    catalog.close()
+
+
+def test_restart_after_expired_tokens_keeps_catalog_order(tmp_path, fresh):
+    fresh_client, fresh_catalog = fresh
+    catalog, checkpoint, _ = interrupted_crawl(tmp_path, fresh_client)
+
+    client = PaginatingPricingClient(price_lists=fresh_client.price_lists)
+    client.expire_tokens()
+    stats = crawl(client, catalog, checkpoint)
+
+    assert not stats['errors'] and stats['restarted'] > 0
+    # Pages written again keep their rows' places, so the first SKU in catalog order is unchanged
+    for service_code in SERVICES:
+        assert rate_codes(catalog, service_code) == rate_codes(fresh_catalog, service_code)
+    catalog.close()
+
+
+def test_rewriting_a_page_keeps_its_rows_in_place(fresh):
+    client, catalog = fresh
+    before = rate_codes(catalog, 'AmazonEC2')
+
+    catalog.add_products(client.price_lists['AmazonEC2'][:PAGE_SIZE], 'AmazonEC2')
+
+    assert rate_codes(catalog, 'AmazonEC2') == before
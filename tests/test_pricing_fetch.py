@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+import pricing_fetch
+import pricing_stub
+from pricing_stub import StubPricingClient
+
+
+def no_sleep(seconds):
+    pass
+
+
+def flaky(throttles, result='ok'):
+    # Throttles the first ``throttles`` calls, then succeeds
+    calls = []
+
+    def call():
+        calls.append(None)
+        if len(calls) <= throttles:
+            raise pricing_stub.throttling_error()
+        return result
+    return call, calls
+
+
+def test_limiter_shrinks_on_throttling_and_recovers():
+    limiter = pricing_fetch.AdaptiveLimiter(max_concurrency=8, increase_after=2)
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert (limiter.limit, limiter.throttled) == (2, 2)
+
+    for _ in range(4):
+        limiter.on_success()
+    assert limiter.limit == 4
+    for _ in range(20):
+        limiter.on_success()
+    assert limiter.limit == 8
+
+
+def test_throttling_is_retried_with_backoff():
+    call, calls = flaky(throttles=3)
+    limiter = pricing_fetch.AdaptiveLimiter(max_concurrency=8)
+    delays = []
+
+    assert pricing_fetch.call_with_backoff(call, limiter, sleep=delays.append) == ('ok', 3)
+    assert len(calls) == 4 and len(delays) == 3
+    assert limiter.limit == 1 and limiter.throttled == 3
+
+
+def test_throttling_gives_up_after_max_retries():
+    call, calls = flaky(throttles=10)
+
+    with pytest.raises(Exception) as raised:
+        pricing_fetch.call_with_backoff(call, max_retries=2, sleep=no_sleep)
+    assert pricing_fetch.is_throttling_error(raised.value)
+    assert len(calls) == 3
+
+
+def test_other_errors_are_not_retried():
+    calls = []
+
+    def call():
+        calls.append(None)
+        raise pricing_stub.ClientError({'Error': {'Code': 'AccessDeniedException', 'Message': 'no'}}, 'GetProducts')
+
+    with pytest.raises(pricing_stub.ClientError):
+        pricing_fetch.call_with_backoff(call, sleep=no_sleep)
+    assert len(calls) == 1
+
+
+def test_fetch_all_fetches_every_key_under_throttling():
+    client = StubPricingClient(latency_seconds=0, throttle_rate=0.3, seed=7)
+    keys = [('AmazonEC2', (('TERM_MATCH', 'instanceType', f'm5.{size}xlarge'),)) for size in range(2, 42)]
+
+    def fetch(key):
+        service_code, filters = key
+        filters = [{'Type': filter_type, 'Field': field, 'Value': value} for filter_type, field, value in filters]
+        return json.loads(client.get_products(ServiceCode=service_code, Filters=filters)['PriceList'][0])
+
+    outcome = pricing_fetch.fetch_all(keys + keys[:5], fetch, max_concurrency=4, max_retries=50, sleep=no_sleep)
+
+    assert not outcome['errors']
+    assert set(outcome['results']) == set(keys)
+    assert all(outcome['results'][key]['product']['attributes']['instanceType'] == key[1][0][2] for key in keys)
+    assert client.throttled > 0
+    assert outcome['throttled'] == outcome['retries'] == client.throttled
+    assert client.calls == len(keys) + client.throttled
+
+
+def test_fetch_all_counts_retries_of_failed_keys():
+    client = StubPricingClient(latency_seconds=0, throttle_rate=1.0)
+
+    outcome = pricing_fetch.fetch_all(['a', 'b'], lambda key: client.get_products(ServiceCode=key),
+                                      max_retries=3, sleep=no_sleep)
+
+    assert set(outcome['errors']) == {'a', 'b'} and not outcome['results']
+    assert outcome['retries'] == 6 == client.calls - 2
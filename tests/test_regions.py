@@ -0,0 +1,66 @@
+import pytest
+
+PROVIDERS = '''
+provider "aws" {
+  region = "eu-west-1"
+}
+
+provider "aws" {
+  alias  = "west"
+  region = "us-west-2"
+}
+
+provider "aws" {
+  alias = "unset"
+}
+'''
+
+RESOURCES = '''
+resource "aws_instance" "default" {
+  instance_type = "m5.large"
+}
+
+resource "aws_instance" "west" {
+  provider      = aws.west
+  instance_type = "m5.large"
+}
+
+resource "aws_instance" "unset" {
+  provider      = aws.unset
+  instance_type = "m5.large"
+}
+'''
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    (tmp_path / 'providers.tf').write_text(PROVIDERS)
+    (tmp_path / 'main.tf').write_text(RESOURCES)
+    module = tmp_path / 'modules' / 'app'
+    module.mkdir(parents=True)
+    (module / 'main.tf').write_text('resource "aws_instance" "web" {\n  instance_type = "m5.large"\n}\n')
+    return str(tmp_path)
+
+
+def test_resources_are_priced_in_their_provider_region(workspace, estimator, monkeypatch):
+    monkeypatch.delenv('AWS_REGION', raising=False)
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'ap-southeast-2')
+
+    resources, errors, _ = estimator.load_workspace_resources(workspace, workers=1, use_parse_cache=False)
+    regions = {address: estimator.resource_usage(address, resource_type, attributes)['region']
+               for address, resource_type, attributes, _ in resources}
+
+    assert not errors
+    # The alias is never taken for a region; an unknown one falls back to the configured default
+    assert regions == {'aws_instance.default': 'eu-west-1', 'aws_instance.west': 'us-west-2',
+                       'aws_instance.unset': 'ap-southeast-2', 'aws_instance.web': 'eu-west-1'}
+
+
+def test_ec2_is_never_looked_up_without_a_region(estimator, monkeypatch):
+    monkeypatch.delenv('AWS_REGION', raising=False)
+    monkeypatch.delenv('AWS_DEFAULT_REGION', raising=False)
+
+    [(_, filters)] = estimator.service_pricing_keys('EC2', {'instance_type': 'm5.large'})
+
+    assert ('TERM_MATCH', 'regionCode', estimator.DEFAULT_REGION) in filters
+    assert estimator.get_ec2_pricing('m5.large') == estimator.get_ec2_pricing('m5.large', estimator.DEFAULT_REGION)
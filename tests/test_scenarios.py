@@ -0,0 +1,37 @@
+import pytest
+
+import scenarios
+
+pytest.importorskip('numpy')
+
+RESOURCES = [(f'aws_instance.web{i}', 'aws_instance', {'instance_type': 'm5.large', 'region': 'us-east-1'})
+             for i in range(6)]
+# Each instance runs a uniformly distributed number of hours a day
+USAGE = {'resource_type_default_usage': {'aws_instance': {'hours_per_day': [0, 24]}}}
+
+
+def test_results_are_reproducible_for_a_seed(estimator, monkeypatch):
+    # Several batches, so their seeding by position is exercised
+    monkeypatch.setattr(scenarios, 'BATCH_ELEMENTS', 2 * 1000)
+
+    first = scenarios.simulate(RESOURCES, USAGE, samples=1000, workers=1, seed=42)
+    again = scenarios.simulate(RESOURCES, USAGE, samples=1000, workers=1, seed=42)
+    in_processes = scenarios.simulate(RESOURCES, USAGE, samples=1000, workers=2, seed=42)
+    other_seed = scenarios.simulate(RESOURCES, USAGE, samples=1000, workers=1, seed=43)
+
+    assert first == again == in_processes
+    assert other_seed['total'] != first['total']
+
+
+def test_percentiles_of_a_known_distribution(estimator):
+    price = estimator.get_ec2_pricing('m5.large', 'us-east-1')
+    # One instance, hours uniform on [0, 24]: the monthly cost is uniform on [0, 24 * 30 * price]
+    result = scenarios.simulate(RESOURCES[:1], USAGE, samples=20000, workers=1, seed=0)
+    total = result['total']
+    high = 24 * estimator.DAYS_PER_MONTH * price
+
+    assert 0 <= total['p10'] <= total['p50'] <= total['p90'] <= high
+    assert total['p10'] == pytest.approx(0.1 * high, rel=0.05)
+    assert total['p50'] == pytest.approx(0.5 * high, rel=0.05)
+    assert total['p90'] == pytest.approx(0.9 * high, rel=0.05)
+    assert result['services']['EC2']['resources'] == 1
@@ -0,0 +1,59 @@
+import decimal
+import random
+
+import pytest
+
+import sku_record
+from sku_record import PRICE_SCALE, from_fixed, to_fixed
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('0.0960000000', 960000000),
+    ('0.0000000001', 1),
+    ('12.5', 125000000000),
+    ('.25', 2500000000),
+    ('3', 3 * PRICE_SCALE),
+    ('0.0000000000', 0),
+    ('1234567.8901234567', 12345678901234567),
+])
+def test_decimal_strings_convert_exactly(text, expected):
+    assert to_fixed(text) == expected
+    assert to_fixed(decimal.Decimal(text)) == expected
+
+
+def test_ten_decimal_strings_round_trip():
+    rng = random.Random(0)
+    for _ in range(10000):
+        text = f'{rng.randrange(10 ** 6)}.{rng.randrange(10 ** 10):010d}'
+        assert from_fixed(to_fixed(text)) == float(text)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('-0.0960000000', -960000000),
+    ('-12.5', -125000000000),
+    ('-0.0000000001', -1),
+])
+def test_negative_prices(text, expected):
+    assert to_fixed(text) == expected
+    assert from_fixed(to_fixed(text)) == float(text)
+
+
+@pytest.mark.parametrize('price', [0.096, 0.1, 1e-10, -2.75, 0.0])
+def test_floats_round_to_the_nearest_unit(price):
+    assert to_fixed(price) == round(price * PRICE_SCALE)
+    assert from_fixed(to_fixed(price)) == pytest.approx(price, abs=1 / PRICE_SCALE)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('0.123456789012', 1234567890),  # More than PRICE_DIGITS places round to the nearest unit
+    ('0.00000000006', 1),
+    ('1E-7', 1000),
+    ('2.5e-3', 25000000),
+])
+def test_other_forms_fall_back_to_float(text, expected):
+    assert to_fixed(text) == expected
+
+
+def test_price_dimensions_keep_the_published_decimal():
+    dimension = sku_record.PriceDimension('RATE', 'per hour', 'Hrs', 0.0, None, to_fixed('0.0416000000'))
+    assert dimension.price_usd == 0.0416
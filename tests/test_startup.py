@@ -0,0 +1,15 @@
+import benchmark
+
+# The cached estimate's budget is benchmark.measure_startup's 100 ms; these
+# bounds leave room for slow CI machines and only catch gross regressions
+IMPORT_SECONDS_BOUND = 0.5
+CACHED_ESTIMATE_SECONDS_BOUND = 1.0
+
+
+def test_cached_estimate_starts_fast_without_heavy_imports():
+    result = benchmark.measure_startup(n_resources=20, repeat=3)
+
+    assert result['import_heavy_modules_loaded'] == []
+    assert result['cached_estimate_heavy_modules_loaded'] == []
+    assert result['import_seconds'] < IMPORT_SECONDS_BOUND
+    assert result['cached_estimate_seconds'] < CACHED_ESTIMATE_SECONDS_BOUND
@@ -0,0 +1,70 @@
+import pytest
+
+import terraform_parse
+
+pytest.importorskip('hcl2')
+
+GOOD = 'resource "aws_instance" "web" {\n  instance_type = "m5.large"\n}\n'
+BROKEN = 'resource "aws_instance" "db" {\n'
+
+
+def write(path, source):
+    path.write_text(source)
+    return str(path)
+
+
+def test_parse_cache_is_keyed_by_content(tmp_path):
+    cache = terraform_parse.ParseCache(str(tmp_path / 'cache'))
+    first = write(tmp_path / 'a.tf', GOOD)
+    second = write(tmp_path / 'b.tf', GOOD.replace('web', 'api'))
+
+    configs, stats = terraform_parse.parse_files([first, second], 1, cache)
+    assert stats == {'parsed': 2, 'cached': 0}
+
+    assert terraform_parse.parse_files([first, second], 1, cache)[1] == {'parsed': 0, 'cached': 2}
+
+    # Same content elsewhere is a hit; changed content is a miss
+    copy = write(tmp_path / 'copy.tf', GOOD)
+    write(tmp_path / 'b.tf', GOOD.replace('web', 'worker'))
+    again, stats = terraform_parse.parse_files([copy, second], 1, cache)
+    assert stats == {'parsed': 1, 'cached': 1}
+    assert again[copy] == configs[first]
+
+
+def test_memory_cache_serves_repeat_lookups(tmp_path):
+    backing = terraform_parse.ParseCache(str(tmp_path / 'cache'))
+    path = write(tmp_path / 'main.tf', GOOD)
+    terraform_parse.parse_files([path], 1, backing)
+
+    cache = terraform_parse.MemoryParseCache(backing)
+    terraform_parse.parse_files([path], 1, cache)
+    terraform_parse.parse_files([path], 1, cache)
+
+    assert cache.stats() == {'entries': 1, 'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+
+def test_failed_parses_are_returned_and_not_cached(tmp_path):
+    cache = terraform_parse.ParseCache(str(tmp_path / 'cache'))
+    paths = [write(tmp_path / 'good.tf', GOOD), write(tmp_path / 'broken.tf', BROKEN)]
+
+    configs, _ = terraform_parse.parse_files(paths, 2, cache)
+    assert isinstance(configs[paths[1]], Exception) and not isinstance(configs[paths[0]], Exception)
+
+    assert terraform_parse.parse_files(paths, 2, cache)[1] == {'parsed': 1, 'cached': 1}
+
+
+def test_parse_errors_are_reported_per_file(tmp_path, estimator):
+    workspace = tmp_path / 'workspace'
+    workspace.mkdir()
+    good = write(workspace / 'good.tf', GOOD)
+    broken = write(workspace / 'broken.tf', BROKEN)
+
+    directory = estimator.estimate(str(workspace))
+    single = estimator.estimate(broken)
+
+    assert [error['file'] for error in directory['parse_errors']] == [broken]
+    assert [item['address'] for item in directory['resources']] == ['aws_instance.web']
+    # A single file reports its error the same way instead of raising
+    assert single['parse_errors'] == directory['parse_errors']
+    assert single['resources'] == [] and single['total_monthly_cost'] == 0
+    assert estimator.estimate(good)['parse_errors'] == []
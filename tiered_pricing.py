@@ -0,0 +1,146 @@
+import bisect
+
+# Monthly free tier allowances per price component, in the component's unit.
+# They are per account: one allowance is shared by every resource of the service
+# (see free_tier_credit), and only applied when a usage file asks for it.
+FREE_TIER_ALLOWANCES = {
+    'Lambda': {'price_per_request': 1000000, 'price_per_gb_second': 400000},
+    'DynamoDB': {'price_per_data_transfer': 100},
+    'VPC': {'price_per_data_transfer': 100},
+    'S3': {'price_per_gb': 5},
+}
+
+
+class TieredRate:
+    """
+    A price that changes with the quantity used, compiled for fast evaluation.
+
+    Tiers are stored as a sorted array of breakpoints with the cost of all
+    usage below each breakpoint precomputed (a prefix sum), so the cost of any
+    quantity is one binary search plus one multiply-add, however many tiers
+    there are. ``cost`` also accepts a NumPy array of quantities and evaluates
+    it with ``searchsorted`` in one pass.
+
+    Args:
+        tiers (list): ``(begin, price)`` pairs; each price applies from its
+            ``begin`` up to the next tier's. Usage below the first ``begin`` is free.
+        free_quantity (float): Allowance subtracted from the quantity before pricing.
+    """
+
+    def __init__(self, tiers, free_quantity=0):
+        tiers = sorted(tiers)
+        if not tiers or tiers[0][0] > 0:
+            tiers.insert(0, (0.0, 0.0))
+        self.starts = [float(begin) for begin, _ in tiers]
+        self.prices = [float(price) for _, price in tiers]
+        self.cumulative = [0.0]
+        for position in range(1, len(tiers)):
+            width = self.starts[position] - self.starts[position - 1]
+            self.cumulative.append(self.cumulative[-1] + width * self.prices[position - 1])
+        self.free_quantity = free_quantity
+        self._arrays = None
+
+    def __repr__(self):
+        tiers = ', '.join(f'({begin:g}, {price!r})' for begin, price in zip(self.starts, self.prices))
+        free = f', free_quantity={self.free_quantity:g}' if self.free_quantity else ''
+        return f'TieredRate([{tiers}]{free})'
+
+    @property
+    def unit_price(self):
+        """The price of the first paid unit."""
+        return next((price for price in self.prices if price), 0.0)
+
+    def cost(self, quantity):
+        """Return the total cost of ``quantity`` units (a number or a NumPy array)."""
+        if not isinstance(quantity, (int, float)):
+            return self._cost_array(quantity)
+        quantity = max(quantity - self.free_quantity, 0.0)
+        position = bisect.bisect_right(self.starts, quantity) - 1
+        return self.cumulative[position] + (quantity - self.starts[position]) * self.prices[position]
+
+    def _cost_array(self, quantity):
+        # Imported here so scalar pricing never loads NumPy
+        import numpy as np
+
+        if self._arrays is None:
+            self._arrays = (np.asarray(self.starts), np.asarray(self.prices), np.asarray(self.cumulative))
+        starts, prices, cumulative = self._arrays
+        quantity = np.maximum(quantity - self.free_quantity, 0.0)
+        positions = np.searchsorted(starts, quantity, side='right') - 1
+        return cumulative[positions] + (quantity - starts[positions]) * prices[positions]
+
+    def with_free_quantity(self, free_quantity):
+        return TieredRate(list(zip(self.starts, self.prices)), free_quantity)
+
+
+def tiered_cost(rate, quantity):
+    """Cost of ``quantity`` at ``rate``: a flat price (float) or a ``TieredRate``."""
+    if isinstance(rate, TieredRate):
+        return rate.cost(quantity)
+    return quantity * rate
+
+
+def unit_price(rate):
+    """The first paid unit price of a flat or tiered rate."""
+    return rate.unit_price if isinstance(rate, TieredRate) else rate
+
+
+def compile_dimensions(price_dimensions, matches):
+    """
+    Compile the price dimensions of one offer that ``matches`` selects.
+
+    Args:
+        price_dimensions (iterable): ``sku_record.PriceDimension``s of an OnDemand offer.
+        matches (callable): Returns True for the dimensions of this price.
+
+    Returns:
+        The flat price (float) when there is a single tier starting at zero, a
+        ``TieredRate`` when there are several, or None when nothing matches.
+    """
+    tiers = []
+    for dimension in price_dimensions:
+        if matches(dimension):
+            tiers.append((dimension.begin_range, dimension.price_usd))
+    if not tiers:
+        return None
+    if len(tiers) == 1 and tiers[0][0] == 0:
+        return tiers[0][1]
+    return TieredRate(tiers)
+
+
+def free_tier_credit(allowance, usages):
+    """
+    Value of one free tier allowance shared by several resources.
+
+    The allowance is used up in order. Each line's share is taken off the
+    quantity it was priced at, at the same rate, so the credit is exactly
+    what the line's cost drops by: never more than the line costs, and
+    nothing for usage that falls in a free first tier.
+
+    Args:
+        allowance (float): Free units per month.
+        usages (iterable): ``(rate, quantity, resources)``: a flat or tiered
+            rate, the quantity each of ``resources`` identical resources uses.
+            Quantities and resource counts may be NumPy arrays (one value per
+            sample).
+
+    Returns:
+        The credit to subtract from the monthly total (a float, or an array).
+    """
+    remaining = allowance
+    credit = 0.0
+    for rate, quantity, resources in usages:
+        total = quantity * resources
+        if isinstance(total, (int, float)):
+            if not total:
+                continue
+            used = min(total, remaining)
+            share = used / resources
+        else:
+            import numpy as np
+
+            used = np.minimum(total, remaining)
+            share = np.divide(used, resources, out=np.zeros(np.shape(used)), where=np.asarray(resources) > 0)
+        credit = credit + resources * (tiered_cost(rate, quantity) - tiered_cost(rate, quantity - share))
+        remaining = remaining - used
+    return credit
@@ -0,0 +1,176 @@
+import json
+import os
+import threading
+import time
+
+# The active tracer; None means tracing is off and every span is the shared no-op
+_tracer = None
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+    def tag(self, **tags):
+        pass
+
+
+# Returned by span() while tracing is off; also a default for code that tags an optional span
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """A timed section of the pipeline; use as a context manager."""
+
+    __slots__ = ('tracer', 'name', 'category', 'tags', 'start_ns')
+
+    def __init__(self, tracer, name, category, tags):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.tags = tags
+        self.start_ns = None
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None:
+            self.tags['error'] = exc_type.__name__
+        self.tracer.add(self.name, self.category, self.start_ns, time.perf_counter_ns() - self.start_ns, self.tags)
+        return False
+
+    def tag(self, **tags):
+        """Add tags known only once the work is done, e.g. whether a lookup hit the cache."""
+        self.tags.update(tags)
+
+
+class Tracer:
+    """
+    Collects timed spans from every thread of the process.
+
+    Spans are kept as Chrome trace "complete" events. Work done in other
+    processes (parser workers) is added with ``add`` and its own pid, which
+    works because ``time.perf_counter_ns`` reads a system-wide monotonic clock.
+    """
+
+    def __init__(self):
+        self.origin_ns = time.perf_counter_ns()
+        self.pid = os.getpid()
+        self.events = []
+        self._lock = threading.Lock()
+
+    def span(self, name, category, **tags):
+        return Span(self, name, category, tags)
+
+    def add(self, name, category, start_ns, duration_ns, tags=None, pid=None, tid=None):
+        event = (name, category, start_ns, duration_ns, tags or {}, pid or self.pid, tid or threading.get_ident())
+        with self._lock:
+            self.events.append(event)
+
+    def chrome_trace(self):
+        """
+        Return the spans in Chrome trace format.
+
+        Load the JSON in chrome://tracing or https://ui.perfetto.dev.
+
+        Returns:
+            dict: ``{'traceEvents': [...], 'displayTimeUnit': 'ms'}``.
+        """
+        with self._lock:
+            events = list(self.events)
+        return {
+            'traceEvents': [
+                {'name': name, 'cat': category, 'ph': 'X', 'ts': (start_ns - self.origin_ns) / 1000,
+                 'dur': duration_ns / 1000, 'pid': pid, 'tid': tid, 'args': tags}
+                for name, category, start_ns, duration_ns, tags, pid, tid in events
+            ],
+            'displayTimeUnit': 'ms',
+        }
+
+    def write_chrome_trace(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.chrome_trace(), file, default=str)
+
+    def summary(self, group_tags=('service', 'cache', 'source')):
+        """
+        Aggregate the spans by name and by the values of ``group_tags``.
+
+        Returns:
+            list: One dict per group with ``category``, ``name``, ``tags``,
+            ``count``, ``total_ms``, ``mean_ms``, ``max_ms`` and ``retries``,
+            largest total first.
+        """
+        with self._lock:
+            events = list(self.events)
+        groups = {}
+        for name, category, _, duration_ns, tags, _, _ in events:
+            group_key = (category, name, tuple((tag, tags[tag]) for tag in group_tags if tag in tags))
+            group = groups.get(group_key)
+            if group is None:
+                group = groups[group_key] = {'count': 0, 'total_ns': 0, 'max_ns': 0, 'retries': 0}
+            group['count'] += 1
+            group['total_ns'] += duration_ns
+            group['max_ns'] = max(group['max_ns'], duration_ns)
+            group['retries'] += tags.get('retries', 0)
+        rows = [
+            {'category': category, 'name': name, 'tags': dict(tags), 'count': group['count'],
+             'total_ms': group['total_ns'] / 1e6, 'mean_ms': group['total_ns'] / group['count'] / 1e6,
+             'max_ms': group['max_ns'] / 1e6, 'retries': group['retries']}
+            for (category, name, tags), group in groups.items()
+        ]
+        return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+
+    def format_summary(self):
+        """Render ``summary()`` as a text table."""
+        lines = [f"{'span':<44} {'count':>8} {'total ms':>11} {'mean ms':>10} {'max ms':>10} {'retries':>8}"]
+        for row in self.summary():
+            label = ' '.join([f"{row['category']}.{row['name']}"] + [str(value) for value in row['tags'].values()])
+            lines.append(f"{label:<44} {row['count']:>8} {row['total_ms']:>11.2f} {row['mean_ms']:>10.3f} "
+                         f"{row['max_ms']:>10.2f} {row['retries']:>8}")
+        return '\n'.join(lines)
+
+
+def enable():
+    """Start tracing in this process and return the new ``Tracer``."""
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def disable():
+    """Stop tracing; return the tracer that was active, or None."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def get_tracer():
+    return _tracer
+
+
+def enabled():
+    return _tracer is not None
+
+
+def span(name, category='estimate', **tags):
+    """
+    Time a section of the pipeline::
+
+        with tracing.span('price_lookup', 'pricing', service=service_code) as span:
+            ...
+            span.tag(cache='miss')
+
+    With tracing off this returns a shared no-op object, so an instrumented
+    call costs one global lookup.
+    """
+    tracer = _tracer
+    if tracer is None:
+        return NOOP_SPAN
+    return tracer.span(name, category, **tags)